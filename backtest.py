@@ -0,0 +1,428 @@
+# backtest.py
+# Historical replay of sinyalbot (check_signal) and salamprofit (retrace) on 1m klines
+# - Higher timeframes are built from the 1m bars; at every decision point a
+#   higher-TF bar that is still open is the partial aggregate, exactly what
+#   the live bots read from futures_klines between closes
+# - Decisions run through the production code: panel.sinyal_columns /
+#   sinyal_conditions + sinyallogic (HOLD/new signal, TP/SL trailing) and
+#   salamprofit's TrendIndicators, fib_band, retrace_conditions and anti-spam
+#   memory, so a backtest cannot drift from what the bots do live
+# - Vectorized where the rules allow (all 1m columns, all 15m entry columns);
+#   the stateful parts only run on candidate bars, and TP/SL paths jump from
+#   level-cross to level-cross over the 1m high/low arrays
+#
+# Data: <data>/<SYMBOL>-1m*.csv in Binance kline CSV format (e.g. monthly
+# dumps from data.binance.vision, or --download which writes the same format),
+# or --store <dir> to read the bots' on-disk KlineStore.
+#
+# Usage:
+#   python backtest.py --download --symbols BTCUSDT,ETHUSDT --days 30
+#   python backtest.py --symbols BTCUSDT,ETHUSDT --strategy both --trades trades.csv
+
+import os
+import csv
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from klinecache import INTERVAL_MS
+from klineparse import Bars
+from panel import ema, rsi, stochrsi_k, fib_band, retrace_conditions, sinyal_columns
+from sinyallogic import TF_LIST, SinyalIndicators, in_cooldown, lazy_conditions, plan_signal, apply_levels
+from signalstore import SignalStore
+from triggers import TriggerIndex
+
+DATA_DIR = "data"
+WARMUP_BARS = 50          # bar tertutup minimal per TF sebelum sinyal dievaluasi
+SEARCH_CHUNK = 4096       # ukuran blok awal saat mencari bar yang menyentuh level
+
+
+# ===================== DATA =====================
+def load_1m(symbol, data_dir=DATA_DIR):
+    """All <symbol>-1m*.csv files merged into one sorted, de-duplicated Bars."""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(data_dir, f"{symbol}-1m*.csv"))):
+        with open(path, newline="") as f:
+            for rec in csv.reader(f):
+                if rec and rec[0].strip().isdigit():   # lewati header
+                    rows.append(rec[:6])
+    if not rows:
+        raise FileNotFoundError(f"no 1m klines for {symbol} in {data_dir}")
+    arr = np.asarray(rows, dtype=np.float64)
+    t = arr[:, 0].astype(np.int64)
+    t, idx = np.unique(t, return_index=True)
+    arr = arr[idx]
+    return Bars(t, arr[:, 1], arr[:, 2], arr[:, 3], arr[:, 4], arr[:, 5])
+
+
+def load_store(symbol, root):
+    """1m Bars straight from a KlineStore directory (klinestore.py)."""
+    from klinestore import KlineStore
+    arr = KlineStore(root).read(symbol, "1m")
+    if not len(arr):
+        raise FileNotFoundError(f"no 1m klines for {symbol} in store {root}")
+    return Bars(np.array(arr["t"]), np.array(arr["o"]), np.array(arr["h"]), np.array(arr["l"]),
+                np.array(arr["c"]), np.array(arr["v"]))
+
+
+def download(client, symbol, days, data_dir=DATA_DIR):
+    """Fetch `days` of closed 1m klines over REST into <data_dir>/<symbol>-1m-<days>d.csv."""
+    os.makedirs(data_dir, exist_ok=True)
+    end = int(time.time() * 1000)
+    start = end - days * 86_400_000
+    path = os.path.join(data_dir, f"{symbol}-1m-{days}d.csv")
+    n = 0
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        t = start
+        while t < end:
+            kl = client.futures_klines(symbol=symbol, interval="1m", startTime=t, limit=1500)
+            kl = [k for k in kl if int(k[6]) < end]     # hanya bar yang sudah close
+            if not kl:
+                break
+            w.writerows(kl)
+            n += len(kl)
+            t = int(kl[-1][0]) + 60_000
+    print(f"[DATA] {symbol}: {n} bar 1m -> {path}")
+    return path
+
+
+class _Buckets:
+    """Group 1m bars into higher-TF bars (bucket = open time floored to the TF)."""
+
+    def __init__(self, bars, step_ms):
+        self.bars = bars
+        bucket = bars.t - bars.t % step_ms
+        new = np.empty(len(bucket), dtype=bool)
+        new[:1] = True
+        new[1:] = bucket[1:] != bucket[:-1]
+        self.starts = np.flatnonzero(new)
+        self.ends = np.append(self.starts[1:] - 1, len(bucket) - 1)
+        self.group = np.cumsum(new) - 1              # index bar TF per bar 1m
+        self.t = bucket[self.starts]
+        self.o = bars.o[self.starts]
+        self.h = np.maximum.reduceat(bars.h, self.starts)
+        self.l = np.minimum.reduceat(bars.l, self.starts)
+        self.c = bars.c[self.ends]
+        self.v = np.add.reduceat(bars.v, self.starts)
+
+    def row(self, g, j=None):
+        """Raw-kline-like row of TF bar g as seen at the close of 1m bar j (partial if j < end)."""
+        if j is None or j >= self.ends[g]:
+            return [int(self.t[g]), self.o[g], self.h[g], self.l[g], self.c[g], self.v[g]]
+        s, b = self.starts[g], self.bars
+        return [int(self.t[g]), b.o[s], b.h[s:j + 1].max(), b.l[s:j + 1].min(), b.c[j], b.v[s:j + 1].sum()]
+
+
+class _PartialFeed:
+    """Streaming IndicatorSet of one higher TF, advanced to the close of a 1m bar."""
+
+    def __init__(self, buckets, ind):
+        self.b = buckets
+        self.ind = ind
+        self.done = -1          # bar TF terakhir yang sudah masuk dalam bentuk final
+
+    def at(self, j):
+        g = self.b.group[j]
+        for gg in range(self.done + 1, g):
+            self.ind.push(self.b.row(gg))
+        self.done = max(self.done, g - 1)
+        self.ind.push(self.b.row(g, j))
+        return self.ind
+
+
+def _first_cross(h, l, a, b, up, down):
+    """First index k in [a, b] with h[k] >= up or l[k] <= down, else None."""
+    chunk = SEARCH_CHUNK
+    while a <= b:
+        e = min(b + 1, a + chunk)
+        hit = (h[a:e] >= up) | (l[a:e] <= down)
+        k = int(hit.argmax())
+        if hit[k]:
+            return a + k
+        a = e
+        chunk *= 2
+    return None
+
+
+def _trade(strategy, symbol, side, entry_t, exit_t, entry, exit_, reason, **extra):
+    d = 1 if side == "LONG" else -1
+    rec = {"strategy": strategy, "symbol": symbol, "side": side,
+           "entry_time": int(entry_t), "exit_time": int(exit_t),
+           "entry": float(entry), "exit": float(exit_), "reason": reason,
+           "pnl_pct": d * (float(exit_) / float(entry) - 1) * 100}
+    rec.update(extra)
+    return rec
+
+
+# ===================== SINYALBOT =====================
+def backtest_sinyal(symbol, bars, warmup=WARMUP_BARS):
+    """Replay check_signal + monitor_active_signals at every 1m close.
+
+    Trade = one signal: exit at its (trailed) SL or at TP3, fill at the level.
+    """
+    h, l = bars.h, bars.l
+    n = len(bars.t)
+    cols = sinyal_columns(bars.h, bars.l, bars.c, bars.v)
+
+    # Gate yang hanya butuh data 1m (vectorized); TF lain dihitung di kandidat saja
+    t1 = cols['trend_up']
+    common = cols['volume_spike'] & cols['strong_adx'] & cols['volatility_ok']
+    cand = common & ((t1 & cols['breakout_up']) | (~t1 & cols['breakout_down']))
+
+    feeds = {tf: _PartialFeed(_Buckets(bars, INTERVAL_MS[tf]), SinyalIndicators()) for tf in TF_LIST[1:]}
+    ready = np.ones(n, dtype=bool)
+    ready[:warmup] = False
+    for feed in feeds.values():
+        ready &= feed.b.group >= warmup
+    candidates = np.flatnonzero(cand & ready)
+
+    active, cooldowns, trades, meta = SignalStore(), {}, [], {}
+    index = TriggerIndex()
+    stats = {"candidates": len(candidates), "evaluated": 0, "signals": 0, "holds": 0, "pruned": {}}
+
+    def close(sig, k, exit_, reason):
+        m = meta.pop(id(sig))
+        index.remove_signal(sig)
+        active.close(sig)
+        trades.append(_trade("sinyal", symbol, sig["side"], m["t"], bars.t[k] + 60_000, sig["entry"], exit_,
+                             reason, tp1=sig["notified_tp1"], tp2=sig["notified_tp2"],
+                             tp3=sig["notified_tp3"], holds=m["holds"], size=m["size"]))
+
+    def walk(a, b):
+        # monitor: lompat langsung ke bar berikutnya yang menyentuh salah satu level
+        while active and a <= b:
+            up, down = index.bounds(symbol)
+            k = _first_cross(h, l, a, b, up, down)
+            if k is None:
+                return
+            for sig, kinds in index.cross(symbol, h[k], l[k]):
+                levels = {kind: sig[kind] for kind in kinds}
+                hits, closed = apply_levels(sig, kinds)
+                if closed:
+                    close(sig, k, levels["sl"] if "sl" in hits else levels["tp3"], "sl" if "sl" in hits else "tp3")
+                elif "tp1" in hits or "tp2" in hits:
+                    index.set_level(sig, "sl", sig["sl"])
+            a = k + 1
+
+    pos = 0
+    for j in candidates:
+        walk(pos, j)
+        pos = j + 1
+        now = (bars.t[j] + 60_000) / 1000.0
+        if in_cooldown(cooldowns, symbol, now):
+            continue
+        stats["evaluated"] += 1
+        d1 = {key: col[j] for key, col in cols.items()}
+        stage, result = lazy_conditions(lambda tf: d1 if tf == '1m' else feeds[tf].at(j).snapshot())
+        stats["pruned"][stage] = stats["pruned"].get(stage, 0) + 1
+        if result is None:
+            continue
+        cond_up, cond_down, risk_pct, price, atr_4h = result
+        plan = plan_signal(active, symbol, bool(cond_up), bool(cond_down), float(risk_pct),
+                           float(price), float(atr_4h))
+        if plan is None:
+            continue
+        action, sig, size = plan
+        index.index_signal(sig)
+        if action == "hold":
+            meta[id(sig)]["holds"] += 1
+            stats["holds"] += 1
+            continue
+        cooldowns[symbol] = now
+        active.add(sig)
+        meta[id(sig)] = {"t": bars.t[j] + 60_000, "size": size, "holds": 0}
+        stats["signals"] += 1
+
+    walk(pos, n - 1)
+    for sig in active:
+        close(sig, n - 1, bars.c[-1], "open")
+    return trades, stats
+
+
+# ===================== SALAMPROFIT =====================
+def retrace_inputs(bars):
+    """Parameter-independent arrays of backtest_retrace, keyed by name.
+
+    TF_ENTRY bars (t/o/h/l/c and the 1m index of their last bar), the
+    TF_TREND up/down flags at every entry close and the entry indicators.
+    None of it depends on the swept retrace settings, so sweep.py computes
+    it once per symbol.
+    """
+    import salamprofit as sp
+
+    b15 = _Buckets(bars, INTERVAL_MS[sp.TF_ENTRY])
+    n15 = len(b15.t)
+
+    # 1) Trend filter: EMA50/200 TF_TREND incl. bar yang masih open pada close bar entry
+    trend = _PartialFeed(_Buckets(bars, INTERVAL_MS[sp.TF_TREND]), sp.TrendIndicators())
+    up = np.zeros(n15, dtype=bool)
+    down = np.zeros(n15, dtype=bool)
+    for i in range(n15):
+        ind = trend.at(b15.ends[i])
+        up[i] = sp.ema_uptrend(ind)
+        down[i] = sp.ema_downtrend(ind)
+
+    return {
+        "t": b15.t, "ends": b15.ends, "o": b15.o, "h": b15.h, "l": b15.l, "c": b15.c,
+        "up": up, "down": down,
+        "ema_t": ema(b15.c, sp.EMA_TOUCH),
+        "ema_c": ema(b15.c, sp.EMA_CONFIRM),
+        "rsi": rsi(b15.c, 14),
+        "k": stochrsi_k(b15.c, 14, 3),  # 0..1
+    }
+
+
+def backtest_retrace(symbol, bars, inputs=None):
+    """Replay check_symbol + emit_retrace at every TF_ENTRY close (CONFIRM_ON_CLOSE / stream mode).
+
+    Trade = one alert entered at price_ref: exit at SL or TP2 (SL wins if both
+    are inside the same 1m bar); tp1 marks whether TP1 was reached on the way.
+    inputs: retrace_inputs(bars), if already computed; only the steps that
+    depend on salamprofit's retrace settings run here.
+    """
+    import salamprofit as sp
+
+    for memory in (sp.last_signal_time, sp.last_band, sp.last_side):
+        memory.pop(symbol, None)
+    x = retrace_inputs(bars) if inputs is None else inputs
+    params = sp.retrace_params()
+    n15 = len(x["t"])
+    step15 = INTERVAL_MS[sp.TF_ENTRY]
+
+    # 2) Entry timing (semua bar entry sekaligus, sama seperti scan_pairs_panel)
+    lb = sp.FIB_LOOKBACK
+    band_low = np.full(n15, np.nan)
+    band_high = np.full(n15, np.nan)
+    if n15 > lb:
+        hw = np.lib.stride_tricks.sliding_window_view(x["h"], lb + 1)
+        lw = np.lib.stride_tricks.sliding_window_view(x["l"], lb + 1)
+        band_low[lb:], band_high[lb:] = fib_band(hw, lw, x["ema_t"][lb:], params)
+    price_ref, long_setup, long_entry, short_setup, short_entry = retrace_conditions(
+        x["up"], x["down"], x["o"], x["h"], x["l"], x["c"], x["ema_t"], x["ema_c"], x["rsi"], x["k"],
+        band_low, band_high, params
+    )
+
+    trades = []
+    stats = {"setups": int((long_setup | short_setup).sum()), "alerts": 0}
+    last = len(bars.t) - 1
+    for i in np.flatnonzero(long_setup | short_setup):
+        now = (x["t"][i] + step15) / 1000.0
+        side = sp.retrace_decision(symbol, float(price_ref[i]), bool(long_setup[i]), bool(long_entry[i]),
+                                   bool(short_setup[i]), bool(short_entry[i]), now)
+        if side is None:
+            continue
+        sp.mark_signal(symbol, float(band_low[i]), float(band_high[i]),
+                       now + sp.ENTRY_WINDOW_MIN * 60, side, now)
+        stats["alerts"] += 1
+
+        entry = float(price_ref[i])
+        sl, tp1, tp2 = sp.build_sl_tp(side, entry)
+        a = x["ends"][i] + 1
+        if side == "LONG":
+            k_sl = _first_cross(bars.h, bars.l, a, last, np.inf, sl)
+            k_tp = _first_cross(bars.h, bars.l, a, last, tp2, -np.inf)
+            k_tp1 = _first_cross(bars.h, bars.l, a, last, tp1, -np.inf)
+        else:
+            k_sl = _first_cross(bars.h, bars.l, a, last, sl, -np.inf)
+            k_tp = _first_cross(bars.h, bars.l, a, last, np.inf, tp2)
+            k_tp1 = _first_cross(bars.h, bars.l, a, last, np.inf, tp1)
+        if k_sl is not None and (k_tp is None or k_sl <= k_tp):
+            k_exit, exit_, reason = k_sl, sl, "sl"
+        elif k_tp is not None:
+            k_exit, exit_, reason = k_tp, tp2, "tp2"
+        else:
+            k_exit, exit_, reason = last, bars.c[-1], "open"
+        hit_tp1 = bool(k_tp1 is not None and k_tp1 <= k_exit and not (reason == "sl" and k_tp1 == k_exit))
+        trades.append(_trade("retrace", symbol, side, now * 1000, bars.t[k_exit] + 60_000, entry, exit_,
+                             reason, tp1=hit_tp1, tp2=reason == "tp2"))
+    return trades, stats
+
+
+# ===================== REPORT =====================
+def summarize(trades):
+    """Per-strategy totals: hit rates, PnL (sum of % per trade) and max drawdown."""
+    out = {}
+    for strategy in sorted({t["strategy"] for t in trades}):
+        ts = sorted((t for t in trades if t["strategy"] == strategy), key=lambda t: t["exit_time"])
+        pnl = np.asarray([t["pnl_pct"] for t in ts])
+        equity = np.cumsum(pnl)
+        peak = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:]
+        gains, losses = pnl[pnl > 0].sum(), -pnl[pnl < 0].sum()
+        closed = [t for t in ts if t["reason"] != "open"]
+        out[strategy] = {
+            "trades": len(ts),
+            "win_rate": float((pnl > 0).mean() * 100) if len(ts) else 0.0,
+            "sl_rate": 100.0 * sum(t["reason"] == "sl" for t in closed) / max(1, len(closed)),
+            "tp1_rate": 100.0 * sum(bool(t.get("tp1")) for t in ts) / max(1, len(ts)),
+            "tp2_rate": 100.0 * sum(bool(t.get("tp2")) for t in ts) / max(1, len(ts)),
+            "tp3_rate": 100.0 * sum(bool(t.get("tp3")) for t in ts) / max(1, len(ts)),
+            "total_pnl_pct": float(pnl.sum()),
+            "avg_pnl_pct": float(pnl.mean()) if len(ts) else 0.0,
+            "profit_factor": float(gains / losses) if losses else float("inf"),
+            "max_drawdown_pct": float((peak - equity).max()) if len(ts) else 0.0,
+        }
+    return out
+
+
+def run_symbol(symbol, data_dir=DATA_DIR, strategies=("sinyal", "retrace"), warmup=WARMUP_BARS, store=None):
+    t0 = time.time()
+    bars = load_store(symbol, store) if store else load_1m(symbol, data_dir)
+    trades, stats = [], {}
+    if "sinyal" in strategies:
+        tr, stats["sinyal"] = backtest_sinyal(symbol, bars, warmup)
+        trades += tr
+    if "retrace" in strategies:
+        tr, stats["retrace"] = backtest_retrace(symbol, bars)
+        trades += tr
+    print(f"[BT] {symbol}: {len(bars.t)} bar 1m, {len(trades)} trade, {time.time() - t0:.1f}s {stats}")
+    return trades
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Backtest sinyalbot / salamprofit on stored 1m klines")
+    ap.add_argument("--symbols", required=True, help="comma separated, e.g. BTCUSDT,ETHUSDT")
+    ap.add_argument("--data", default=DATA_DIR)
+    ap.add_argument("--store", help="read 1m bars from this KlineStore directory instead of CSV")
+    ap.add_argument("--strategy", choices=("sinyal", "retrace", "both"), default="both")
+    ap.add_argument("--warmup", type=int, default=WARMUP_BARS)
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--trades", help="write every trade to this CSV")
+    ap.add_argument("--download", action="store_true", help="fetch --days of 1m klines first")
+    ap.add_argument("--days", type=int, default=30)
+    args = ap.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    if args.download:
+        from binance.client import Client
+        from ratelimit import LimitedClient
+        client = LimitedClient(Client())
+        for sym in symbols:
+            download(client, sym, args.days, args.data)
+
+    strategies = ("sinyal", "retrace") if args.strategy == "both" else (args.strategy,)
+    t0 = time.time()
+    trades = []
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(symbols)))) as pool:
+        jobs = [pool.submit(run_symbol, s, args.data, strategies, args.warmup, args.store) for s in symbols]
+        for job in jobs:
+            trades += job.result()
+
+    if args.trades:
+        with open(args.trades, "w", newline="") as f:
+            keys = sorted({k for t in trades for k in t})
+            w = csv.DictWriter(f, fieldnames=keys)
+            w.writeheader()
+            w.writerows(trades)
+    for strategy, s in summarize(trades).items():
+        print(f"\n== {strategy} ==")
+        for key, val in s.items():
+            print(f"  {key:18s} {val:.2f}" if isinstance(val, float) else f"  {key:18s} {val}")
+    print(f"\n{len(symbols)} simbol dalam {time.time() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,440 @@
+# bench.py
+# Reproducible scan benchmarks on recorded market data (fakeclient.FixtureClient)
+# - sinyalbot.check_signal and salamprofit.check_symbol: per-symbol scan
+#   latency (cold = empty cache, warm = cache filled within the same
+#   minute, no new bar), full-universe pass time, indicator
+#   time per timeframe (seed from history / incremental update) and memory
+#   per tracked symbol
+# - sinyalbot.monitor_active_signals at 10/100/1000 open signals (capped at
+#   one LONG + one SHORT per fixture symbol) and bytes per open signal (salamprofit
+#   has no TP/SL monitor, it only alerts)
+# - One JSON file per run with the git commit, fixture and settings, so runs
+#   of two commits can be compared (lower is better for every *_ms / *_sec /
+#   *_bytes value)
+#
+# Record a fixture (public endpoints, no API key needed):
+#   python bench.py record --symbols 50 --out bench_fixture.json.gz
+# Offline, from the synthetic FakeClient:
+#   python bench.py record --fake 50 --out bench_fixture.json.gz
+# Run / compare:
+#   python bench.py run --fixture bench_fixture.json.gz --latency 0.02 --out bench_new.json
+#   python bench.py compare bench_old.json bench_new.json --threshold 0.10
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+import contextlib
+import importlib.util
+
+from fakeclient import FixtureClient, record_fixture
+from signalstore import Signal
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_VERSION = 1
+FIXTURE_TFS = ["1m", "5m", "15m", "1h", "4h"]
+FIXTURE_LIMIT = 500            # cukup untuk limit 400 salamprofit + derive 4h dari 1m
+MONITOR_SIGNALS = (10, 100, 1000)
+
+
+# ===================== UTIL =====================
+def _stats(samples):
+    """Seconds -> summary in ms."""
+    if not samples:
+        return {"n": 0}
+    s = sorted(samples)
+    return {
+        "n": len(s),
+        "mean_ms": round(statistics.fmean(s) * 1000, 4),
+        "p50_ms": round(s[len(s) // 2] * 1000, 4),
+        "p95_ms": round(s[min(len(s) - 1, int(len(s) * 0.95))] * 1000, 4),
+        "max_ms": round(s[-1] * 1000, 4),
+    }
+
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+
+class _Quiet:
+    """Swallow the bots' prints while measuring; counts error lines."""
+
+    def __enter__(self):
+        self.buf = io.StringIO()
+        self._redirect = contextlib.redirect_stdout(self.buf)
+        self._redirect.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._redirect.__exit__(*exc)
+        self.errors = sum(1 for line in self.buf.getvalue().splitlines() if "Error" in line or "[ERROR" in line)
+        return False
+
+
+def _fresh_cache():
+    # shared_cache() menyimpan satu cache per proses; tiap skenario mulai dari cache kosong
+    import klinecache
+    klinecache._shared = None
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=HERE,
+                               capture_output=True, text=True).stdout.strip()
+        return out.stdout.strip() + ("-dirty" if dirty else "") if out.returncode == 0 else None
+    except OSError:
+        return None
+
+
+# ===================== SINYALBOT =====================
+def load_sinyalbot(client):
+    """A fresh sinyalbot module (clean state, not in sys.modules) bound to `client`.
+
+    Importing does not enter main() nor build anything (sinyalbot.init does that).
+    """
+    spec = importlib.util.spec_from_file_location("sinyalbot", os.path.join(HERE, "sinyalbot.py"))
+    m = importlib.util.module_from_spec(spec)
+    _fresh_cache()
+    with _Quiet():
+        spec.loader.exec_module(m)
+        m.init(client)
+    m.send_telegram = lambda msg: None
+    m.log_event = lambda *a, **k: None
+    return m
+
+
+def _reset_sinyalbot(m):
+    m.cooldowns.clear()
+    m.active_signals.clear()
+    m.last_checked.clear()
+    m.triggers = m.TriggerIndex()
+    for stage in m.prune_stats:
+        m.prune_stats[stage] = 0
+
+
+def _far_signal(symbol, price, i):
+    # level jauh dari harga: monitor jalan penuh tapi tidak ada sinyal yang tertutup
+    up = i % 2 == 0
+    k = 1 if up else -1
+    return Signal(symbol, "LONG" if up else "SHORT", price, price * (1 + k * 0.5), price * (1 + k * 0.6),
+                  price * (1 + k * 0.7), price * (1 - k * 0.5))
+
+
+def bench_sinyalbot(make_client, repeats):
+    from sinyallogic import SinyalIndicators
+    out = {}
+
+    m = load_sinyalbot(make_client())
+    with _Quiet() as q:
+        symbols = m.filter_symbols(m.get_all_usdt_futures_symbols())
+        cold = [_timed(m.check_signal, s) for s in symbols]
+        out["prune"] = dict(m.prune_stats)
+        _reset_sinyalbot(m)
+        warm = []
+        for _ in range(repeats):
+            warm += [_timed(m.check_signal, s) for s in symbols]
+            _reset_sinyalbot(m)
+    out["symbols"] = len(symbols)
+    out["symbol_cold"] = _stats(cold)
+    out["symbol_warm"] = _stats(warm)
+    errors = q.errors
+
+    # satu pass seluruh universe, paralel seperti scan_once
+    m = load_sinyalbot(make_client())
+    with _Quiet() as q:
+        cold_pass = _timed(m.scan_concurrent, m.check_signal, symbols, m.SCAN_WORKERS)
+        warm_pass = []
+        for _ in range(repeats):
+            _reset_sinyalbot(m)
+            warm_pass.append(_timed(m.scan_concurrent, m.check_signal, symbols, m.SCAN_WORKERS))
+    out["pass_cold_sec"] = round(cold_pass, 4)
+    out["pass_warm"] = _stats(warm_pass)
+    out["scan_workers"] = m.SCAN_WORKERS
+    errors += q.errors
+
+    # indikator per TF (klines sudah di cache, tanpa REST)
+    out["indicators"] = {}
+    for tf in m.TF_LIST:
+        rows = {s: m.kline_cache.get(s, tf, 200) for s in symbols}
+        seeded = {s: SinyalIndicators() for s in symbols}
+        seed = [_timed(lambda s: seeded[s].sync(rows[s]).snapshot(), s) for s in symbols]
+        update = [_timed(lambda s: seeded[s].sync(rows[s]).snapshot(), s) for s in symbols]
+        out["indicators"][tf] = {"seed": _stats(seed), "update": _stats(update)}
+
+    # monitor_active_signals dengan N sinyal terbuka (1m sudah di cache dari pass di atas)
+    prices = {t["symbol"]: float(t["price"]) for t in m.client.futures_symbol_ticker()}
+    out["monitor"] = {}
+    with _Quiet() as q:
+        for n in MONITOR_SIGNALS:
+            n = min(n, 2 * len(symbols))   # satu LONG + satu SHORT per simbol
+            if str(n) in out["monitor"]:
+                continue
+            _reset_sinyalbot(m)
+            for i in range(n):
+                sym = symbols[i // 2]
+                sig = _far_signal(sym, prices[sym], i)
+                m.active_signals.add(sig)
+                m.triggers.index_signal(sig)
+            out["monitor"][str(n)] = _stats([_timed(m.monitor_active_signals) for _ in range(repeats * 4)])
+            if len(m.active_signals) != n:
+                raise RuntimeError(f"monitor: {n - len(m.active_signals)} sinyal tertutup, level terlalu dekat")
+    errors += q.errors
+
+    # memori per sinyal terbuka di SignalStore (record + entry index)
+    n = MONITOR_SIGNALS[-1]
+    names = [f"SIG{i}USDT" for i in range(n)]
+    store = m.SignalStore()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i, sym in enumerate(names):
+        store.add(_far_signal(sym, 1.0 + i, i))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    out["memory_per_signal_bytes"] = used // n
+
+    # memori: cache + state indikator setelah satu pass dingin, per simbol
+    m = load_sinyalbot(make_client())
+    with _Quiet():
+        m.get_all_usdt_futures_symbols()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for s in symbols:
+            m.check_signal(s)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    out["memory_per_symbol_bytes"] = used // max(1, len(symbols))
+    out["tracked_series"] = len(m.indicator_sets)
+    out["errors"] = errors
+    return out
+
+
+# ===================== SALAMPROFIT =====================
+def _load_salamprofit(symbols, derive):
+    with _Quiet():
+        import salamprofit as sp
+    _fresh_cache()
+    sp.PAIRS = list(symbols)
+    sp.DERIVE_TF = derive
+    sp.KLINE_STORE_DIR = ""
+    sp.tg = lambda msg: None
+    sp.indicator_sets.clear()
+    _reset_salamprofit(sp)
+    return sp
+
+
+def _reset_salamprofit(sp):
+    sp.last_signal_time.clear()
+    sp.last_band.clear()
+    sp.last_side.clear()
+
+
+def bench_salamprofit(make_client, symbols, repeats, derive):
+    from ratelimit import LimitedClient, scan_concurrent
+    out = {"symbols": len(symbols)}
+
+    sp = _load_salamprofit(symbols, derive)
+    client = LimitedClient(make_client())
+    with _Quiet() as q:
+        cold = [_timed(sp.check_symbol_safe, client, s) for s in symbols]
+        warm = []
+        for _ in range(repeats):
+            _reset_salamprofit(sp)
+            warm += [_timed(sp.check_symbol_safe, client, s) for s in symbols]
+    out["symbol_cold"] = _stats(cold)
+    out["symbol_warm"] = _stats(warm)
+    errors = q.errors
+
+    sp = _load_salamprofit(symbols, derive)
+    client = LimitedClient(make_client())
+    scan = lambda: scan_concurrent(lambda s: sp.check_symbol_safe(client, s), symbols, sp.SCAN_WORKERS)
+    with _Quiet() as q:
+        cold_pass = _timed(scan)
+        warm_pass = []
+        for _ in range(repeats):
+            _reset_salamprofit(sp)
+            warm_pass.append(_timed(scan))
+        panel_pass = []
+        for _ in range(repeats):
+            _reset_salamprofit(sp)
+            panel_pass.append(_timed(sp.scan_pairs_panel, client))
+    out["pass_cold_sec"] = round(cold_pass, 4)
+    out["pass_warm"] = _stats(warm_pass)
+    out["pass_panel_warm"] = _stats(panel_pass)
+    out["scan_workers"] = sp.SCAN_WORKERS
+    errors += q.errors
+
+    cache = sp.kline_cache(client)
+    out["indicators"] = {}
+    for tf, cls, limit in ((sp.TF_TREND, sp.TrendIndicators, sp.CANDLES_FETCH_TREND),
+                           (sp.TF_ENTRY, sp.EntryIndicators, sp.CANDLES_FETCH_ENTRY)):
+        rows = {s: cache.get(s, tf, limit) for s in symbols}
+        seeded = {s: cls() for s in symbols}
+        seed = [_timed(lambda s: seeded[s].sync(rows[s]), s) for s in symbols]
+        update = [_timed(lambda s: seeded[s].sync(rows[s]), s) for s in symbols]
+        out["indicators"][tf] = {"seed": _stats(seed), "update": _stats(update)}
+
+    sp = _load_salamprofit(symbols, derive)
+    client = LimitedClient(make_client())
+    with _Quiet():
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for s in symbols:
+            sp.check_symbol_safe(client, s)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+    out["memory_per_symbol_bytes"] = used // max(1, len(symbols))
+    out["tracked_series"] = len(sp.indicator_sets)
+    out["errors"] = errors
+    return out
+
+
+# ===================== RUN / COMPARE =====================
+def run(args):
+    fixture_path = args.fixture
+    from fakeclient import load_fixture
+    fixture = load_fixture(fixture_path)
+    # flag sinyalbot dibaca dari env saat module dimuat
+    os.environ["DERIVE_TF"] = "1" if args.derive else "0"
+    os.environ["KLINE_STORE_DIR"] = ""
+    os.environ["STATE_DIR"] = ""           # jangan sentuh journal state bot yang asli
+    os.environ["EVENT_DIR"] = ""           # ... dan event log-nya
+    os.environ["SCAN_WORKERS"] = str(args.workers)
+
+    def make_client():
+        return FixtureClient(fixture, latency=args.latency, jitter=args.jitter)
+
+    symbols = [s["symbol"] for s in fixture["exchange_info"]["symbols"]]
+    t0 = time.time()
+    results = {}
+    if args.only in (None, "sinyalbot"):
+        results["sinyalbot"] = bench_sinyalbot(make_client, args.repeats)
+    if args.only in (None, "salamprofit"):
+        results["salamprofit"] = bench_salamprofit(make_client, symbols, args.repeats, args.derive)
+    report = {
+        "bench_version": BENCH_VERSION,
+        "commit": _git_commit(),
+        "created_at": int(time.time()),
+        "duration_sec": round(time.time() - t0, 2),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "fixture": {"path": os.path.basename(fixture_path), "recorded_at": fixture["recorded_at"],
+                    "symbols": len(symbols)},
+        "settings": {"latency": args.latency, "jitter": args.jitter, "repeats": args.repeats,
+                     "derive": args.derive, "workers": args.workers},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[BENCH] hasil -> {args.out} ({report['duration_sec']}s)")
+    else:
+        print(text)
+
+
+def _flatten(d, prefix=""):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def _metric(key):
+    return key.endswith(("_ms", "_sec", "_bytes"))
+
+
+def compare(args):
+    with open(args.old, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+    if old.get("settings") != new.get("settings") or old.get("fixture") != new.get("fixture"):
+        print("[BENCH] WARNING: fixture/setting berbeda, perbandingan tidak apple-to-apple")
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    print(f"{'metric':55s} {old.get('commit') or 'old':>14s} {new.get('commit') or 'new':>14s}  change")
+    regressions = 0
+    for key in sorted(set(a) & set(b)):
+        if not _metric(key):
+            continue
+        va, vb = a[key], b[key]
+        change = (vb - va) / va if va else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag, regressions = "  REGRESSION", regressions + 1
+        elif change < -args.threshold:
+            flag = "  faster"
+        print(f"{key:55s} {va:14.4f} {vb:14.4f} {change:+7.1%}{flag}")
+    print(f"[BENCH] {regressions} metric lebih lambat > {args.threshold:.0%}")
+    return 1 if regressions and args.fail else 0
+
+
+def record(args):
+    from ratelimit import LimitedClient
+    if args.fake:
+        from fakeclient import FakeClient
+        client = LimitedClient(FakeClient(n_symbols=args.fake))
+        symbols = client.symbols
+    else:
+        from binance.client import Client
+        from universe import usdt_perpetuals, ticker_snapshot
+        client = LimitedClient(Client())        # data publik, tanpa API key
+        tickers = ticker_snapshot(client)
+        symbols = sorted(usdt_perpetuals(client), key=lambda s: -float(tickers.get(s, {}).get("quoteVolume", 0)))
+        symbols = symbols[:args.symbols]
+    t0 = time.time()
+    fixture = record_fixture(client, symbols, FIXTURE_TFS, args.limit, args.out)
+    size = os.path.getsize(args.out)
+    print(f"[BENCH] {len(fixture['klines'])} simbol x {len(FIXTURE_TFS)} TF -> {args.out} "
+          f"({size / 1e6:.1f} MB, {time.time() - t0:.1f}s)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Scan benchmarks on recorded market data")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("record", help="record a fixture")
+    r.add_argument("--out", default="bench_fixture.json.gz")
+    r.add_argument("--symbols", type=int, default=50, help="top N USDT perpetuals by 24h quote volume")
+    r.add_argument("--fake", type=int, default=0, help="record N synthetic symbols from FakeClient instead")
+    r.add_argument("--limit", type=int, default=FIXTURE_LIMIT)
+
+    b = sub.add_parser("run", help="run the benchmarks")
+    b.add_argument("--fixture", default="bench_fixture.json.gz")
+    b.add_argument("--out", help="write JSON here (default: stdout)")
+    b.add_argument("--latency", type=float, default=0.0, help="seconds per fake request")
+    b.add_argument("--jitter", type=float, default=0.0)
+    b.add_argument("--repeats", type=int, default=3)
+    b.add_argument("--workers", type=int, default=8)
+    b.add_argument("--no-derive", dest="derive", action="store_false", help="fetch every TF over REST")
+    b.add_argument("--only", choices=("sinyalbot", "salamprofit"))
+
+    c = sub.add_parser("compare", help="compare two result files")
+    c.add_argument("old")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=0.10)
+    c.add_argument("--fail", action="store_true", help="exit 1 if any metric regressed")
+
+    args = ap.parse_args()
+    if args.command == "record":
+        record(args)
+    elif args.command == "run":
+        run(args)
+    else:
+        sys.exit(compare(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# engine.py
+# One market-data pipeline for several strategies (sinyalbot + salamprofit in one process)
+# - A strategy is a plug-in: which symbols it scans, which timeframes (bars
+#   of lookback) it reads, which indicators per timeframe it needs (specs
+#   like ("ema", 50) or ("rsi", 14)) and its own condition logic in evaluate()
+# - Per pass every (symbol, tf) is fetched once through the shared
+#   KlineCache and synced once into a FeatureSet holding the union of all
+#   subscribed indicator specs; every strategy reads the same values
+# - One close scheduler at the shortest scan interval; strategies whose own
+#   interval closes at that boundary run in the same pass, so a 15m close
+#   feeds sinyal (1m) and retrace (15m) from one fetch
+# - A third strategy only adds its specs + evaluate(), not another data path
+#
+# Usage (both bots, one client / cache / limiter / notifier queue):
+#   python engine.py
+
+import time
+import threading
+
+import metrics
+from indicators import NAN, IndicatorSet, SMA, EMA, RSI, ATR, ADX, BollingerBands, StochRSI
+from klinecache import INTERVAL_MS
+from klineparse import before
+from ratelimit import scan_concurrent
+from scheduler import CloseScheduler
+
+# spec -> (indikator, input dari candle); ("atr_ma", n, m) = SMA(m) dari ATR(n)
+_BUILD = {
+    "sma": (lambda n: SMA(n), "c"),
+    "sma_v": (lambda n: SMA(n), "v"),
+    "ema": (lambda n: EMA(n), "c"),
+    "rsi": (lambda n: RSI(n), "c"),
+    "atr": (lambda n: ATR(n), "hlc"),
+    "adx": (lambda n: ADX(n), "hlc"),
+    "bb": (lambda n, dev: BollingerBands(n, dev), "c"),
+    "stochrsi": (lambda n, s1, s2: StochRSI(n, s1, s2), "c"),
+    "atr_ma": (lambda n, m: SMA(m), "atr"),
+}
+
+
+def _expand(specs):
+    """Specs plus their dependencies, dependencies first, duplicates removed."""
+    out = []
+    for spec in specs:
+        if spec[0] not in _BUILD:
+            raise ValueError(f"unknown indicator spec {spec!r}")
+        if spec[0] == "atr_ma" and ("atr", spec[1]) not in out:
+            out.append(("atr", spec[1]))
+        if spec not in out:
+            out.append(spec)
+    return tuple(sorted(out, key=lambda s: s[0] == "atr_ma"))
+
+
+class FeatureSet(IndicatorSet):
+    """Every indicator spec subscribed on one (symbol, tf), each updated once per bar.
+
+    feat[spec] is the value after the last synced bar (bb: (hband, lband)).
+    """
+
+    def __init__(self, specs=None):
+        if specs is not None:          # IndicatorSet re-inits tanpa argumen saat ada gap
+            self.specs = _expand(specs)
+        super().__init__()
+
+    def _build(self):
+        self._ind = {spec: _BUILD[spec[0]][0](*spec[1:]) for spec in self.specs}
+        self.values = dict.fromkeys(self.specs, NAN)
+
+    def _update(self, row, revise):
+        high, low, close, volume = float(row[2]), float(row[3]), float(row[4]), float(row[5])
+        inputs = {"c": (close,), "v": (volume,), "hlc": (high, low, close)}
+        for spec, ind in self._ind.items():
+            src = _BUILD[spec[0]][1]
+            args = (self.values[("atr", spec[1])],) if src == "atr" else inputs[src]
+            self.values[spec] = ind.revise(*args) if revise else ind.update(*args)
+
+    def __getitem__(self, spec):
+        return self.values[spec]
+
+
+class View:
+    """One symbol in one pass: each timeframe fetched and synced at most once."""
+
+    def __init__(self, engine, symbol, until_ms=None):
+        self.engine = engine
+        self.symbol = symbol
+        self.until_ms = until_ms
+        self._rows = {}        # {tf: rows}
+        self._synced = set()   # tf yang FeatureSet-nya sudah di-sync di pass ini
+
+    def rows(self, tf):
+        """Raw klines of tf (lookback = largest subscriber), without bars opened at/after until_ms."""
+        rows = self._rows.get(tf)
+        if rows is None:
+            eng = self.engine
+            rows = self._rows[tf] = before(eng.cache.get(self.symbol, tf, eng.limits[tf]), self.until_ms)
+            eng._count("fetches")
+        return rows
+
+    def features(self, tf):
+        """FeatureSet of tf synced to rows(tf) (synced once per pass, shared by every strategy)."""
+        key = (self.symbol, tf)
+        rows = self.rows(tf)
+        eng = self.engine
+        feat = eng.features.get(key)
+        if feat is None:
+            feat = eng.features[key] = FeatureSet(eng.specs[tf])
+        if tf not in self._synced:
+            feat.sync(rows)
+            self._synced.add(tf)
+            eng._count("syncs")
+        return feat
+
+    def bars(self, tf, n):
+        """Newest n bars of tf as numpy columns, read from the buffer rows(tf) refreshed."""
+        self.rows(tf)
+        return before(self.engine.cache.bars(self.symbol, tf, n), self.until_ms)
+
+
+class Engine:
+    """Strategies subscribed to one KlineCache; see the module header for the strategy interface.
+
+    A strategy has: name, scan_tf (evaluated after every close of it),
+    timeframes {tf: bars of lookback}, features {tf: [spec, ...]},
+    universe() -> symbols and evaluate(symbol, view). Optional hooks:
+    start() once before the first pass, after_scan() after every pass it
+    took part in.
+    """
+
+    def __init__(self, cache, workers=8):
+        self.cache = cache
+        self.workers = workers
+        self.strategies = []
+        self.limits = {}       # {tf: lookback terbesar dari semua strategi}
+        self.specs = {}        # {tf: gabungan spec indikator}
+        self.features = {}     # {(symbol, tf): FeatureSet}
+        self.stats = {"passes": 0, "fetches": 0, "syncs": 0}
+        self._lock = threading.Lock()
+
+    def add(self, strategy):
+        for tf, limit in strategy.timeframes.items():
+            self.limits[tf] = max(self.limits.get(tf, 0), limit)
+        for tf, specs in strategy.features.items():
+            merged = _expand(self.specs.get(tf, ()) + tuple(specs))
+            if merged != self.specs.get(tf):
+                self.specs[tf] = merged
+                for key in [k for k in self.features if k[1] == tf]:
+                    del self.features[key]     # dibangun ulang dengan spec baru
+        self.strategies.append(strategy)
+        return self
+
+    def start(self):
+        for strategy in self.strategies:
+            if hasattr(strategy, "start"):
+                strategy.start()
+        return self
+
+    def due(self, boundary_ms):
+        """Strategies whose scan_tf closes at boundary_ms."""
+        return [s for s in self.strategies if boundary_ms % INTERVAL_MS[s.scan_tf] == 0]
+
+    def scan(self, strategies=None, until_ms=None):
+        """One pass: every (symbol, tf) any of `strategies` reads is fetched and synced once."""
+        strategies = self.strategies if strategies is None else strategies
+        t0 = time.perf_counter()
+        wanted = {}            # {symbol: [strategy]}
+        for strategy in strategies:
+            try:
+                for sym in strategy.universe():
+                    wanted.setdefault(sym, []).append(strategy)
+            except Exception as e:
+                print(f"[ENGINE] {strategy.name} universe: {e}")
+
+        def task(sym):
+            view = View(self, sym, until_ms)
+            for strategy in wanted[sym]:
+                try:
+                    strategy.evaluate(sym, view)
+                except Exception as e:
+                    print(f"[ENGINE] {strategy.name} {sym}: {e}")
+
+        scan_concurrent(task, list(wanted), self.workers)
+        for strategy in strategies:
+            if hasattr(strategy, "after_scan"):
+                try:
+                    strategy.after_scan()
+                except Exception as e:
+                    print(f"[ENGINE] {strategy.name} after_scan: {e}")
+        self._count("passes")
+        metrics.observe("scan_pass_seconds", time.perf_counter() - t0, bot="engine")
+        metrics.set_gauge("scan_symbols", len(wanted), bot="engine")
+        first = metrics.startup("first_scan", "engine")
+        if first is not None:
+            print(f"[ENGINE] scan pertama selesai {first:.1f}s sejak proses start")
+
+    def run_forever(self, clock):
+        """Scan right after every close of the shortest scan_tf (server time), the last one right away."""
+        tf = min((s.scan_tf for s in self.strategies), key=INTERVAL_MS.get)
+        CloseScheduler(clock).every_close(tf, lambda b: self.scan(self.due(b), b), "engine",
+                                          catch_up=True).run_forever()
+
+    def _count(self, kind):
+        with self._lock:
+            self.stats[kind] += 1
+
+
+def main():
+    import sinyalbot
+    import salamprofit
+    from scheduler import ServerClock
+
+    sinyalbot.init()               # satu client / cache / limiter untuk kedua strategi
+    engine = Engine(sinyalbot.kline_cache, sinyalbot.SCAN_WORKERS)
+    engine.add(sinyalbot.SinyalStrategy())
+    engine.add(salamprofit.RetraceStrategy(sinyalbot.client))
+    if sinyalbot.METRICS_PORT:
+        metrics.serve(sinyalbot.METRICS_PORT, profile=sinyalbot.METRICS_PROFILE)
+        sinyalbot.client.export_metrics()
+        metrics.gauge_fn("active_signals", lambda: len(sinyalbot.active_signals))
+    engine.start()
+    metrics.startup("ready", "engine")
+    if sinyalbot.METRICS_PORT:
+        metrics.gauge_fn("telegram_queue_depth", lambda: sinyalbot.notifier.depth() + salamprofit.notifier.depth())
+    print(f"[ENGINE] {', '.join(s.name for s in engine.strategies)} | "
+          f"TF {', '.join(f'{tf}:{len(specs)} indikator' for tf, specs in engine.specs.items())}")
+    try:
+        engine.run_forever(ServerClock(sinyalbot.client))
+    except KeyboardInterrupt:
+        print("Stop.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+# eventlog.py
+# Structured event log of the bots: JSONL segments + a symbol/time index per segment
+# - record() only enqueues (no I/O on the scan threads); one writer thread
+#   collects events for up to FLUSH_SEC and writes them with one write()
+# - One JSON line per event with typed fields: ts (epoch s), bot, ev, sym and
+#   the fields in FIELDS (numbers stay numbers, nothing to regex back out)
+# - Segments <name>-<YYYYMMDD>-<n>.jsonl rotate on a new UTC day or at
+#   max_bytes; a closed segment gets <segment>.idx with, per symbol, its time
+#   range, event counts and the byte offsets of its events per event type
+#   (packed uint32 arrays, decoded only for the symbols a query asks for),
+#   plus win/loss/even counts and the pnl sum of its closed signals
+# - Queries skip segments by the day in their name, read the remaining .idx
+#   files and then only the lines they need (seek); winrate() reads lines only
+#   of the segment the window starts in, the rest comes from the .idx
+#   aggregates, so "win rate per symbol, last 30 days" over months of history
+#   stays in ms.
+#   A segment without .idx (the open one, or after a crash) is indexed on
+#   the fly; the writer re-indexes leftovers of its own name on startup
+#
+# Usage:
+#   python eventlog.py winrate --dir events --days 30
+#   python eventlog.py events --dir events --symbol BTCUSDT --event close --days 7
+#   python eventlog.py synth --dir /tmp/ev --days 180 --per-day 2000    (history to time queries on)
+
+import os
+import sys
+import json
+import base64
+import time
+import glob
+import queue
+import atexit
+import random
+import argparse
+import threading
+from array import array
+
+from klineparse import loads
+
+INDEX_VERSION = 1
+FLUSH_SEC = 1.0              # event ditahan paling lama segini sebelum ditulis
+BATCH_MAX = 1_000            # event per write
+MAX_BYTES = 64 << 20         # segmen diputar di ukuran ini (atau ganti hari UTC)
+
+EVENTS = ("signal", "update", "tp", "sl", "trail", "close", "realert")
+FIELDS = {
+    "side": str, "id": str, "level": str, "outcome": str,
+    "price": float, "entry": float, "sl": float, "tp1": float, "tp2": float, "tp3": float,
+    "size": float, "risk_pct": float, "pnl_pct": float,
+    "band_low": float, "band_high": float, "rsi": float, "stoch_k": float, "expiry": float,
+}
+
+
+def _day(ts):
+    return time.strftime("%Y%m%d", time.gmtime(ts))
+
+
+def _dumps(record):
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode() + b"\n"
+
+
+def _new_index():
+    return {"version": INDEX_VERSION, "t0": None, "t1": None, "events": 0, "symbols": {}}
+
+
+def _add(idx, rec, offset):
+    ts, sym, ev = rec["ts"], rec["sym"], rec["ev"]
+    idx["t0"] = ts if idx["t0"] is None else min(idx["t0"], ts)
+    idx["t1"] = ts if idx["t1"] is None else max(idx["t1"], ts)
+    idx["events"] += 1
+    s = idx["symbols"].get(sym)
+    if s is None:
+        s = idx["symbols"][sym] = {"t0": ts, "t1": ts, "counts": {}, "at": {}}
+    s["t0"] = min(s["t0"], ts)
+    s["t1"] = max(s["t1"], ts)
+    s["counts"][ev] = s["counts"].get(ev, 0) + 1
+    s["at"].setdefault(ev, []).append(offset)
+    if ev == "close":
+        pnl = rec.get("pnl_pct", 0.0)
+        closed = s.setdefault("closed", [0, 0, 0, 0.0])    # win, loss, even, pnl_sum
+        closed[0 if pnl > 0 else 1 if pnl < 0 else 2] += 1
+        closed[3] += pnl
+
+
+def build_index(path):
+    """Index of one segment by scanning it; a torn last line (crash mid-write) is left out."""
+    idx = _new_index()
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                _add(idx, loads(line), offset)
+            except (ValueError, KeyError):
+                pass
+            offset += len(line)
+    return idx
+
+
+def _pack(offsets):
+    a = array("I", offsets)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return base64.b64encode(a.tobytes()).decode("ascii")
+
+
+def _unpack(at):
+    if isinstance(at, list):       # index yang baru dibangun di memori
+        return at
+    a = array("I")
+    a.frombytes(base64.b64decode(at))
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+
+def _write_index(path, idx):
+    # offset sebagai array uint32 (little endian, base64): satu string per (simbol, event), bukan ribuan int
+    symbols = {sym: dict(s, at={ev: _pack(at) for ev, at in s["at"].items()}) for sym, s in idx["symbols"].items()}
+    tmp = path + ".idx.tmp"
+    with open(tmp, "wb") as f:
+        f.write(json.dumps(dict(idx, symbols=symbols), separators=(",", ":")).encode())
+    os.replace(tmp, path + ".idx")
+
+
+class EventLog:
+    """Buffered JSONL event log of one bot (see the module header).
+
+    record() validates and coerces the fields, then returns; writing,
+    rotation and indexing happen in the writer thread.
+    """
+
+    def __init__(self, directory, name, max_bytes=MAX_BYTES, flush_sec=FLUSH_SEC):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.name = name
+        self.max_bytes = max_bytes
+        self.flush_sec = flush_sec
+        self.stats = {"events": 0, "batches": 0, "segments": 0, "reindexed": 0}
+        self._f = None
+        self._path = None
+        self._seg_day = None
+        self._size = 0
+        self._idx = None
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"eventlog-{name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- hot path ----------
+    def record(self, ev, sym, ts=None, **fields):
+        if ev not in EVENTS:
+            raise ValueError(f"unknown event {ev!r}")
+        rec = {"ts": time.time() if ts is None else ts, "bot": self.name, "ev": ev, "sym": sym}
+        for key, value in fields.items():
+            rec[key] = FIELDS[key](value)
+        self._queue.put(rec)
+
+    def flush(self, timeout=None):
+        """Block until everything recorded so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    # ---------- writer thread ----------
+    def _run(self):
+        self._reindex_leftovers()
+        while True:
+            items = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_sec
+            while len(items) < BATCH_MAX and isinstance(items[-1], dict):
+                try:
+                    items.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            buf, waiters, stop = [], [], False
+            try:
+                for item in items:
+                    if item is None:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        if self._f is None or _day(item["ts"]) != self._seg_day or self._size >= self.max_bytes:
+                            self._write(buf)
+                            buf = []
+                            self._rotate(_day(item["ts"]))
+                        line = _dumps(item)
+                        _add(self._idx, item, self._size)
+                        self._size += len(line)
+                        buf.append(line)
+                self._write(buf)
+                if stop:
+                    self._close_segment()
+            except OSError as e:
+                print(f"[EVENT] gagal menulis event log: {e}")
+            for done in waiters:
+                done.set()
+            if stop:
+                return
+
+    def _write(self, lines):
+        if not lines:
+            return
+        self._f.write(b"".join(lines))
+        self._f.flush()
+        self.stats["events"] += len(lines)
+        self.stats["batches"] += 1
+
+    def _rotate(self, day):
+        self._close_segment()
+        n = 0
+        while True:
+            path = os.path.join(self.directory, f"{self.name}-{day}-{n:03d}.jsonl")
+            if not os.path.exists(path):
+                break
+            n += 1
+        self._f = open(path, "ab")
+        self._path = path
+        self._seg_day = day
+        self._size = 0
+        self._idx = _new_index()
+        self.stats["segments"] += 1
+
+    def _close_segment(self):
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        if self._idx["events"]:
+            _write_index(self._path, self._idx)
+        else:
+            os.remove(self._path)
+
+    def _reindex_leftovers(self):
+        # segmen dari proses sebelumnya yang mati sebelum sempat menulis .idx
+        for path in glob.glob(os.path.join(self.directory, f"{self.name}-*.jsonl")):
+            if not os.path.exists(path + ".idx"):
+                try:
+                    _write_index(path, build_index(path))
+                    self.stats["reindexed"] += 1
+                except OSError as e:
+                    print(f"[EVENT] {path}: index gagal dibuat ({e})")
+
+
+# ===================== QUERIES =====================
+def segments(directory, bot=None, since=None):
+    """(path, index) of every segment, oldest first, from the UTC day of `since` on.
+
+    Segments without .idx (still open, or left by a crash) are indexed on the fly.
+    """
+    pattern = f"{bot}-*.jsonl" if bot else "*.jsonl"
+    first = None if since is None else _day(max(since, 0))
+    for path in sorted(glob.glob(os.path.join(directory, pattern)), key=lambda p: os.path.basename(p)[-18:]):
+        if first is not None and os.path.basename(path)[-18:-10] < first:
+            continue
+        try:
+            with open(path + ".idx", "rb") as f:
+                idx = loads(f.read())
+        except (OSError, ValueError):
+            idx = build_index(path)
+        if idx["events"]:
+            yield path, idx
+
+
+def query(directory, since=None, until=None, symbols=None, events=None, bot=None):
+    """Events with since <= ts < until, filtered by symbol / event type / bot, in file order."""
+    start = since
+    since = -float("inf") if since is None else since
+    until = float("inf") if until is None else until
+    for path, idx in segments(directory, bot, start):
+        yield from _read(path, idx, since, until, symbols, events)
+
+
+def _read(path, idx, since, until, symbols, events):
+    if idx["t1"] < since or idx["t0"] >= until:
+        return
+    offsets = []
+    for sym, s in idx["symbols"].items():
+        if (symbols and sym not in symbols) or s["t1"] < since or s["t0"] >= until:
+            continue
+        for ev, at in s["at"].items():
+            if events is None or ev in events:
+                offsets.extend(_unpack(at))
+    if not offsets:
+        return
+    offsets.sort()
+    with open(path, "rb") as f:
+        for offset in offsets:
+            f.seek(offset)
+            rec = loads(f.readline())
+            if since <= rec["ts"] < until:
+                yield rec
+
+
+def winrate(directory, days=30, now=None, bot=None, symbols=None):
+    """Per symbol over closed signals of the last `days`: closed, win, loss, even, win_rate, avg_pnl_pct."""
+    now = time.time() if now is None else now
+    since = now - days * 86400
+    totals = {}            # {symbol: [win, loss, even, pnl_sum]}
+
+    def add(sym, win, loss, even, pnl):
+        t = totals.setdefault(sym, [0, 0, 0, 0.0])
+        t[0] += win
+        t[1] += loss
+        t[2] += even
+        t[3] += pnl
+
+    for path, idx in segments(directory, bot, since):
+        if idx["t0"] >= since:             # segmen utuh di dalam jendela: cukup agregat di .idx
+            for sym, s in idx["symbols"].items():
+                if "closed" in s and (not symbols or sym in symbols):
+                    add(sym, *s["closed"])
+            continue
+        for rec in _read(path, idx, since, float("inf"), symbols, ("close",)):
+            pnl = rec.get("pnl_pct", 0.0)
+            add(rec["sym"], pnl > 0, pnl < 0, pnl == 0, pnl)
+    out = {}
+    for sym, (win, loss, even, pnl) in totals.items():
+        closed = win + loss + even
+        out[sym] = {"closed": closed, "win": win, "loss": loss, "even": even,
+                    "win_rate": win / closed, "avg_pnl_pct": pnl / closed}
+    return out
+
+
+# ===================== CLI =====================
+def synth(directory, days, per_day, n_symbols, seed=1):
+    """Synthetic history (sinyalbot-like event mix), one segment per day."""
+    rnd = random.Random(seed)
+    syms = [f"SYM{i:03d}USDT" for i in range(n_symbols)]
+    log = EventLog(directory, "synth")
+    start = time.time() - days * 86400
+    for i in range(days * per_day):
+        ts = start + i * 86400 / per_day
+        sym = rnd.choice(syms)
+        ev = rnd.choice(("signal", "update", "tp", "sl", "trail", "close"))
+        fields = {"side": rnd.choice(("LONG", "SHORT")), "price": rnd.uniform(1, 100), "id": f"{sym}:{int(ts)}"}
+        if ev == "close":
+            fields["pnl_pct"] = rnd.uniform(-2, 3)
+            fields["outcome"] = "tp3" if fields["pnl_pct"] > 0 else "sl"
+        log.record(ev, sym, ts=ts, **fields)
+    log.close(timeout=None)
+    print(f"[EVENT] {days * per_day} event sintetis, {log.stats['segments']} segmen di {directory}/")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Query the structured event log")
+    ap.add_argument("command", choices=("winrate", "events", "synth"))
+    ap.add_argument("--dir", default="events")
+    ap.add_argument("--bot", default=None, help="sinyalbot / salamprofit (default: all)")
+    ap.add_argument("--days", type=float, default=30)
+    ap.add_argument("--symbol", action="append", default=None)
+    ap.add_argument("--event", action="append", default=None, choices=EVENTS)
+    ap.add_argument("--per-day", type=int, default=2000, help="synth: events per day")
+    ap.add_argument("--symbols", type=int, default=300, help="synth: number of symbols")
+    args = ap.parse_args()
+
+    if args.command == "synth":
+        synth(args.dir, int(args.days), args.per_day, args.symbols)
+        return
+    t0 = time.perf_counter()
+    if args.command == "events":
+        n = 0
+        for rec in query(args.dir, time.time() - args.days * 86400, None, args.symbol, args.event, args.bot):
+            print(json.dumps(rec, ensure_ascii=False))
+            n += 1
+        print(f"# {n} event, {(time.perf_counter() - t0) * 1000:.1f} ms")
+        return
+    rows = winrate(args.dir, args.days, bot=args.bot, symbols=args.symbol)
+    ms = (time.perf_counter() - t0) * 1000
+    print(f"{'symbol':<14}{'closed':>7}{'win':>6}{'loss':>6}{'even':>6}{'win%':>8}{'avg pnl%':>10}")
+    for sym, r in sorted(rows.items(), key=lambda kv: (-kv[1]["closed"], kv[0])):
+        print(f"{sym:<14}{r['closed']:>7}{r['win']:>6}{r['loss']:>6}{r['even']:>6}"
+              f"{r['win_rate'] * 100:>7.1f}%{r['avg_pnl_pct']:>10.2f}")
+    print(f"# {len(rows)} simbol, {sum(r['closed'] for r in rows.values())} sinyal tertutup, "
+          f"{args.days:g} hari, {ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+# fakeclient.py
+# Offline stand-in for binance.client.Client (futures endpoints used by the bots)
+# - Deterministic synthetic klines / tickers / exchange info for N symbols
+# - Injectable latency and rate-limit errors (429 with Retry-After, 418 ban)
+# - Tracks request weight per minute and exposes x-mbx-used-weight-1m on
+#   `client.response.headers` and to `client.session.hooks["response"]`
+#   (called in the requesting thread), like python-binance / requests do
+# - FixtureClient: same plumbing, but serves klines / tickers / exchange info
+#   recorded from a real client (record_fixture), so benchmark runs see the
+#   same market data every time
+#
+# Demo (serial vs concurrent scan through LimitedClient):
+#   python fakeclient.py
+
+import gzip
+import json
+import math
+import random
+import threading
+import time
+
+from binance.exceptions import BinanceAPIException
+
+from klinecache import INTERVAL_MS
+from ratelimit import request_weight
+
+
+class _FakeResponse:
+    def __init__(self, status_code=200, headers=None, text=""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+        self.request = None
+
+
+class _FakeSession:
+    def __init__(self):
+        self.hooks = {"response": []}
+
+
+def synthetic_symbols(n):
+    base = ["BTC", "ETH", "BNB", "SOL", "XRP", "LTC", "LINK", "ETC", "SUI", "BCH"]
+    out = [f"{b}USDT" for b in base[:n]]
+    i = 0
+    while len(out) < n:
+        out.append(f"SYN{i:03d}USDT")
+        i += 1
+    return out
+
+
+class FakeClient:
+    """Fake futures client with synthetic market data.
+
+    latency: seconds per request (+ up to `jitter` seconds random).
+    error_rate: probability that a request fails with HTTP 429.
+    exact_htf: build higher-TF klines from the 1m series (like the exchange
+    does; slower) instead of synthesizing each TF independently.
+    weight_limit: per-minute weight; exceeding it returns 429 (then 418
+    if the client keeps hammering while limited).
+    """
+
+    def __init__(self, symbols=None, n_symbols=20, latency=0.0, jitter=0.0,
+                 error_rate=0.0, weight_limit=2400, retry_after=1, seed=1, exact_htf=False):
+        self.symbols = list(symbols) if symbols else synthetic_symbols(n_symbols)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.weight_limit = weight_limit
+        self.retry_after = retry_after
+        self.seed = seed
+        self.exact_htf = exact_htf
+        self.response = None
+        self.session = _FakeSession()
+        self.calls = {}
+        self.leverage = {s: 20 for s in self.symbols}
+        self.margin_type = {s: "cross" for s in self.symbols}
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._window = (0, 0)       # (menit, weight terpakai)
+        self._limited_hits = 0
+        self._htf = {}              # exact_htf: bar TF tinggi yang sudah close
+
+    # ---------- plumbing ----------
+    def _request(self, method, weight):
+        delay = self.latency + (self._rnd.random() * self.jitter if self.jitter else 0.0)
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            minute = int(time.time() // 60)
+            win_min, used = self._window
+            if win_min != minute:
+                used = 0
+                self._limited_hits = 0
+            used += weight
+            self._window = (minute, used)
+            inject = self.error_rate and self._rnd.random() < self.error_rate
+            over = used > self.weight_limit
+            if over:
+                self._limited_hits += 1
+        if delay:
+            time.sleep(delay)
+        headers = {"x-mbx-used-weight-1m": str(used)}
+        if inject or over:
+            status = 418 if over and self._limited_hits > 50 else 429
+            body = json.dumps({"code": -1003, "msg": "Too many requests; fake rate limit."})
+            resp = _FakeResponse(status, dict(headers, **{"Retry-After": str(self.retry_after)}), body)
+            self._respond(resp)
+            raise BinanceAPIException(resp, status, body)
+        self._respond(_FakeResponse(200, headers))
+
+    def _respond(self, resp):
+        self.response = resp
+        for hook in self.session.hooks.get("response", ()):
+            hook(resp)
+
+    def _price(self, symbol, t_ms):
+        """Deterministic price path per symbol (smooth trend + noise)."""
+        k = sum(ord(ch) for ch in symbol)
+        base = 10 + (k % 500)
+        x = t_ms / 3_600_000.0
+        noise = random.Random(hash((symbol, t_ms // 60_000, self.seed)) & 0xFFFFFFFF).uniform(-0.002, 0.002)
+        return base * (1 + 0.03 * math.sin(x / 7 + k) + 0.01 * math.sin(x * 1.7 + k / 3) + noise)
+
+    def _bar(self, symbol, t, step):
+        o = self._price(symbol, t)
+        c = self._price(symbol, t + step - 60_000)
+        h = max(o, c) * 1.0015
+        l = min(o, c) * 0.9985
+        v = 100 + (hash((symbol, t)) % 1000)
+        return [t, f"{o:.6f}", f"{h:.6f}", f"{l:.6f}", f"{c:.6f}", f"{v:.3f}", t + step - 1,
+                f"{v * c:.3f}", 100, f"{v / 2:.3f}", f"{v * c / 2:.3f}", "0"]
+
+    # ---------- market data ----------
+    def futures_ping(self):
+        self._request("futures_ping", 1)
+        return {}
+
+    def futures_time(self):
+        self._request("futures_time", 1)
+        return {"serverTime": int(time.time() * 1000)}
+
+    def futures_exchange_info(self):
+        self._request("futures_exchange_info", 1)
+        return {"symbols": [{"symbol": s, "quoteAsset": "USDT", "contractType": "PERPETUAL",
+                             "status": "TRADING"} for s in self.symbols]}
+
+    def futures_klines(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        self._request("futures_klines", request_weight("futures_klines", {"limit": limit}))
+        step = INTERVAL_MS[interval]
+        now = int(time.time() * 1000)
+        cur = now - now % step
+        if endTime is not None:
+            cur = min(cur, endTime - endTime % step)
+        start = cur - (limit - 1) * step if startTime is None else startTime - startTime % step
+        rows, t = [], start
+        while t <= cur and len(rows) < limit:
+            rows.append(self._htf_bar(symbol, t, interval) if self.exact_htf and step > 60_000
+                        else self._bar(symbol, t, step))
+            t += step
+        return rows
+
+    def _htf_bar(self, symbol, t, interval):
+        from resample import aggregate
+        step = INTERVAL_MS[interval]
+        now = int(time.time() * 1000)
+        end = min(t + step, now - now % 60_000 + 60_000)
+        key = (symbol, interval, t)
+        if key in self._htf and end == t + step:
+            return self._htf[key]      # bar yang sudah close tidak berubah
+        bar = aggregate([self._bar(symbol, m, 60_000) for m in range(t, end, 60_000)], interval, t)[0]
+        if end == t + step:
+            self._htf[key] = bar
+        return bar
+
+    def _ticker(self, symbol):
+        now = int(time.time() * 1000)
+        last = self._price(symbol, now)
+        qv = 1_000_000 * (1 + (sum(ord(ch) for ch in symbol) % 40))
+        return {"symbol": symbol, "lastPrice": f"{last:.6f}", "quoteVolume": f"{qv:.2f}",
+                "priceChangePercent": "0.0"}
+
+    def futures_ticker(self, symbol=None):
+        self._request("futures_ticker", 1 if symbol else 40)
+        if symbol:
+            return self._ticker(symbol)
+        return [self._ticker(s) for s in self.symbols]
+
+    def futures_symbol_ticker(self, symbol=None):
+        self._request("futures_symbol_ticker", 1 if symbol else 2)
+        now = int(time.time() * 1000)
+        if symbol:
+            return {"symbol": symbol, "price": f"{self._price(symbol, now):.6f}"}
+        return [{"symbol": s, "price": f"{self._price(s, now):.6f}"} for s in self.symbols]
+
+    def futures_mark_price(self, symbol=None):
+        self._request("futures_mark_price", 1 if symbol else 10)
+        now = int(time.time() * 1000)
+        if symbol:
+            return {"symbol": symbol, "markPrice": f"{self._price(symbol, now):.6f}"}
+        return [{"symbol": s, "markPrice": f"{self._price(s, now):.6f}"} for s in self.symbols]
+
+    # ---------- account ----------
+    def futures_change_leverage(self, symbol, leverage):
+        self._request("futures_change_leverage", 1)
+        self.leverage[symbol] = leverage
+        return {"symbol": symbol, "leverage": leverage}
+
+    def futures_change_margin_type(self, symbol, marginType):
+        self._request("futures_change_margin_type", 1)
+        if self.margin_type.get(symbol) == marginType.lower():
+            body = json.dumps({"code": -4046, "msg": "No need to change margin type."})
+            raise BinanceAPIException(_FakeResponse(400, {}, body), 400, body)
+        self.margin_type[symbol] = marginType.lower()
+        return {"code": 200, "msg": "success"}
+
+    def futures_position_information(self, symbol=None):
+        self._request("futures_position_information", 5)
+        syms = [symbol] if symbol else self.symbols
+        return [{"symbol": s, "leverage": str(self.leverage[s]), "marginType": self.margin_type[s],
+                 "positionAmt": "0"} for s in syms]
+
+    def futures_symbol_config(self, symbol=None):
+        self._request("futures_symbol_config", 5)
+        syms = [symbol] if symbol else self.symbols
+        return [{"symbol": s, "marginType": "ISOLATED" if self.margin_type[s] == "isolated" else "CROSSED",
+                 "isAutoAddMargin": "false", "leverage": self.leverage[s], "maxNotionalValue": "1000000"}
+                for s in syms]
+
+
+# ===================== RECORDED FIXTURES =====================
+FIXTURE_VERSION = 1
+
+
+def _open(path, mode):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.endswith(".gz") else open(path, mode, encoding="utf-8")
+
+
+def record_fixture(client, symbols, intervals, limit=500, path=None):
+    """Snapshot of exchange info, 24h tickers and `limit` klines per (symbol, interval).
+
+    Written as JSON (gzip if `path` ends with .gz) when `path` is given; the
+    fixture dict is returned either way.
+    """
+    wanted = set(symbols)
+    info = client.futures_exchange_info()
+    fixture = {
+        "version": FIXTURE_VERSION,
+        "recorded_at": int(client.futures_time()["serverTime"]),
+        "exchange_info": {"symbols": [s for s in info["symbols"] if s["symbol"] in wanted]},
+        "tickers": [t for t in client.futures_ticker() if t["symbol"] in wanted],
+        "klines": {},
+    }
+    for symbol in symbols:
+        fixture["klines"][symbol] = {
+            tf: client.futures_klines(symbol=symbol, interval=tf, limit=limit) for tf in intervals
+        }
+    if path:
+        with _open(path, "w") as f:
+            json.dump(fixture, f, separators=(",", ":"))
+    return fixture
+
+
+def load_fixture(path):
+    with _open(path, "r") as f:
+        fixture = json.load(f)
+    if fixture.get("version") != FIXTURE_VERSION:
+        raise ValueError(f"{path}: fixture version {fixture.get('version')}, expected {FIXTURE_VERSION}")
+    return fixture
+
+
+class FixtureClient(FakeClient):
+    """FakeClient that replays a recorded fixture (see record_fixture).
+
+    Each recorded kline series is shifted by whole bars so that its last
+    bar is the bar open right now: the cache/refresh logic runs exactly as
+    against the exchange, and every run sees the same prices. Intervals
+    that were not recorded return no rows.
+    """
+
+    def __init__(self, fixture, latency=0.0, jitter=0.0, weight_limit=10 ** 9, **kwargs):
+        if isinstance(fixture, str):
+            fixture = load_fixture(fixture)
+        super().__init__(symbols=[s["symbol"] for s in fixture["exchange_info"]["symbols"]],
+                         latency=latency, jitter=jitter, weight_limit=weight_limit, **kwargs)
+        self.fixture = fixture
+        self._klines = fixture["klines"]
+        self._tickers = {t["symbol"]: t for t in fixture["tickers"]}
+
+    def futures_exchange_info(self):
+        self._request("futures_exchange_info", 1)
+        return self.fixture["exchange_info"]
+
+    def futures_klines(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        self._request("futures_klines", request_weight("futures_klines", {"limit": limit}))
+        rows = self._klines.get(symbol, {}).get(interval)
+        if not rows:
+            return []
+        step = INTERVAL_MS[interval]
+        now = int(time.time() * 1000)
+        first = int(rows[0][0])
+        shift = now - now % step - int(rows[-1][0])
+        # baris rekaman kontigu: indeks dihitung langsung dari waktu
+        lo, hi = 0, len(rows)
+        if endTime is not None:
+            hi = max(0, min(hi, (endTime - shift - first) // step + 1))
+        if startTime is not None:
+            lo = max(0, -(-(startTime - shift - first) // step))
+            hi = min(hi, lo + limit)
+        else:
+            lo = max(lo, hi - limit)
+        return [[int(r[0]) + shift] + r[1:6] + [int(r[6]) + shift] + r[7:] for r in rows[lo:hi]]
+
+    def _ticker(self, symbol):
+        return self._tickers[symbol]
+
+    def _last(self, symbol):
+        return self._tickers[symbol]["lastPrice"]
+
+    def futures_symbol_ticker(self, symbol=None):
+        self._request("futures_symbol_ticker", 1 if symbol else 2)
+        if symbol:
+            return {"symbol": symbol, "price": self._last(symbol)}
+        return [{"symbol": s, "price": self._last(s)} for s in self.symbols]
+
+    def futures_mark_price(self, symbol=None):
+        self._request("futures_mark_price", 1 if symbol else 10)
+        if symbol:
+            return {"symbol": symbol, "markPrice": self._last(symbol)}
+        return [{"symbol": s, "markPrice": self._last(s)} for s in self.symbols]
+
+
+if __name__ == "__main__":
+    from ratelimit import LimitedClient, scan_concurrent
+
+    fake = FakeClient(n_symbols=50, latency=0.05, jitter=0.02, error_rate=0.01, retry_after=1)
+    client = LimitedClient(fake)
+    tfs = ["1m", "5m", "15m", "1h", "4h"]
+
+    def scan(sym):
+        for tf in tfs:
+            client.futures_klines(symbol=sym, interval=tf, limit=200)
+
+    for workers in (1, 16):
+        t0 = time.time()
+        scan_concurrent(scan, fake.symbols, workers)
+        print(f"workers={workers:2d}: {time.time() - t0:.2f}s untuk {len(fake.symbols)} simbol x {len(tfs)} TF")
+    print("limiter:", client.limiter.stats, "| used weight:", client.limiter.used_weight)
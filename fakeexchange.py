@@ -0,0 +1,294 @@
+# fakeexchange.py
+# Local stand-in for the Binance USDT-M futures API (REST over HTTP + kline/markPrice WebSocket)
+# - Serves the endpoints the bots use through an unmodified python-binance
+#   Client (point Client.FUTURES_URL at `rest_url`): ping, time, exchangeInfo,
+#   klines, ticker/24hr, ticker/price, premiumIndex, leverage, marginType,
+#   positionRisk, symbolConfig
+# - Market data comes from a fakeclient backend: FakeClient (synthetic price
+#   paths for any number of symbols) or FixtureClient (recorded, replayed)
+# - Request weight per minute like the exchange (same table as ratelimit.py),
+#   X-MBX-USED-WEIGHT-1M on every answer, 429 + Retry-After over the limit and
+#   a 418 ban for clients that keep going; per-request latency + jitter and
+#   optional random 429s
+# - WebSocket (wsstream.FakeStreamServer): every ws_push_sec the open bar of
+#   each subscribed <symbol>@kline_<tf> stream and the mark price, plus the
+#   closed bar right after every close
+#
+# Standalone (e.g. to point a bot in another process at it):
+#   python fakeexchange.py --symbols 500 --port 8090 --ws-port 8091
+
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from binance.exceptions import BinanceAPIException
+
+from fakeclient import FakeClient, FixtureClient
+from klinecache import INTERVAL_MS
+from ratelimit import request_weight, WEIGHT_LIMIT_1M
+from wsstream import FakeStreamServer
+
+BAN_AFTER_429 = 50           # 429 dalam satu menit sebelum client di-ban (418)
+BAN_SEC = 60
+WS_PUSH_SEC = 2.0
+
+
+def _int(params, key):
+    return int(params[key]) if key in params else None
+
+
+class FakeExchange:
+    """HTTP + WebSocket stand-in for fapi.binance.com on top of a fakeclient market.
+
+    latency/jitter: seconds added to every REST answer. error_rate: share of
+    requests answered with a random 429. `stats` counts requests, weight,
+    429/418 answers, per-endpoint calls and WS messages.
+    """
+
+    def __init__(self, market, host="127.0.0.1", port=0, ws_port=0, weight_limit=WEIGHT_LIMIT_1M,
+                 latency=0.02, jitter=0.01, error_rate=0.0, ws_push_sec=WS_PUSH_SEC, seed=1):
+        self.market = market
+        self.host = host
+        self.port = port
+        self.weight_limit = weight_limit
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.ws_push_sec = ws_push_sec
+        self.stream = FakeStreamServer(host, ws_port)
+        self.stats = {"requests": 0, "weight": 0, "429": 0, "418": 0, "ws_messages": 0, "endpoints": {}}
+        self.weight_history = []    # [(menit, weight)] menit yang sudah lewat
+        self._window = (0, 0, 0)    # (menit, weight, 429 di menit ini)
+        self._banned_until = 0.0
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._httpd = None
+        self._threads = []
+        self._routes = {
+            ("GET", "ping"): lambda p: {},
+            ("GET", "time"): lambda p: {"serverTime": int(time.time() * 1000)},
+            ("GET", "exchangeInfo"): lambda p: market.futures_exchange_info(),
+            ("GET", "klines"): lambda p: market.futures_klines(
+                p["symbol"], p["interval"], _int(p, "limit") or 500, _int(p, "startTime"), _int(p, "endTime")),
+            ("GET", "ticker/24hr"): lambda p: market.futures_ticker(p.get("symbol")),
+            ("GET", "ticker/price"): lambda p: market.futures_symbol_ticker(p.get("symbol")),
+            ("GET", "premiumIndex"): lambda p: market.futures_mark_price(p.get("symbol")),
+            ("POST", "leverage"): lambda p: dict(market.futures_change_leverage(p["symbol"], int(p["leverage"])),
+                                                 maxNotionalValue="1000000"),
+            ("POST", "marginType"): lambda p: market.futures_change_margin_type(p["symbol"], p["marginType"]),
+            ("GET", "positionRisk"): lambda p: market.futures_position_information(p.get("symbol")),
+            ("GET", "symbolConfig"): lambda p: market.futures_symbol_config(p.get("symbol")),
+        }
+        # nama endpoint -> nama method python-binance (tabel bobot di ratelimit.py)
+        self._method = {"klines": "futures_klines", "ticker/24hr": "futures_ticker",
+                        "ticker/price": "futures_symbol_ticker", "premiumIndex": "futures_mark_price",
+                        "positionRisk": "futures_position_information", "symbolConfig": "futures_symbol_config"}
+
+    @property
+    def rest_url(self):
+        return f"http://{self.host}:{self.port}/fapi"
+
+    @property
+    def ws_url(self):
+        return self.stream.url
+
+    # ---------- lifecycle ----------
+    def start(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                exchange._handle(self, "GET")
+
+            def do_POST(self):
+                exchange._handle(self, "POST")
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self.stream.start()
+        for target, name in ((self._httpd.serve_forever, "fake-exchange-http"), (self._publish_loop, "fake-exchange-ws")):
+            t = threading.Thread(target=target, name=name, daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+        self.stream.stop()
+
+    # ---------- REST ----------
+    def _handle(self, req, method):
+        url = urlsplit(req.path)
+        params = dict(parse_qsl(url.query))
+        if method == "POST":
+            length = int(req.headers.get("Content-Length") or 0)
+            params.update(parse_qsl(req.rfile.read(length).decode()))
+        parts = url.path.strip("/").split("/", 2)      # fapi, v1, endpoint
+        endpoint = parts[2] if len(parts) == 3 and parts[0] == "fapi" else None
+        route = self._routes.get((method, endpoint))
+        if route is None:
+            return self._reply(req, 404, {"code": -5000, "msg": f"Path {url.path} not found"}, 0)
+
+        kwargs = {k: params[k] for k in ("symbol",) if k in params}
+        if "limit" in params:
+            kwargs["limit"] = int(params["limit"])
+        weight = request_weight(self._method.get(endpoint, endpoint), kwargs)
+        status, used, retry_after = self._charge(endpoint, weight)
+        delay = self.latency + (self._rnd.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            time.sleep(delay)
+        if status != 200:
+            body = {"code": -1003, "msg": "Too many requests; fake rate limit." if status == 429
+                    else "Way too many requests; IP banned (fake)."}
+            return self._reply(req, status, body, used, {"Retry-After": str(retry_after)})
+        try:
+            return self._reply(req, 200, route(params), used)
+        except BinanceAPIException as e:
+            return self._reply(req, e.status_code, {"code": e.code, "msg": e.message}, used)
+        except (KeyError, ValueError) as e:
+            return self._reply(req, 400, {"code": -1102, "msg": f"Bad or missing parameter: {e}"}, used)
+
+    def _charge(self, endpoint, weight):
+        """(status, used weight this minute, Retry-After) of one request."""
+        now = time.time()
+        minute = int(now // 60)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["endpoints"][endpoint] = self.stats["endpoints"].get(endpoint, 0) + 1
+            win_min, used, limited = self._window
+            if win_min != minute:
+                if win_min:
+                    self.weight_history.append((win_min, used))
+                used, limited = 0, 0
+            retry = max(1, math.ceil((minute + 1) * 60 - now))
+            if now < self._banned_until:
+                self.stats["418"] += 1
+                self._window = (minute, used, limited)
+                return 418, used, max(1, math.ceil(self._banned_until - now))
+            used += weight
+            self.stats["weight"] += weight
+            status = 200
+            if used > self.weight_limit or (self.error_rate and self._rnd.random() < self.error_rate):
+                limited += 1
+                status = 429
+                if limited > BAN_AFTER_429:
+                    self._banned_until = now + BAN_SEC
+                    status, retry = 418, BAN_SEC
+                self.stats[str(status)] += 1
+            self._window = (minute, used, limited)
+            return status, used, retry
+
+    def _reply(self, req, status, payload, used, headers=None):
+        data = json.dumps(payload, separators=(",", ":")).encode()
+        req.send_response(status)
+        req.send_header("Content-Type", "application/json")
+        req.send_header("Content-Length", str(len(data)))
+        req.send_header("X-MBX-USED-WEIGHT-1M", str(used))
+        for key, value in (headers or {}).items():
+            req.send_header(key, value)
+        req.end_headers()
+        req.wfile.write(data)
+
+    # ---------- WebSocket ----------
+    def _subscribed(self):
+        by_lower = {s.lower(): s for s in self.market.symbols}
+        klines, marks = [], []
+        for name in self.stream.subscriptions():
+            sym, _, kind = name.partition("@")
+            if sym not in by_lower:
+                continue
+            if kind.startswith("kline_"):
+                klines.append((by_lower[sym], kind[6:]))
+            elif kind.startswith("markPrice"):
+                marks.append(by_lower[sym])
+        return sorted(klines), sorted(marks)
+
+    def _publish_loop(self):
+        last_minute = int(time.time() // 60)
+        while not self._stop.is_set():
+            now = time.time()
+            minute = int(now // 60)
+            # tidur sampai push berikutnya, atau tepat ke close menit berikutnya kalau lebih dulu
+            self._stop.wait(max(0.0, min(self.ws_push_sec, (minute + 1) * 60 - now + 0.05)))
+            minute = int(time.time() // 60)
+            closed_at = minute * 60_000 if minute != last_minute else None
+            last_minute = minute
+            try:
+                self._push(closed_at)
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"[FAKEX] push gagal: {e}")
+
+    def _push(self, closed_at):
+        klines, marks = self._subscribed()
+        n = 0
+        for sym, tf in klines:
+            rows = self.market.futures_klines(sym, tf, 2)
+            if not rows:
+                continue
+            if closed_at is not None and closed_at % INTERVAL_MS[tf] == 0 and len(rows) == 2:
+                self.stream.push_kline(sym, tf, rows[-2], True)
+                n += 1
+            self.stream.push_kline(sym, tf, rows[-1], False)
+            n += 1
+        for sym in marks:
+            self.stream.push_mark(sym, self.market.futures_mark_price(sym)["markPrice"])
+            n += 1
+        with self._lock:
+            self.stats["ws_messages"] += n
+
+    def weight_per_minute(self):
+        """Weight of every finished minute so far, oldest first."""
+        with self._lock:
+            return [w for _, w in self.weight_history]
+
+
+def make_market(n_symbols=500, fixture=None, seed=1):
+    """Market backend: recorded fixture if given, otherwise synthetic paths for n_symbols."""
+    if fixture:
+        return FixtureClient(fixture)
+    return FakeClient(n_symbols=n_symbols, weight_limit=10 ** 9, seed=seed)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local stand-in for the Binance USDT-M futures API")
+    ap.add_argument("--symbols", type=int, default=500)
+    ap.add_argument("--fixture", help="replay a recorded fixture (bench.py record) instead of synthetic paths")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    ap.add_argument("--ws-port", type=int, default=8091)
+    ap.add_argument("--weight-limit", type=int, default=WEIGHT_LIMIT_1M)
+    ap.add_argument("--latency", type=float, default=0.02)
+    ap.add_argument("--jitter", type=float, default=0.01)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+    ex = FakeExchange(make_market(args.symbols, args.fixture), args.host, args.port, args.ws_port,
+                      args.weight_limit, args.latency, args.jitter, args.error_rate).start()
+    print(f"[FAKEX] {len(ex.market.symbols)} simbol | REST {ex.rest_url} | WS {ex.ws_url}")
+    try:
+        while True:
+            time.sleep(60)
+            s = ex.stats
+            print(f"[FAKEX] {s['requests']} request, weight {s['weight']}, 429 {s['429']}, 418 {s['418']}, "
+                  f"ws {s['ws_messages']} pesan")
+    except KeyboardInterrupt:
+        ex.stop()
+
+
+if __name__ == "__main__":
+    main()
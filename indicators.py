@@ -0,0 +1,445 @@
+# indicators.py
+# Streaming indicator engine (O(1) per new / revised candle)
+# - Same definitions as the `ta` library used by sinyalbot.py & salamprofit.py:
+#   SMA, EMA, Wilder RSI, ATR, ADX, Bollinger Bands, rolling mean, StochRSI
+# - update(...) appends a new bar, revise(...) replaces the still-open last bar
+# - IndicatorSet binds a bundle of indicators to one (symbol, interval) kline
+#   buffer: seeded once from history, then only new/open bars are processed
+#
+# Self-check against ta (needs pandas + ta, skipped without ta):
+#   python indicators.py
+# Tests against vectors recorded from ta (tests/data) and panel.py (no ta needed):
+#   python -m pytest tests/test_indicators.py
+
+import math
+from collections import deque
+
+import metrics
+
+NAN = float("nan")
+RESUM_EVERY = 1000   # hitung ulang running sum sesekali supaya error float tidak menumpuk
+
+
+class _Window:
+    """Fixed-size rolling window with running sum / sum of squares (NaN aware)."""
+
+    __slots__ = ("n", "buf", "sum", "sumsq", "nans", "ref", "_ops")
+
+    def __init__(self, n):
+        self.n = n
+        self.buf = deque()
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.nans = 0
+        self.ref = None      # shift reference -> variance tanpa cancellation besar
+        self._ops = 0
+
+    def _add(self, x):
+        if x != x:
+            self.nans += 1
+            return
+        if self.ref is None:
+            self.ref = x
+        d = x - self.ref
+        self.sum += d
+        self.sumsq += d * d
+
+    def _remove(self, x):
+        if x != x:
+            self.nans -= 1
+            return
+        d = x - self.ref
+        self.sum -= d
+        self.sumsq -= d * d
+
+    def push(self, x):
+        self.buf.append(x)
+        self._add(x)
+        if len(self.buf) > self.n:
+            self._remove(self.buf.popleft())
+        self._ops += 1
+        if self._ops >= RESUM_EVERY:
+            self._resum()
+
+    def revise(self, x):
+        self._remove(self.buf[-1])
+        self.buf[-1] = x
+        self._add(x)
+
+    def _resum(self):
+        self._ops = 0
+        self.sum = self.sumsq = 0.0
+        self.nans = 0
+        self.ref = None
+        for x in self.buf:
+            self._add(x)
+
+    def full(self):
+        return len(self.buf) == self.n and self.nans == 0
+
+    def mean(self):
+        if not self.full():
+            return NAN
+        return self.ref + self.sum / self.n
+
+    def std(self):
+        """Population std (ddof=0), like ta's BollingerBands."""
+        if not self.full():
+            return NAN
+        m = self.sum / self.n
+        return math.sqrt(max(self.sumsq / self.n - m * m, 0.0))
+
+
+class _Recursive:
+    """Base for indicators whose state is a few scalars.
+
+    update() snapshots the scalar state first, so revise() can roll back the
+    last bar and re-apply it with the revised values.
+    """
+
+    _fields = ()
+
+    def update(self, *bar):
+        self._prev = tuple(getattr(self, f) for f in self._fields)
+        self.value = self._step(*bar)
+        return self.value
+
+    def revise(self, *bar):
+        for f, v in zip(self._fields, self._prev):
+            setattr(self, f, v)
+        self.value = self._step(*bar)
+        return self.value
+
+
+# ===================== INDICATORS =====================
+class SMA:
+    """Simple moving average (ta SMAIndicator / Series.rolling(window).mean())."""
+
+    def __init__(self, window):
+        self.win = _Window(window)
+        self.value = NAN
+
+    def update(self, x):
+        self.win.push(x)
+        self.value = self.win.mean()
+        return self.value
+
+    def revise(self, x):
+        self.win.revise(x)
+        self.value = self.win.mean()
+        return self.value
+
+
+RollingMean = SMA   # rolling(20).mean() untuk volume / ATR
+
+
+class EMA(_Recursive):
+    """ta EMAIndicator: ewm(span=window, adjust=False, min_periods=window)."""
+
+    _fields = ("ema", "count")
+
+    def __init__(self, window):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.ema = None
+        self.count = 0
+        self.value = NAN
+
+    def _step(self, x):
+        self.ema = x if self.ema is None else (1 - self.alpha) * self.ema + self.alpha * x
+        self.count += 1
+        return self.ema if self.count >= self.window else NAN
+
+
+class RSI(_Recursive):
+    """ta RSIIndicator: Wilder smoothing (ewm alpha=1/window, adjust=False)."""
+
+    _fields = ("prev_close", "up", "dn", "count")
+
+    def __init__(self, window=14):
+        self.window = window
+        self.alpha = 1.0 / window
+        self.prev_close = None
+        self.up = self.dn = 0.0
+        self.count = 0
+        self.value = NAN
+
+    def _step(self, close):
+        if self.prev_close is None:
+            u = d = 0.0      # ta: diff pertama NaN -> diganti 0.0
+        else:
+            diff = close - self.prev_close
+            u = diff if diff > 0 else 0.0
+            d = -diff if diff < 0 else 0.0
+        if self.count == 0:
+            self.up, self.dn = u, d
+        else:
+            self.up = (1 - self.alpha) * self.up + self.alpha * u
+            self.dn = (1 - self.alpha) * self.dn + self.alpha * d
+        self.count += 1
+        self.prev_close = close
+        if self.count < self.window:
+            return NAN
+        if self.dn == 0:
+            return 100.0
+        return 100 - 100 / (1 + self.up / self.dn)
+
+
+class ATR(_Recursive):
+    """ta AverageTrueRange (0.0 during warm-up, like ta)."""
+
+    _fields = ("prev_close", "count", "tr_sum", "atr")
+
+    def __init__(self, window=14):
+        self.window = window
+        self.prev_close = None
+        self.count = 0
+        self.tr_sum = 0.0
+        self.atr = 0.0
+        self.value = 0.0
+
+    def _step(self, high, low, close):
+        if self.prev_close is None:
+            tr = high - low
+        else:
+            tr = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+        w = self.window
+        if self.count < w:
+            self.tr_sum += tr
+            if self.count == w - 1:
+                self.atr = self.tr_sum / w
+        else:
+            self.atr = (self.atr * (w - 1) + tr) / w
+        self.count += 1
+        self.prev_close = close
+        return self.atr
+
+
+class ADX(_Recursive):
+    """ta ADXIndicator.adx() (0.0 until 2*window-1 bars, like ta)."""
+
+    _fields = ("prev", "count", "tr_s", "dp_s", "dn_s", "di_sum", "adx")
+
+    def __init__(self, window=14):
+        self.window = window
+        self.prev = None          # (high, low, close) bar sebelumnya
+        self.count = 0
+        self.tr_s = self.dp_s = self.dn_s = 0.0
+        self.di_sum = 0.0
+        self.adx = 0.0
+        self.value = 0.0
+
+    def _step(self, high, low, close):
+        w = self.window
+        t = self.count
+        if t > 0:
+            ph, pl, pc = self.prev
+            tr = max(high, pc) - min(low, pc)
+            up, down = high - ph, pl - low
+            pdm = up if (up > down and up > 0) else 0.0
+            ndm = down if (down > up and down > 0) else 0.0
+            if t <= w:
+                self.tr_s += tr
+                self.dp_s += pdm
+                self.dn_s += ndm
+            else:
+                self.tr_s = self.tr_s - self.tr_s / w + tr
+                self.dp_s = self.dp_s - self.dp_s / w + pdm
+                self.dn_s = self.dn_s - self.dn_s / w + ndm
+            if t >= w:
+                dip = 100 * self.dp_s / self.tr_s if self.tr_s != 0 else 0.0
+                din = 100 * self.dn_s / self.tr_s if self.tr_s != 0 else 0.0
+                di = 100 * abs((dip - din) / (dip + din)) if dip + din != 0 else 0.0
+                if t < 2 * w - 1:
+                    self.di_sum += di
+                elif t == 2 * w - 1:
+                    self.adx = (self.di_sum + di) / w
+                else:
+                    self.adx = (self.adx * (w - 1) + di) / w
+        self.count += 1
+        self.prev = (high, low, close)
+        return self.adx if t >= 2 * w - 1 else 0.0
+
+
+class BollingerBands:
+    """ta BollingerBands: SMA ± window_dev * population std."""
+
+    def __init__(self, window=20, window_dev=2):
+        self.win = _Window(window)
+        self.window_dev = window_dev
+        self.mavg = self.hband = self.lband = NAN
+
+    def _calc(self):
+        self.mavg = self.win.mean()
+        dev = self.window_dev * self.win.std()
+        self.hband = self.mavg + dev
+        self.lband = self.mavg - dev
+        return self.hband, self.lband
+
+    def update(self, x):
+        self.win.push(x)
+        return self._calc()
+
+    def revise(self, x):
+        self.win.revise(x)
+        return self._calc()
+
+
+class StochRSI:
+    """ta StochRSIIndicator.stochrsi_k(): rolling-mean(smooth1) of (rsi-min)/(max-min)."""
+
+    def __init__(self, window=14, smooth1=3, smooth2=3):
+        self.rsi = RSI(window)
+        self.rsi_win = _Window(window)
+        self.k_win = _Window(smooth1)
+        self.smooth2 = smooth2   # %D tidak dipakai bot, disimpan untuk kelengkapan
+        self.value = NAN
+
+    def _stoch(self, r):
+        if not self.rsi_win.full():
+            return NAN
+        lo, hi = min(self.rsi_win.buf), max(self.rsi_win.buf)
+        if hi == lo:
+            return NAN
+        return (r - lo) / (hi - lo)
+
+    def update(self, close):
+        r = self.rsi.update(close)
+        self.rsi_win.push(r)
+        self.k_win.push(self._stoch(r))
+        self.value = self.k_win.mean()
+        return self.value
+
+    def revise(self, close):
+        r = self.rsi.revise(close)
+        self.rsi_win.revise(r)
+        self.k_win.revise(self._stoch(r))
+        self.value = self.k_win.mean()
+        return self.value
+
+
+# ===================== BINDING TO KLINE BUFFERS =====================
+class IndicatorSet:
+    """Indicators bound to one (symbol, interval) kline buffer.
+
+    Subclasses implement `_build()` (create indicators) and
+    `_update(row, revise)` (feed one raw kline row). sync() seeds once from
+    the full history; later calls only revise the last processed bar and
+    push rows newer than it. If the buffer no longer contains the last
+    processed bar (gap / restart) the set is rebuilt from scratch.
+    """
+
+    def __init__(self):
+        self.last_open = None
+        self.last_row = None
+        self._build()
+
+    def _build(self):
+        raise NotImplementedError
+
+    def _update(self, row, revise):
+        raise NotImplementedError
+
+    def sync(self, rows):
+        if not rows:
+            return self
+        if metrics.enabled:     # dipanggil per simbol per TF: tanpa metrics cukup satu cek atribut
+            with metrics.timer("indicator_sync_seconds", set=type(self).__name__):
+                self._sync(rows)
+        else:
+            self._sync(rows)
+        return self
+
+    def _sync(self, rows):
+        start = 0
+        if self.last_open is not None:
+            idx = None
+            for i in range(len(rows) - 1, -1, -1):   # biasanya cuma 1-2 langkah
+                t = int(rows[i][0])
+                if t == self.last_open:
+                    idx = i
+                    break
+                if t < self.last_open:
+                    break
+            if idx is None:
+                self.__init__()
+            else:
+                self._update(rows[idx], True)
+                self.last_row = rows[idx]
+                start = idx + 1
+        for row in rows[start:]:
+            self._update(row, False)
+            self.last_open = int(row[0])
+            self.last_row = row
+
+    def push(self, row):
+        """Feed one row: revise it if it is the last processed bar, else append it."""
+        t = int(row[0])
+        revise = t == self.last_open
+        if not revise and self.last_open is not None and t < self.last_open:
+            raise ValueError("row older than the last processed bar")
+        self._update(row, revise)
+        self.last_open = t
+        self.last_row = row
+        return self
+
+
+def _self_check(n=600, seed=7):
+    """Compare streaming output (incl. revised bars) with ta on a random walk."""
+    import random
+    import pandas as pd
+    from ta.trend import SMAIndicator, EMAIndicator, ADXIndicator
+    from ta.momentum import RSIIndicator, StochRSIIndicator
+    from ta.volatility import AverageTrueRange, BollingerBands as TaBB
+
+    rnd = random.Random(seed)
+    close, high, low = [], [], []
+    p = 100.0
+    for _ in range(n):
+        p *= 1 + rnd.gauss(0, 0.01)
+        close.append(p)
+        high.append(p * (1 + abs(rnd.gauss(0, 0.004))))
+        low.append(p * (1 - abs(rnd.gauss(0, 0.004))))
+    c, h, l = pd.Series(close), pd.Series(high), pd.Series(low)
+    ref = {
+        "sma": SMAIndicator(c, 20).sma_indicator(),
+        "ema": EMAIndicator(c, 50).ema_indicator(),
+        "rsi": RSIIndicator(c, 14).rsi(),
+        "atr": AverageTrueRange(h, l, c, 14).average_true_range(),
+        "adx": ADXIndicator(h, l, c, 14).adx(),
+        "bbh": TaBB(c, 20, 2).bollinger_hband(),
+        "bbl": TaBB(c, 20, 2).bollinger_lband(),
+        "stk": StochRSIIndicator(c, 14, 3, 3).stochrsi_k(),
+    }
+    ind = {"sma": SMA(20), "ema": EMA(50), "rsi": RSI(14), "atr": ATR(14),
+           "adx": ADX(14), "bb": BollingerBands(20, 2), "stk": StochRSI(14, 3, 3)}
+    worst = {k: 0.0 for k in ref}
+    for i in range(n):
+        # feed a bogus "open" value first, then revise it to the final bar
+        for op, (hh, ll, cc) in (("update", (high[i] * 1.01, low[i] * 0.99, close[i] * 1.005)),
+                                 ("revise", (high[i], low[i], close[i]))):
+            out = {
+                "sma": getattr(ind["sma"], op)(cc), "ema": getattr(ind["ema"], op)(cc),
+                "rsi": getattr(ind["rsi"], op)(cc), "atr": getattr(ind["atr"], op)(hh, ll, cc),
+                "adx": getattr(ind["adx"], op)(hh, ll, cc), "stk": getattr(ind["stk"], op)(cc),
+            }
+            out["bbh"], out["bbl"] = getattr(ind["bb"], op)(cc)
+        for k, series in ref.items():
+            a, b = out[k], float(series.iloc[i])
+            if math.isnan(a) or math.isnan(b):
+                assert math.isnan(a) and math.isnan(b), (k, i, a, b)
+                continue
+            worst[k] = max(worst[k], abs(a - b) / max(1.0, abs(b)))
+    for k, err in worst.items():
+        print(f"{k:4s} max rel err {err:.2e}")
+        assert err < 1e-9, k
+    print("OK: streaming indicators match ta")
+
+
+if __name__ == "__main__":
+    try:
+        import ta  # noqa: F401
+    except ImportError:
+        print("SKIP: ta tidak terpasang (tests/test_indicators.py memakai vektor referensi ta di tests/data)")
+    else:
+        _self_check()
@@ -0,0 +1,268 @@
+# klinecache.py
+# Shared kline cache for sinyalbot.py & salamprofit.py
+# - One fixed-size ring buffer (deque) per (symbol, interval)
+# - Cold fill once, afterwards only fetch candles newer than the last CLOSED bar
+#   and patch the still-open bar in place
+# - Raw kline rows are kept exactly as returned by futures_klines, so callers
+#   can keep building their DataFrames the same way
+# - Optional WebSocket feed (wsstream.py) patches the same buffers; streamed
+#   keys are served from memory without REST
+# - Optional KlineStore (klinestore.py): cold fills warm-start from disk and
+#   every closed candle that passes through the cache is persisted
+# - Thread-safe: one lock per (symbol, interval), so concurrent scans fetch
+#   different keys in parallel while the same key is never fetched twice
+# - Numeric view: get_bars() returns contiguous numpy columns that are parsed
+#   incrementally (klineparse.py), for the vectorized panel scans
+# - Optional derive mode: higher timeframes are seeded over REST once (long
+#   lookbacks such as EMA200 on 1h), then maintained from the 1m buffer
+#   (resample.py) -> one REST request per symbol per scan instead of one per TF
+
+import time
+import threading
+from collections import deque
+
+import metrics
+from klineparse import KlineArray
+
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "6h": 21_600_000,
+    "8h": 28_800_000, "12h": 43_200_000, "1d": 86_400_000, "3d": 259_200_000,
+    "1w": 604_800_000,
+}
+
+MAX_KLINES_PER_CALL = 1500     # futures_klines hard limit
+CLOSE_GRACE_MS = 2_000         # bar dianggap final kalau di-fetch > 2s setelah close_time
+DERIVE_FRESH_MS = 1_000        # derive mode: buffer 1m sefresh ini tidak di-fetch ulang
+
+
+class KlineCache:
+    """Ring buffer kline per (symbol, interval) with incremental refresh."""
+
+    def __init__(self, client, store=None, derive=False):
+        self.client = client
+        self.store = store      # KlineStore atau None
+        self.derive = derive    # True: TF > 1m dibangun dari buffer 1m, REST hanya untuk seed
+        self._buffers = {}      # {(symbol, interval): deque of raw kline rows}
+        self._arrays = {}       # {(symbol, interval): KlineArray} kolom numpy dari buffer yang sama
+        self._synced = {}       # {(symbol, interval): ms timestamp of last successful fetch}
+        self._streamed = set()  # keys currently kept fresh by a WebSocket stream
+        self._lock = threading.RLock()   # guards the dicts/stats, never held during REST
+        self._key_locks = {}             # {(symbol, interval): RLock}
+        self.stats = {"cold": 0, "incremental": 0, "rows": 0, "streamed": 0, "derived": 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.RLock()
+            return lock
+
+    def get(self, symbol, interval, limit):
+        """Return the newest `limit` raw klines (same format as client.futures_klines)."""
+        with self._key_lock((symbol, interval)), metrics.timer("kline_get_seconds", interval=interval):
+            buf = self._fresh(symbol, interval, limit)
+            if len(buf) <= limit:
+                return list(buf)
+            return list(buf)[-limit:]
+
+    def _fresh(self, symbol, interval, limit):
+        key = (symbol, interval)
+        buf = self._buffers.get(key)
+        if buf is None or buf.maxlen < limit:
+            return self._cold_fill(symbol, interval, limit)
+        if key not in self._streamed and not (self.derive and self._derive(symbol, interval, buf)):
+            return self._refresh(symbol, interval, buf)
+        return buf
+
+    def get_bars(self, symbol, interval, limit):
+        """get() as contiguous numpy columns (klineparse.Bars); views stay valid until the next call."""
+        with self._key_lock((symbol, interval)):
+            with metrics.timer("kline_get_seconds", interval=interval):
+                self._fresh(symbol, interval, limit)
+            return self.bars(symbol, interval, limit)
+
+    def bars(self, symbol, interval, limit=None):
+        """Buffered bars as numpy columns without any REST call (only new/open rows are parsed)."""
+        key = (symbol, interval)
+        with self._key_lock(key):
+            buf = self._buffers.get(key)
+            if not buf:
+                return KlineArray(1).bars()
+            arr = self._arrays.get(key)
+            if arr is None or arr.maxlen < buf.maxlen:
+                arr = self._arrays[key] = KlineArray(buf.maxlen)
+            return arr.sync(buf).bars(limit)
+
+    def peek(self, symbol, interval):
+        """Buffered rows without any REST call ([] if the key was never fetched)."""
+        with self._key_lock((symbol, interval)):
+            return list(self._buffers.get((symbol, interval), ()))
+
+    # ---------- streaming hooks (dipakai wsstream.MarketStream) ----------
+    def set_streaming(self, keys, on):
+        """Mark keys as stream-fed (skip REST in get) or back to polling."""
+        with self._lock:
+            for key in keys:
+                if on:
+                    self._streamed.add(key)
+                else:
+                    self._streamed.discard(key)
+
+    def apply(self, symbol, interval, row, closed):
+        """Patch one streamed kline row. Returns False if the buffer needs a REST backfill."""
+        key = (symbol, interval)
+        with self._key_lock(key):
+            buf = self._buffers.get(key)
+            if not buf:
+                return False
+            if int(row[0]) > int(buf[-1][0]) + INTERVAL_MS[interval]:
+                return False   # ada bar yang terlewat (gap)
+            self._merge(buf, [row])
+            if closed:
+                # bar final -> refresh REST berikutnya mulai dari bar setelahnya
+                self._synced[key] = max(self._synced[key], int(row[6]) + CLOSE_GRACE_MS + 1)
+                if self.store is not None:
+                    self.store.append(symbol, interval, [row], int(row[6]) + 1)
+            self._count("streamed")
+            return True
+
+    def backfill(self, symbol, interval, limit=None):
+        """Fill gaps via REST (after reconnect / missed bars). Cold fill if never seeded."""
+        key = (symbol, interval)
+        with self._key_lock(key):
+            buf = self._buffers.get(key)
+            if buf is None:
+                if limit:
+                    self._cold_fill(symbol, interval, limit)
+                return
+            self._refresh(symbol, interval, buf)
+
+    def _cold_fill(self, symbol, interval, limit):
+        now_ms = int(time.time() * 1000)
+        if self.store is not None:
+            kl = self.store.warm_rows(self.client, symbol, interval, limit)
+        else:
+            kl = self.client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+        buf = deque(kl, maxlen=limit)
+        self._buffers[(symbol, interval)] = buf
+        self._synced[(symbol, interval)] = now_ms
+        self._count("cold", len(kl))
+        return buf
+
+    def _refresh(self, symbol, interval, buf):
+        key = (symbol, interval)
+        if not buf:
+            return self._cold_fill(symbol, interval, buf.maxlen)
+
+        step = INTERVAL_MS[interval]
+        now_ms = int(time.time() * 1000)
+        last_open = int(buf[-1][0])
+        last_close = int(buf[-1][6])
+
+        # Bar terakhir sudah final kalau fetch terakhir terjadi setelah bar itu close
+        if last_close < self._synced[key] - CLOSE_GRACE_MS:
+            start = last_open + step
+        else:
+            start = last_open
+        if start > now_ms:
+            return buf
+
+        missing = (now_ms - start) // step + 1
+        if missing > buf.maxlen or missing > MAX_KLINES_PER_CALL:
+            # Ketinggalan terlalu jauh (mis. proses sempat berhenti) -> isi ulang
+            return self._cold_fill(symbol, interval, buf.maxlen)
+
+        kl = self.client.futures_klines(
+            symbol=symbol, interval=interval, startTime=start, limit=int(missing) + 1
+        )
+        self._synced[key] = now_ms
+        self._count("incremental", len(kl))
+        self._merge(buf, kl)
+        if self.store is not None:
+            self.store.append(symbol, interval, kl, now_ms)
+        return buf
+
+    # ---------- derive mode ----------
+    def _derive(self, symbol, interval, buf):
+        """Patch buf from the 1m buffer. False -> caller falls back to REST."""
+        from resample import BASE_INTERVAL, aggregate, derivable
+        if not buf or not derivable(interval):
+            return False
+        key = (symbol, interval)
+        step = INTERVAL_MS[interval]
+        synced = self._synced[key]
+        since = int(buf[-1][0])
+        if int(buf[-1][6]) < synced - CLOSE_GRACE_MS:
+            since += step                  # bar terakhir sudah final
+        elif len(buf) > 1 and int(buf[-2][6]) >= synced - CLOSE_GRACE_MS:
+            since = int(buf[-2][0])        # bar sebelumnya belum final saat derive terakhir
+        if since > time.time() * 1000:
+            return True
+        base = self._base_rows(symbol, since, step // INTERVAL_MS[BASE_INTERVAL] + 2)
+        if base is None:
+            return False
+        rows, as_of = base
+        kl = aggregate(rows, interval, since)
+        if since < int(buf[-1][0]):
+            buf.pop()                      # dibangun ulang dari bar sebelumnya
+            arr = self._arrays.get(key)
+            if arr is not None:
+                arr.truncate(since)        # sync() hanya parse ulang bar terakhir: kolom numpy ikut dibuang
+        self._synced[key] = as_of
+        self._merge(buf, kl)
+        self._count("derived", len(kl))
+        if self.store is not None:
+            self.store.append(symbol, interval, kl, as_of - CLOSE_GRACE_MS)
+        return True
+
+    def _base_rows(self, symbol, since, min_len):
+        """Contiguous 1m rows from `since` on (refreshed at most every DERIVE_FRESH_MS)."""
+        from resample import BASE_INTERVAL
+        key = (symbol, BASE_INTERVAL)
+        base_step = INTERVAL_MS[BASE_INTERVAL]
+        with self._key_lock(key):
+            now_ms = int(time.time() * 1000)
+            buf = self._buffers.get(key)
+            if buf is None or buf.maxlen < min_len:
+                buf = self._cold_fill(symbol, BASE_INTERVAL, max(min_len, buf.maxlen if buf else 0))
+            elif key not in self._streamed and now_ms - self._synced[key] > DERIVE_FRESH_MS:
+                buf = self._refresh(symbol, BASE_INTERVAL, buf)
+            rows = [k for k in buf if int(k[0]) >= since]
+            as_of = now_ms if key in self._streamed else self._synced[key]
+        if not rows or int(rows[0][0]) != since:
+            return None    # buffer 1m tidak mencakup awal bar
+        for a, b in zip(rows, rows[1:]):
+            if int(b[0]) - int(a[0]) != base_step:
+                return None    # ada bar 1m yang hilang -> pakai candle exchange
+        return rows, as_of
+
+    def _count(self, kind, rows=0):
+        with self._lock:
+            self.stats[kind] += 1
+            self.stats["rows"] += rows
+
+    @staticmethod
+    def _merge(buf, kl):
+        for k in kl:
+            t = int(k[0])
+            last_t = int(buf[-1][0])
+            if t == last_t:
+                buf[-1] = k            # patch bar yang masih open
+            elif t > last_t:
+                buf.append(k)          # deque(maxlen) otomatis buang bar tertua
+
+
+_shared = None
+
+
+def shared_cache(client, store=None, derive=False):
+    """Process-wide cache so both bots read from the same buffers."""
+    global _shared
+    if _shared is None:
+        _shared = KlineCache(client, store, derive)
+    else:
+        if store is not None and _shared.store is None:
+            _shared.store = store
+        _shared.derive = _shared.derive or derive
+    return _shared
@@ -0,0 +1,130 @@
+# klineparse.py
+# Raw kline rows -> preallocated contiguous numpy columns
+# - KlineArray: newest `maxlen` bars of one (symbol, interval) as int64 open
+#   time + float64 o/h/l/c/v in one preallocated block; sync() only parses
+#   rows that are new or still open, so a scan parses one or two rows instead
+#   of rebuilding the whole window from strings
+# - before(): drop bars opened at/after a time (evaluate only closed bars)
+# - parse_rows(): one-shot column-wise parse (no 12-column object DataFrame)
+# - loads(): orjson when installed (pip install orjson), else json
+# - to_frame(): pandas DataFrame view, for debugging only
+
+import json
+from collections import namedtuple
+
+import numpy as np
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:      # opsional; json bawaan tetap jalan
+    loads = json.loads
+
+Bars = namedtuple("Bars", "t o h l c v")
+
+
+def nbars(src):
+    """Number of bars in raw rows or in a Bars of columns."""
+    return len(src.t) if isinstance(src, Bars) else len(src)
+
+
+def before(src, t_ms):
+    """Raw rows or Bars without the trailing bars that opened at or after t_ms."""
+    if t_ms is None:
+        return src
+    if isinstance(src, Bars):
+        j = int(np.searchsorted(src.t, t_ms, "left"))
+        return src if j == len(src.t) else Bars(*(col[:j] for col in src))
+    j = len(src)
+    while j and int(src[j - 1][0]) >= t_ms:
+        j -= 1
+    return src if j == len(src) else src[:j]
+
+
+def parse_rows(rows, out=None):
+    """Raw futures_klines rows -> (t int64[n], x float64[5, n] = o/h/l/c/v)."""
+    n = len(rows)
+    if out is None:
+        t, x = np.empty(n, dtype=np.int64), np.empty((5, n), dtype=np.float64)
+    else:
+        t, x = out
+    t[:] = [r[0] for r in rows]
+    for j in range(5):
+        x[j] = [r[j + 1] for r in rows]
+    return t, x
+
+
+class KlineArray:
+    """Newest `maxlen` klines as contiguous columns, parsed once per row.
+
+    The block holds 2*maxlen bars; when it is full the newest bars move to
+    the front (amortized O(1) per bar) so every column stays contiguous.
+    Column views are only valid until the next sync().
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self._t = np.empty(2 * maxlen, dtype=np.int64)
+        self._x = np.empty((5, 2 * maxlen), dtype=np.float64)
+        self._start = self._end = 0
+        self.parsed = 0        # jumlah baris yang pernah di-parse (statistik)
+
+    def __len__(self):
+        return self._end - self._start
+
+    def sync(self, rows):
+        """Bring the columns in line with `rows` (raw klines, oldest first)."""
+        if not rows:
+            return self
+        k = len(rows)
+        if self._end > self._start:
+            last = int(self._t[self._end - 1])
+            i = k - 1
+            while i >= 0 and int(rows[i][0]) > last:   # biasanya cuma 1-2 langkah
+                i -= 1
+            if i >= 0 and int(rows[i][0]) == last:
+                self._end -= 1                # bar terakhir di-parse ulang (mungkin masih open)
+                self._push([rows[j] for j in range(i, k)])
+                return self
+        self._start = self._end = 0           # gap / buffer baru -> parse ulang semuanya
+        self._push(list(rows)[-self.maxlen:])
+        return self
+
+    def truncate(self, t):
+        """Forget parsed bars opened at or after `t` (their rows were rebuilt); the next sync() re-parses them."""
+        self._end = self._start + int(np.searchsorted(self._t[self._start:self._end], t))
+
+    def _push(self, new):
+        n = len(new)
+        if n >= self.maxlen:
+            new = new[-self.maxlen:]
+            n = self.maxlen
+            self._start = self._end = 0
+        elif self._end + n > len(self._t):
+            keep = min(self.maxlen - n, self._end - self._start)
+            src = slice(self._end - keep, self._end)
+            self._t[:keep] = self._t[src]
+            self._x[:, :keep] = self._x[:, src]
+            self._start, self._end = 0, keep
+        e = self._end + n
+        parse_rows(new, (self._t[self._end:e], self._x[:, self._end:e]))
+        self._end = e
+        self._start = max(self._start, e - self.maxlen)
+        self.parsed += n
+
+    def bars(self, limit=None):
+        """Bars of column views over the newest `limit` bars."""
+        s = self._start if limit is None else max(self._start, self._end - limit)
+        x = self._x[:, s:self._end]
+        return Bars(self._t[s:self._end], x[0], x[1], x[2], x[3], x[4])
+
+
+def to_frame(src):
+    """pandas view of raw rows or Bars (debugging / notebooks only)."""
+    import pandas as pd
+    if not isinstance(src, Bars):
+        t, x = parse_rows(src)
+        src = Bars(t, *x)
+    df = pd.DataFrame({"o": src.o, "h": src.h, "l": src.l, "c": src.c, "v": src.v})
+    df.insert(0, "t", pd.to_datetime(src.t, unit="ms", utc=True))
+    return df
@@ -0,0 +1,278 @@
+# klinestore.py
+# Persistent on-disk kline store (closed candles only)
+# - One append-only file per (symbol, interval): <root>/<interval>/<symbol>.klines
+# - Fixed-width little-endian records (open time, OHLCV, close time, quote
+#   volume, trades, taker buy volumes) -> the file is read through np.memmap,
+#   columns are zero-copy views (store.read(...)["c"])
+# - Open times are sorted, so time-range lookups are a binary search
+#   (np.searchsorted) on the mapped timestamp column
+# - gaps() finds missing bars, backfill() fetches them over REST and rewrites
+#   the file once (the only non-append write)
+# - KlineCache warm-starts from here: only candles newer than the last stored
+#   one are downloaded after a restart
+#
+# CLI:
+#   python klinestore.py backfill --symbols BTCUSDT,ETHUSDT --intervals 1m,1h --days 30
+#   python klinestore.py info --symbols BTCUSDT
+
+import os
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from klinecache import INTERVAL_MS, MAX_KLINES_PER_CALL
+
+STORE_DIR = "klines"
+
+KLINE_DTYPE = np.dtype([
+    ("t", "<i8"),       # open time (ms)
+    ("o", "<f8"), ("h", "<f8"), ("l", "<f8"), ("c", "<f8"), ("v", "<f8"),
+    ("T", "<i8"),       # close time (ms)
+    ("qv", "<f8"),      # quote asset volume
+    ("n", "<i8"),       # number of trades
+    ("tbv", "<f8"),     # taker buy base volume
+    ("tbqv", "<f8"),    # taker buy quote volume
+])
+
+
+def rows_to_array(rows):
+    """Raw futures_klines rows -> structured array (KLINE_DTYPE)."""
+    arr = np.empty(len(rows), dtype=KLINE_DTYPE)
+    for i, k in enumerate(rows):
+        arr[i] = (int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]), float(k[5]),
+                  int(k[6]), float(k[7]), int(k[8]), float(k[9]), float(k[10]))
+    return arr
+
+
+def array_to_rows(arr):
+    """Structured array -> raw-kline-like rows (same field order as futures_klines)."""
+    return [[int(r[0]), float(r[1]), float(r[2]), float(r[3]), float(r[4]), float(r[5]),
+             int(r[6]), float(r[7]), int(r[8]), float(r[9]), float(r[10]), "0"]
+            for r in arr.tolist()]
+
+
+class KlineStore:
+    """Append-only memory-mapped kline files, one per (symbol, interval).
+
+    Single writer per file (one bot process); any number of readers.
+    """
+
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.stats = {"appended": 0, "backfilled": 0, "warm_rows": 0}
+        self._checked = set()   # key yang gap-nya sudah dicek saat warm start
+
+    def path(self, symbol, interval):
+        return os.path.join(self.root, interval, f"{symbol}.klines")
+
+    def _key_lock(self, key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.RLock()
+            return lock
+
+    # ---------- read ----------
+    def _map(self, symbol, interval):
+        # Map baru per baca (murah); mmap hidup selama view-nya dipakai, jadi
+        # ratusan file tidak menahan ratusan file descriptor
+        path = self.path(symbol, interval)
+        try:
+            n = os.path.getsize(path) // KLINE_DTYPE.itemsize   # record terpotong di ekor diabaikan
+        except OSError:
+            n = 0
+        if n == 0:
+            return np.empty(0, dtype=KLINE_DTYPE)
+        return np.memmap(path, dtype=KLINE_DTYPE, mode="r", shape=(n,))
+
+    def read(self, symbol, interval, start=None, end=None):
+        """Zero-copy view of bars with start <= open time < end (ms)."""
+        with self._key_lock((symbol, interval)):
+            mm = self._map(symbol, interval)
+        t = mm["t"]
+        i = 0 if start is None else int(np.searchsorted(t, start, "left"))
+        j = len(mm) if end is None else int(np.searchsorted(t, end, "left"))
+        return mm[i:j]
+
+    def tail(self, symbol, interval, n):
+        """Zero-copy view of the newest n stored bars."""
+        with self._key_lock((symbol, interval)):
+            mm = self._map(symbol, interval)
+        return mm[max(0, len(mm) - n):]
+
+    def last_open(self, symbol, interval):
+        mm = self.tail(symbol, interval, 1)
+        return int(mm["t"][0]) if len(mm) else None
+
+    def keys(self):
+        if not os.path.isdir(self.root):
+            return
+        for interval in sorted(os.listdir(self.root)):
+            folder = os.path.join(self.root, interval)
+            if interval in INTERVAL_MS and os.path.isdir(folder):
+                for name in sorted(os.listdir(folder)):
+                    if name.endswith(".klines"):
+                        yield name[:-len(".klines")], interval
+
+    # ---------- write ----------
+    def append(self, symbol, interval, rows, now_ms=None):
+        """Append closed rows newer than the last stored bar; returns how many were written."""
+        if not rows:
+            return 0
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        key = (symbol, interval)
+        with self._key_lock(key):
+            last = self.last_open(symbol, interval)
+            new = [k for k in rows if int(k[6]) < now_ms and (last is None or int(k[0]) > last)]
+            if not new:
+                return 0
+            arr = rows_to_array(new)
+            if len(arr) > 1 and (np.diff(arr["t"]) <= 0).any():
+                arr = arr[np.unique(arr["t"], return_index=True)[1]]
+            path = self.path(symbol, interval)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "ab") as f:
+                size = f.tell()
+                torn = size % KLINE_DTYPE.itemsize
+                if torn:                                 # sisa tulis yang terpotong
+                    f.truncate(size - torn)
+                f.write(arr.tobytes())
+            self.stats["appended"] += len(arr)
+            return len(arr)
+
+    # ---------- gaps / backfill ----------
+    def gaps(self, symbol, interval, start=None, end=None):
+        """Missing bars as [(first_missing_open, last_missing_open)] within the stored range."""
+        step = INTERVAL_MS[interval]
+        t = np.asarray(self.read(symbol, interval, start, end)["t"])
+        out = []
+        if start is not None and len(t):
+            first = start + (-start) % step
+            if t[0] > first:
+                out.append((first, int(t[0]) - step))
+        d = np.diff(t)
+        for i in np.flatnonzero(d > step):
+            out.append((int(t[i]) + step, int(t[i + 1]) - step))
+        return out
+
+    def backfill(self, client, symbol, interval, start=None, end=None):
+        """Fill gaps (and extend to `end`) over REST; returns number of bars added."""
+        step = INTERVAL_MS[interval]
+        now_ms = int(time.time() * 1000)
+        end = now_ms if end is None else min(end, now_ms)
+        ranges = self.gaps(symbol, interval, start, end)
+        last = self.last_open(symbol, interval)
+        if last is None:
+            if start is None:
+                raise ValueError("empty store: backfill needs a start time")
+            ranges.append((start, end))
+        elif last + step < end:
+            ranges.append((last + step, end))
+
+        fetched = []
+        for lo, hi in ranges:
+            t = lo
+            while t <= hi:
+                kl = client.futures_klines(symbol=symbol, interval=interval, startTime=t,
+                                           endTime=hi + step - 1, limit=MAX_KLINES_PER_CALL)
+                kl = [k for k in kl if int(k[6]) < now_ms]
+                if not kl:
+                    break
+                fetched.extend(kl)
+                t = int(kl[-1][0]) + step
+        if not fetched:
+            return 0
+
+        key = (symbol, interval)
+        with self._key_lock(key):
+            old = np.array(self.read(symbol, interval))
+            new = rows_to_array(fetched)
+            merged = np.concatenate([old, new])
+            merged = merged[np.unique(merged["t"], return_index=True)[1]]
+            added = len(merged) - len(old)
+            path = self.path(symbol, interval)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = path + ".tmp"
+            merged.tofile(tmp)
+            os.replace(tmp, path)
+        self.stats["backfilled"] += added
+        return added
+
+    # ---------- warm start (dipakai KlineCache) ----------
+    def warm_rows(self, client, symbol, interval, limit):
+        """Newest `limit` klines: stored closed bars + REST only for what is newer.
+
+        Gaps inside the needed window are backfilled first. Falls back to a
+        plain REST fetch when the store has nothing usable.
+        """
+        step = INTERVAL_MS[interval]
+        now_ms = int(time.time() * 1000)
+        last = self.last_open(symbol, interval)
+        if last is not None and (now_ms - last) // step + 1 <= min(limit, MAX_KLINES_PER_CALL - 1):
+            window_start = now_ms - now_ms % step - (limit - 1) * step
+            if (symbol, interval) not in self._checked:
+                # sekali per proses: gap yang memang kosong di exchange tidak di-fetch ulang terus
+                self._checked.add((symbol, interval))
+                if self.gaps(symbol, interval, window_start):
+                    self.backfill(client, symbol, interval, window_start, last + step)
+            start = last + step
+            missing = (now_ms - start) // step + 1
+            kl = client.futures_klines(symbol=symbol, interval=interval, startTime=start,
+                                       limit=int(missing) + 1)
+            stored = array_to_rows(self.tail(symbol, interval, limit))
+            self.stats["warm_rows"] += len(stored)
+            rows = stored + [k for k in kl if int(k[0]) > last]
+        else:
+            rows = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
+        self.append(symbol, interval, rows, now_ms)
+        return rows[-limit:]
+
+
+_shared = None
+
+
+def shared_store(root=STORE_DIR):
+    global _shared
+    if _shared is None:
+        _shared = KlineStore(root)
+    return _shared
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Kline store maintenance")
+    ap.add_argument("command", choices=("backfill", "info"))
+    ap.add_argument("--symbols", required=True)
+    ap.add_argument("--intervals", default="1m")
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--root", default=STORE_DIR)
+    args = ap.parse_args()
+
+    store = KlineStore(args.root)
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    intervals = [tf.strip() for tf in args.intervals.split(",") if tf.strip()]
+    if args.command == "backfill":
+        from binance.client import Client
+        from ratelimit import LimitedClient
+        client = LimitedClient(Client())
+        start = int(time.time() * 1000) - args.days * 86_400_000
+        for sym in symbols:
+            for tf in intervals:
+                n = store.backfill(client, sym, tf, start=start - start % INTERVAL_MS[tf])
+                print(f"[STORE] {sym} {tf}: +{n} bar")
+    for sym in symbols:
+        for tf in intervals:
+            arr = store.read(sym, tf)
+            if not len(arr):
+                print(f"{sym} {tf}: kosong")
+                continue
+            print(f"{sym} {tf}: {len(arr)} bar, {time.strftime('%Y-%m-%d %H:%M', time.gmtime(arr['t'][0] / 1000))}"
+                  f" .. {time.strftime('%Y-%m-%d %H:%M', time.gmtime(arr['t'][-1] / 1000))} UTC,"
+                  f" gap: {len(store.gaps(sym, tf))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# loadtest.py
+# Full-universe load test of the bots against fakeexchange.FakeExchange (no Binance traffic)
+# - Starts the stand-in exchange (synthetic paths for N symbols, or a recorded
+#   fixture), points python-binance's Client at it and imports the bot as is
+# - Scenarios:
+#     sinyal  sinyalbot scan_once after every 1m close (tiered universe)
+#     max     sinyalbot scan_once back to back (throughput ceiling under the limiter)
+#     engine  sinyal + retrace on one pipeline (engine.py)
+#     stream  sinyalbot stream mode over the fake kline/markPrice WebSocket
+# - Every --report-sec and at the end: passes, symbol checks/s, request
+#   weight per minute, 429/418 answers, limiter wait, signal latency from the
+#   1m close to the Telegram enqueue (p50/p95/max; a close-to-alert latency in
+#   sinyal/engine, max and stream also alert on open bars) and memory (RSS; growth in
+#   MB/hour as a least-squares slope after --warmup-minutes, once the tiered
+#   scan has reached the whole universe and the caches are full)
+# - Synthetic prices rarely meet the entry rules; --inject P forces the entry
+#   conditions on a share P of the sinyal checks (after the real fetch and
+#   indicators), so the alert path runs at a known rate. Retrace alerts are
+#   only counted when they happen
+# - Runs on the wall clock (the limiter, cache and scheduler all use it):
+#   "hours of trading" = --minutes of run time
+#
+# Usage:
+#   python loadtest.py --symbols 500 --minutes 60 --scenario sinyal --out loadtest.json
+#   python loadtest.py --symbols 800 --minutes 10 --scenario max --latency 0.05 --error-rate 0.01
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import functools
+import statistics
+
+from fakeexchange import FakeExchange, make_market
+from ratelimit import WEIGHT_LIMIT_1M
+
+SCENARIOS = ("sinyal", "max", "engine", "stream")
+
+
+def rss_mb():
+    """Resident set size of this process (MB); peak RSS where /proc is missing."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def slope_per_hour(samples):
+    """Least-squares slope of [(t_sec, value)] in value per hour (None below 2 samples)."""
+    if len(samples) < 2:
+        return None
+    ts = [t for t, _ in samples]
+    vs = [v for _, v in samples]
+    mt, mv = statistics.fmean(ts), statistics.fmean(vs)
+    var = sum((t - mt) ** 2 for t in ts)
+    if not var:
+        return None
+    return sum((t - mt) * (v - mv) for t, v in samples) / var * 3600
+
+
+def _round(x, nd=2):
+    return None if x is None else round(x, nd)
+
+
+def _pct(values, q):
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def latency_summary(values):
+    if not values:
+        return {"n": 0}
+    return {"n": len(values), "p50_sec": round(_pct(values, 0.5), 3), "p95_sec": round(_pct(values, 0.95), 3),
+            "max_sec": round(max(values), 3)}
+
+
+class Recorder:
+    """Telegram enqueues of the bots under test, with their lag behind the last 1m close.
+
+    Alerts before the first 1m close come from the catch-up scan at start (not a close
+    reaction): counted, but without a lag.
+    """
+
+    def __init__(self):
+        self.sent = []         # [(bot, kind, lag_sec | None)]
+        self.first_close = (time.time() // 60 + 1) * 60
+        self._lock = threading.Lock()
+
+    def wrap(self, bot):
+        def send(text, chat_id=None):
+            now = time.time()
+            kind = "signal" if ("SIGNAL" in text or "RETRACE" in text) else "hold" if "HOLD" in text else "level"
+            with self._lock:
+                self.sent.append((bot, kind, now - now // 60 * 60 if now >= self.first_close else None))
+        return send
+
+    def lags(self, kind="signal"):
+        with self._lock:
+            return [lag for _, k, lag in self.sent if k == kind and lag is not None]
+
+    def count(self, kind="signal"):
+        with self._lock:
+            return sum(k == kind for _, k, _ in self.sent)
+
+
+def install_client(exchange):
+    """Every binance Client created from now on talks to the stand-in exchange."""
+    import binance.client
+    real = binance.client.Client
+
+    def client(*args, **kwargs):
+        kwargs.setdefault("ping", False)
+        c = real(*args, **kwargs)
+        c.FUTURES_URL = exchange.rest_url
+        return c
+
+    binance.client.Client = client
+
+
+def inject_conditions(m, share, seed):
+    """Force the entry conditions on `share` of sinyalbot's checks that failed them."""
+    rnd = random.Random(seed)
+    real = m.lazy_conditions
+
+    def lazy_conditions(snapshot):
+        stage, result = real(snapshot)
+        if result is None and rnd.random() < share:
+            d1, d4 = snapshot('1m'), snapshot('4h')
+            up = bool(d1['trend_up'])
+            return "passed", (up, not up, 0.03, d1['close'], d4['atr'])
+        return stage, result
+
+    m.lazy_conditions = lazy_conditions
+
+
+def start_scenario(args, exchange, recorder, workdir):
+    """Import the bot(s), start the scenario in a daemon thread; returns (checks(), limiter stats())."""
+    os.environ.update({
+        "API_KEY": "loadtest", "API_SECRET": "loadtest", "TELEGRAM_TOKEN": "", "TELEGRAM_CHAT_ID": "",
+        "STATE_DIR": os.path.join(workdir, "state"), "EVENT_DIR": os.path.join(workdir, "events"),
+        "KLINE_STORE_DIR": "", "METRICS_PORT": "0", "SHARD_MODE": "0",
+        "STREAM_MODE": "1" if args.scenario == "stream" else "0",
+    })
+    import sinyalbot as m
+    m.init()
+    m.notifier.send = recorder.wrap("sinyalbot")
+    if args.inject:
+        inject_conditions(m, args.inject, args.seed)
+    checks = [lambda: sum(m.prune_stats.values())]
+    limiters = [m.client.limiter]
+
+    if args.scenario == "engine":
+        import engine
+        import salamprofit
+        salamprofit.STATE_DIR = os.path.join(workdir, "state")
+        salamprofit.EVENT_DIR = os.path.join(workdir, "events")
+        salamprofit.open_state()
+        salamprofit.notifier.send = recorder.wrap("salamprofit")
+        retrace_checks = [0]
+        real = salamprofit.evaluate_retrace
+
+        def evaluate_retrace(*a):
+            retrace_checks[0] += 1
+            return real(*a)
+
+        salamprofit.evaluate_retrace = evaluate_retrace
+        checks.append(lambda: retrace_checks[0])
+        eng = engine.Engine(m.kline_cache, m.SCAN_WORKERS)
+        eng.add(m.SinyalStrategy())
+        eng.add(salamprofit.RetraceStrategy(m.client))
+        eng.start()
+        target = functools.partial(eng.run_forever, m.ServerClock(m.client))
+    elif args.scenario == "stream":
+        m.MarketStream = functools.partial(m.MarketStream, url=exchange.ws_url)
+        target = m.run_stream_mode
+    elif args.scenario == "max":
+        def target():
+            while True:
+                try:
+                    m.scan_once()
+                except Exception as e:
+                    print(f"[LOAD] scan error: {e}")
+    else:
+        target = m.main
+
+    threading.Thread(target=target, name=f"loadtest-{args.scenario}", daemon=True).start()
+
+    def limiter_stats():
+        out = {"waited_sec": 0.0, "429": 0, "418": 0}
+        for lim in limiters:
+            for key in out:
+                out[key] += lim.stats.get(key, 0)
+        return out
+
+    return (lambda: sum(c() for c in checks)), limiter_stats, m
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    market = make_market(args.symbols, args.fixture, args.seed)
+    exchange = FakeExchange(market, weight_limit=args.weight_limit, latency=args.latency,
+                            jitter=args.jitter, error_rate=args.error_rate, seed=args.seed).start()
+    install_client(exchange)
+    recorder = Recorder()
+    print(f"[LOAD] {args.scenario}: {len(market.symbols)} simbol, {args.minutes:g} menit | "
+          f"REST {exchange.rest_url} | WS {exchange.ws_url} | data di {workdir}/")
+    checks, limiter_stats, m = start_scenario(args, exchange, recorder, workdir)
+
+    t0 = time.time()
+    end = t0 + args.minutes * 60
+    memory = [(0.0, rss_mb())]
+    reports = []
+    last = {"t": t0, "checks": 0, "requests": 0, "weight": 0}
+    while time.time() < end:
+        time.sleep(max(0.0, min(args.report_sec, end - time.time())))
+        now = time.time()
+        n_checks, st = checks(), exchange.stats
+        dt = now - last["t"]
+        memory.append((now - t0, rss_mb()))
+        row = {
+            "t_sec": round(now - t0, 1),
+            "checks_per_sec": round((n_checks - last["checks"]) / dt, 2),
+            "requests_per_sec": round((st["requests"] - last["requests"]) / dt, 2),
+            "weight_per_min": round((st["weight"] - last["weight"]) / dt * 60, 1),
+            "429": st["429"], "418": st["418"],
+            "signals": recorder.count(),
+            "rss_mb": round(memory[-1][1], 1),
+            "active_signals": len(m.active_signals),
+            "indicator_sets": len(m.indicator_sets),
+        }
+        reports.append(row)
+        last = {"t": now, "checks": n_checks, "requests": st["requests"], "weight": st["weight"]}
+        lat = latency_summary(recorder.lags())
+        print(f"[LOAD] {row['t_sec']:>7.0f}s | cek {row['checks_per_sec']}/s | req {row['requests_per_sec']}/s | "
+              f"weight {row['weight_per_min']:.0f}/menit | 429 {row['429']} 418 {row['418']} | "
+              f"sinyal {lat['n']} p95 {lat.get('p95_sec', '-')}s | rss {row['rss_mb']} MB")
+
+    elapsed = time.time() - t0
+    lim = limiter_stats()
+    st = exchange.stats
+    minutes = exchange.weight_per_minute()
+    summary = {
+        "scenario": args.scenario,
+        "symbols": len(market.symbols),
+        "minutes": round(elapsed / 60, 2),
+        "settings": {k: getattr(args, k) for k in ("latency", "jitter", "error_rate", "weight_limit", "inject", "seed")},
+        "checks": checks(),
+        "checks_per_sec": round(checks() / elapsed, 2),
+        "requests": st["requests"],
+        "requests_per_sec": round(st["requests"] / elapsed, 2),
+        "weight_per_min_mean": round(statistics.fmean(minutes), 1) if minutes else None,
+        "weight_per_min_max": max(minutes) if minutes else None,
+        "answers_429": st["429"],
+        "answers_418": st["418"],
+        "endpoints": st["endpoints"],
+        "ws_messages": st["ws_messages"],
+        "limiter_wait_sec": round(lim["waited_sec"], 2),
+        "signal_latency": latency_summary(recorder.lags("signal")),
+        "level_latency": latency_summary(recorder.lags("level")),
+        "rss_mb_start": round(memory[0][1], 1),
+        "rss_mb_end": round(memory[-1][1], 1),
+        "rss_growth_mb_per_hour": _round(slope_per_hour([s for s in memory if s[0] >= args.warmup_minutes * 60])),
+        "reports": reports,
+    }
+    text = json.dumps(summary, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(json.dumps({k: v for k, v in summary.items() if k not in ("reports", "endpoints")}, indent=2))
+    exchange.stop()
+    return summary
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load test the bots against a local fake exchange")
+    ap.add_argument("--scenario", choices=SCENARIOS, default="sinyal")
+    ap.add_argument("--symbols", type=int, default=500)
+    ap.add_argument("--fixture", help="replay a recorded fixture (bench.py record) instead of synthetic paths")
+    ap.add_argument("--minutes", type=float, default=10)
+    ap.add_argument("--report-sec", type=float, default=60)
+    ap.add_argument("--warmup-minutes", type=float, default=5, help="memory growth is fitted after this")
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds per REST answer")
+    ap.add_argument("--jitter", type=float, default=0.01)
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of random 429 answers")
+    ap.add_argument("--weight-limit", type=int, default=WEIGHT_LIMIT_1M)
+    ap.add_argument("--inject", type=float, default=0.01, help="share of sinyal checks forced to pass (0 = off)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the JSON summary here")
+    run(ap.parse_args())
+    os._exit(0)     # thread bot (scheduler, stream, notifier) tidak punya jalur berhenti
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+# metrics.py
+# In-process metrics for both bots, scraped over a local Prometheus endpoint
+# - Counters / gauges / histograms keyed by (name, labels). Everything is a
+#   no-op until enable() / serve() is called: with metrics off the hot path
+#   pays one module attribute check per call site
+# - gauge_fn(): value read at scrape time (queue depths, limiter state), so it
+#   costs nothing between scrapes
+# - serve(port): 127.0.0.1:<port>/metrics in the Prometheus text format
+#   (0.0.4), /profile?seconds=N returns collapsed stacks from the sampling
+#   profiler (input for flamegraph.pl / speedscope)
+# - SamplingProfiler: samples sys._current_frames() every few ms in a daemon
+#   thread; no tracing hooks, so the scan itself runs at full speed
+# - startup(): seconds from process start (interpreter included, read from
+#   /proc) to a startup phase, e.g. the end of the first scan pass
+#
+#   curl -s localhost:9108/metrics | grep binance_
+#   curl -s "localhost:9108/profile?seconds=30" > scan.folded
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 9108
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROFILE_INTERVAL_SEC = 0.005
+PROFILE_MAX_SEC = 120
+
+# nama metric -> (tipe, keterangan); yang tidak terdaftar tetap jalan, tanpa HELP
+HELP = {
+    "binance_request_seconds": ("histogram", "REST call duration (limiter wait excluded)"),
+    "binance_request_errors_total": ("counter", "REST calls that raised, by HTTP status"),
+    "binance_weight_total": ("counter", "Request weight charged to the limiter"),
+    "binance_limiter_wait_seconds": ("histogram", "Time spent waiting for limiter tokens"),
+    "binance_rate_limited_total": ("counter", "429/418 answers from Binance"),
+    "binance_used_weight_1m": ("gauge", "x-mbx-used-weight-1m from the last response"),
+    "binance_limiter_tokens": ("gauge", "Weight tokens left in the local bucket"),
+    "kline_get_seconds": ("histogram", "KlineCache lookup incl. REST refresh, per timeframe"),
+    "indicator_sync_seconds": ("histogram", "IndicatorSet.sync, per indicator set"),
+    "conditions_seconds": ("histogram", "Entry condition evaluation"),
+    "check_seconds": ("histogram", "One symbol check, fetch + indicators + conditions"),
+    "check_stage_total": ("counter", "Symbol checks by the stage they stopped at"),
+    "scan_pass_seconds": ("histogram", "One full scan pass over the universe"),
+    "scan_symbols": ("gauge", "Symbols in the last scan pass"),
+    "schedule_lag_seconds": ("histogram", "Job start after its candle close boundary"),
+    "job_seconds": ("histogram", "Scheduled job run time"),
+    "signals_total": ("counter", "Alerts sent, per symbol and side"),
+    "active_signals": ("gauge", "Open signals tracked for TP/SL"),
+    "telegram_send_seconds": ("histogram", "Telegram sendMessage round trip, by outcome"),
+    "telegram_queue_depth": ("gauge", "Messages waiting in the notifier (queue + pending)"),
+    "stream_queue_depth": ("gauge", "WebSocket events waiting for the bot thread"),
+    "tier_symbols": ("gauge", "Symbols per scan tier (hot/warm/cold)"),
+    "tier_scan_interval_seconds": ("gauge", "Mean achieved interval between scans of a symbol, per tier"),
+    "tier_stale_max_seconds": ("gauge", "Oldest last scan among the symbols of a tier"),
+    "startup_seconds": ("gauge", "Process start to a startup phase (ready, first_scan), per bot"),
+}
+
+enabled = False
+_lock = threading.Lock()
+_series = {}         # {name: {label_key: float | [bucket counts..., sum, count]}}
+_kinds = {}          # {name: "counter" | "gauge" | "histogram"}
+_gauge_fns = {}      # {name: fn() -> float | {label_key: float}}
+_server = None
+_profiler = None
+_imported = time.time()
+_phases = {}         # {label_key: detik sejak proses start} untuk startup()
+
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+
+def _key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, value=1, **labels):
+    if not enabled:
+        return
+    key = _key(labels)
+    with _lock:
+        _kinds.setdefault(name, "counter")
+        s = _series.setdefault(name, {})
+        s[key] = s.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    if not enabled:
+        return
+    with _lock:
+        _kinds.setdefault(name, "gauge")
+        _series.setdefault(name, {})[_key(labels)] = value
+
+
+def observe(name, seconds, **labels):
+    if not enabled:
+        return
+    key = _key(labels)
+    with _lock:
+        _kinds.setdefault(name, "histogram")
+        s = _series.setdefault(name, {})
+        h = s.get(key)
+        if h is None:
+            h = s[key] = [0] * (len(DEFAULT_BUCKETS) + 2)
+        for i, le in enumerate(DEFAULT_BUCKETS):
+            if seconds <= le:
+                h[i] += 1
+                break
+        h[-2] += seconds
+        h[-1] += 1
+
+
+def gauge_fn(name, fn):
+    """Gauge computed at scrape time; fn returns a number or {label key: number}
+    (label key = sorted tuple of (label, value) pairs)."""
+    with _lock:
+        _kinds[name] = "gauge"
+        _gauge_fns[name] = fn
+
+
+class _Timer:
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.t0, **self.labels)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name, **labels):
+    """`with timer(...)` observes the block duration into a histogram."""
+    return _Timer(name, labels) if enabled else _NULL_TIMER
+
+
+def process_started():
+    """Start of this process (epoch seconds) from /proc, 10 ms resolution; where /proc is
+    missing, the first import of this module."""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - (uptime - ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError, AttributeError):
+        return _imported
+
+
+def startup(phase, bot):
+    """Seconds from process start to the first time `bot` reaches `phase` (None after that).
+
+    Kept even while metrics are off: the startup_seconds gauge reads them at scrape time,
+    so phases reached before serve() are still exported.
+    """
+    key = _key({"phase": phase, "bot": bot})
+    with _lock:
+        if key in _phases:
+            return None
+        _phases[key] = seconds = time.time() - process_started()
+    gauge_fn("startup_seconds", lambda: dict(_phases))
+    return seconds
+
+
+# ===================== EXPOSITION =====================
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(key, extra=None):
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_esc(v)}"' for k, v in items) + "}"
+
+
+def _num(v):
+    return repr(float(v)) if v == v else "NaN"
+
+
+def render():
+    """All series in the Prometheus text exposition format."""
+    with _lock:
+        series = {name: dict(s) for name, s in _series.items()}
+        for name, s in series.items():
+            if _kinds.get(name) == "histogram":
+                series[name] = {k: list(v) for k, v in s.items()}
+        kinds = dict(_kinds)
+        fns = dict(_gauge_fns)
+    for name, fn in fns.items():
+        try:
+            value = fn()
+        except Exception:
+            continue         # gauge yang sumbernya sudah hilang dilewati
+        series[name] = value if isinstance(value, dict) else {(): value}
+    out = []
+    for name in sorted(series):
+        kind = kinds.get(name, "untyped")
+        if name in HELP:
+            out.append(f"# HELP {name} {HELP[name][1]}")
+        out.append(f"# TYPE {name} {kind}")
+        for key, v in sorted(series[name].items()):
+            if kind != "histogram":
+                out.append(f"{name}{_labels(key)} {_num(v)}")
+                continue
+            cum = 0
+            for le, n in zip(DEFAULT_BUCKETS, v):
+                cum += n
+                out.append(f"{name}_bucket{_labels(key, ('le', repr(le)))} {cum}")
+            out.append(f"{name}_bucket{_labels(key, ('le', '+Inf'))} {v[-1]}")
+            out.append(f"{name}_sum{_labels(key)} {_num(v[-2])}")
+            out.append(f"{name}_count{_labels(key)} {v[-1]}")
+    return "\n".join(out) + "\n"
+
+
+# ===================== PROFILER =====================
+class SamplingProfiler:
+    """Wall-clock stack sampler over all threads (collapsed-stack output)."""
+
+    def __init__(self, interval=PROFILE_INTERVAL_SEC, exclude=()):
+        self.interval = interval
+        self.exclude = set(exclude)     # thread id yang tidak di-sample (mis. thread HTTP peminta)
+        self.samples = Counter()
+        self.started = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self.started = time.time()
+            self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(2)
+        return self
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == me or tid in self.exclude:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self, reset=False):
+        """`stack;frames count` lines, heaviest first."""
+        text = "\n".join(f"{stack} {n}" for stack, n in self.samples.most_common())
+        if reset:
+            self.samples.clear()
+        return text + "\n"
+
+
+def profiler():
+    """The process-wide continuous profiler (created on first use, not started)."""
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler()
+    return _profiler
+
+
+def profile_for(seconds):
+    """Collapsed stacks of the next `seconds` (or of the running profiler since its start)."""
+    p = profiler()
+    if p.running:
+        time.sleep(min(seconds, PROFILE_MAX_SEC))
+        return p.collapsed()
+    p = SamplingProfiler(exclude=[threading.get_ident()]).start()
+    time.sleep(min(seconds, PROFILE_MAX_SEC))
+    return p.stop().collapsed()
+
+
+# ===================== HTTP =====================
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            body, ctype = render(), "text/plain; version=0.0.4; charset=utf-8"
+        elif url.path == "/profile":
+            q = parse_qs(url.query)
+            body, ctype = profile_for(float(q.get("seconds", ["10"])[0])), "text/plain; charset=utf-8"
+        else:
+            self.send_error(404, "try /metrics or /profile?seconds=10")
+            return
+        data = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        pass        # scrape tiap 15 detik tidak perlu masuk stdout
+
+
+def serve(port=DEFAULT_PORT, host="127.0.0.1", profile=False):
+    """Enable metrics and start the HTTP endpoint in a daemon thread (idempotent)."""
+    global _server
+    enable()
+    if profile:
+        profiler().start()
+    if _server is None:
+        _server = ThreadingHTTPServer((host, port), _Handler)
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[METRICS] http://{host}:{port}/metrics" + (" (profiler aktif)" if profile else ""))
+    return _server
@@ -0,0 +1,322 @@
+# notifier.py
+# Non-blocking Telegram notifier shared by sinyalbot.py & salamprofit.py
+# - send() only enqueues (bounded queue); one background thread delivers
+# - Keep-alive requests.Session with a small connection pool, explicit timeouts
+# - Per-chat pacing, 429 honors parameters.retry_after from Telegram
+# - Bursts (e.g. ten TP hits in one tick) are coalesced into one message
+# - Spool (JSONL, written only by the worker thread): each message is
+#   appended as soon as the worker takes it off the queue, each finished
+#   batch appends a "done" marker, and the file is compacted to the
+#   undelivered messages every SPOOL_COMPACT_EVERY deliveries (or truncated
+#   when nothing is pending). A crash, even SIGKILL, re-sends what was still
+#   pending on restart (at-least-once: a batch delivered right before the
+#   kill may repeat)
+
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+TELEGRAM_API = "https://api.telegram.org"
+QUEUE_MAX = 1000
+COALESCE_SEC = 1.0          # tunggu sebentar supaya pesan beruntun digabung
+CHAT_MIN_INTERVAL = 1.0     # Telegram: ~1 pesan/detik per chat
+MAX_TEXT_LEN = 4096         # batas panjang pesan Telegram
+HTTP_TIMEOUT = (5, 10)      # (connect, read) detik
+MAX_BACKOFF_SEC = 60
+SEPARATOR = "\n\n"
+SPOOL_COMPACT_EVERY = 200   # marker "done" di spool sebelum file ditulis ulang
+
+
+class TelegramNotifier:
+    """Background Telegram sender. `send` never blocks on the network."""
+
+    def __init__(self, token, chat_id, spool_path=None, parse_mode="HTML",
+                 queue_max=QUEUE_MAX, coalesce_sec=COALESCE_SEC,
+                 min_interval=CHAT_MIN_INTERVAL, api_url=TELEGRAM_API, session=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.spool_path = spool_path
+        self.parse_mode = parse_mode
+        self.coalesce_sec = coalesce_sec
+        self.min_interval = min_interval
+        self.api_url = api_url
+        self.stats = {"queued": 0, "sent": 0, "batches": 0, "429": 0, "errors": 0,
+                      "dropped": 0, "spooled": 0}
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._overflow = deque(maxlen=queue_max)
+        self._overflow_lock = threading.Lock()
+        # _pending, _next_id, _spool_f, _spool_done: hanya thread worker (atau start() sebelum worker jalan)
+        self._pending = {}       # {chat_id: deque of (enqueue_ts, text, spool_id)}
+        self._n_pending = 0      # jumlah pesan di _pending, dibaca depth() dari thread lain
+        self._next_id = 1
+        self._spool_f = None
+        self._spool_done = 0     # marker "done" sejak compaction terakhir
+        self._ready_at = {}      # {chat_id: waktu paling cepat boleh kirim lagi}
+        self._backoff = 1.0
+        self._session = session or self._new_session()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.token and self.chat_id)
+
+    def depth(self):
+        """Messages not delivered yet (queue + overflow + per-chat pending)."""
+        return self._queue.qsize() + len(self._overflow) + self._n_pending
+
+    @staticmethod
+    def _new_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    # ---------- hot path ----------
+    def send(self, text, chat_id=None):
+        """Enqueue a message; returns immediately."""
+        if not self.enabled:
+            print("[TG]", text)
+            return
+        self.start()
+        item = (chat_id or self.chat_id, time.time(), text)
+        try:
+            self._queue.put_nowait(item)
+            self.stats["queued"] += 1
+        except queue.Full:
+            # jangan blok scan; limpahan diambil worker berikutnya (yang paling lama dibuang)
+            with self._overflow_lock:
+                if len(self._overflow) == self._overflow.maxlen:
+                    self.stats["dropped"] += 1
+                self._overflow.append(item)
+
+    # ---------- lifecycle ----------
+    def start(self):
+        if self._thread is not None:
+            return self
+        with self._start_lock:
+            if self._thread is None:
+                self._load_spool()
+                self._thread = threading.Thread(target=self._run, name="telegram", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=5.0):
+        """Flush what can be sent within `timeout`; the worker spools the rest itself."""
+        if self._thread is None or self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            # worker masih menunggu HTTP: state-nya tidak disentuh dari sini. Yang sudah
+            # diambil dari antrean sudah ada di spool; yang masih di antrean belum
+            print(f"[TG] worker belum selesai dalam {timeout:.0f}s, "
+                  f"{self._queue.qsize() + len(self._overflow)} pesan di antrean belum masuk spool")
+
+    # ---------- worker ----------
+    def _run(self):
+        while True:
+            self._drain_queue(block=not self._has_pending(), timeout=0.5)
+            if self._stop.is_set() and not self._has_pending():
+                self._finish()
+                return
+            chat, wait = self._next_chat()
+            if chat is None:
+                continue
+            if wait > 0:
+                if self._stop.is_set():
+                    self._finish()   # sisa pesan tetap di spool untuk sesi berikutnya
+                    return
+                time.sleep(min(wait, 0.5))
+                continue
+            self._deliver(chat)
+
+    def _has_pending(self):
+        return any(self._pending.values())
+
+    def _drain_queue(self, block=False, timeout=None):
+        try:
+            items = [self._queue.get(block, timeout)]
+        except queue.Empty:
+            items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if self._overflow:
+            with self._overflow_lock:
+                items.extend(self._overflow)
+                self._overflow.clear()
+            items.sort(key=lambda item: item[1])
+        records = []
+        for chat, ts, text in items:
+            self._pending.setdefault(chat, deque()).append((ts, text, self._next_id))
+            records.append({"id": self._next_id, "chat_id": chat, "ts": ts, "text": text})
+            self._next_id += 1
+        self._n_pending += len(items)
+        self._spool_write(records)
+
+    def _next_chat(self):
+        """Chat that can be served first, and how long until it may be sent."""
+        now = time.time()
+        best, best_wait = None, None
+        for chat, msgs in self._pending.items():
+            if not msgs:
+                continue
+            ready = self._ready_at.get(chat, 0.0)
+            if not self._stop.is_set():
+                ready = max(ready, msgs[0][0] + self.coalesce_sec)
+            wait = ready - now
+            if best is None or wait < best_wait:
+                best, best_wait = chat, wait
+        return best, best_wait
+
+    def _take_batch(self, msgs):
+        batch, size = [], 0
+        while msgs:
+            text = msgs[0][1]
+            extra = len(text) + (len(SEPARATOR) if batch else 0)
+            if batch and size + extra > MAX_TEXT_LEN:
+                break
+            batch.append(msgs.popleft())
+            size += extra
+        return batch
+
+    def _deliver(self, chat):
+        msgs = self._pending[chat]
+        batch = self._take_batch(msgs)
+        text = SEPARATOR.join(t for _, t, _ in batch)[:MAX_TEXT_LEN]
+        now = time.time()
+        t0 = time.perf_counter()
+        try:
+            r = self._session.post(
+                f"{self.api_url}/bot{self.token}/sendMessage",
+                data={"chat_id": chat, "text": text, "parse_mode": self.parse_mode},
+                timeout=HTTP_TIMEOUT,
+            )
+        except requests.RequestException as e:
+            metrics.observe("telegram_send_seconds", time.perf_counter() - t0, status="network")
+            self.stats["errors"] += 1
+            msgs.extendleft(reversed(batch))
+            self._ready_at[chat] = now + self._backoff
+            print(f"[TG] gagal kirim ({e}), coba lagi {self._backoff:.0f}s")
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF_SEC)
+            return
+
+        metrics.observe("telegram_send_seconds", time.perf_counter() - t0, status=str(r.status_code))
+        if r.status_code == 429:
+            self.stats["429"] += 1
+            msgs.extendleft(reversed(batch))
+            try:
+                retry_after = float(r.json().get("parameters", {}).get("retry_after", 1))
+            except ValueError:
+                retry_after = float(r.headers.get("Retry-After", 1))
+            self._ready_at[chat] = now + retry_after
+            print(f"[TG] 429, retry_after {retry_after:.0f}s")
+            return
+        if r.status_code >= 500:
+            self.stats["errors"] += 1
+            msgs.extendleft(reversed(batch))
+            self._ready_at[chat] = now + self._backoff
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF_SEC)
+            return
+
+        self._backoff = 1.0
+        self._n_pending -= len(batch)
+        self._ready_at[chat] = now + self.min_interval
+        if r.status_code != 200:
+            # 400/403 dst: retry tidak akan menolong (HTML rusak, bot di-block)
+            self.stats["errors"] += 1
+            print(f"[TG] ditolak {r.status_code}: {r.text[:200]}\n{text}")
+        else:
+            self.stats["sent"] += len(batch)
+            self.stats["batches"] += 1
+        self._spool_mark_done(batch)
+
+    # ---------- spool (pesan yang belum terkirim; hanya thread worker) ----------
+    def _spool_write(self, records):
+        """Append records; flush without fsync (a killed process still leaves them in the page cache)."""
+        if not self.spool_path or not records:
+            return
+        try:
+            if self._spool_f is None:
+                self._spool_f = open(self.spool_path, "a", encoding="utf-8")
+            self._spool_f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records))
+            self._spool_f.flush()
+        except OSError as e:
+            print(f"[TG] gagal menulis spool: {e}")
+        self.stats["spooled"] = self._n_pending
+
+    def _spool_mark_done(self, batch):
+        if not self.spool_path:
+            return
+        self._spool_done += len(batch)
+        if self._n_pending == 0 or self._spool_done >= SPOOL_COMPACT_EVERY:
+            self._compact_spool()
+        else:
+            self._spool_write([{"done": [i for _, _, i in batch]}])
+
+    def _compact_spool(self):
+        """Rewrite the spool with only the undelivered messages (truncate when none)."""
+        if not self.spool_path:
+            return
+        if self._spool_f is not None:
+            self._spool_f.close()
+            self._spool_f = None
+        self._spool_done = 0
+        self.stats["spooled"] = self._n_pending
+        try:
+            if not self._n_pending:
+                if os.path.exists(self.spool_path):
+                    os.remove(self.spool_path)
+                return
+            tmp = self.spool_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for chat, msgs in self._pending.items():
+                    for ts, text, i in msgs:
+                        f.write(json.dumps({"id": i, "chat_id": chat, "ts": ts, "text": text},
+                                           ensure_ascii=False) + "\n")
+            os.replace(tmp, self.spool_path)
+        except OSError as e:
+            print(f"[TG] gagal memadatkan spool: {e}")
+
+    def _finish(self):
+        """Worker exit: spool what is still queued, compact, close."""
+        self._drain_queue()
+        self._compact_spool()
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path):
+            return
+        msgs, done = {}, set()   # msgs: urutan file = urutan kirim per chat
+        with open(self.spool_path, encoding="utf-8") as f:
+            for n, line in enumerate(f):
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue   # baris terpotong (proses mati saat menulis)
+                if "done" in rec:
+                    done.update(rec["done"])
+                else:
+                    msgs[rec.get("id", ("old", n))] = rec   # spool lama tanpa id
+        left = [rec for i, rec in msgs.items() if i not in done]
+        for rec in left:
+            self._pending.setdefault(rec["chat_id"], deque()).append((rec["ts"], rec["text"], self._next_id))
+            self._next_id += 1
+        self._n_pending += len(left)
+        self._compact_spool()
+        if left:
+            print(f"[TG] {len(left)} pesan belum terkirim dari sesi sebelumnya, dikirim ulang")
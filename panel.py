@@ -0,0 +1,361 @@
+# panel.py
+# Vectorized multi-symbol indicator panel
+# - One Panel per timeframe: aligned float64 arrays [symbols x bars] for OHLCV
+# - Indicators computed for ALL symbols at once (same definitions as `ta`)
+# - Strategy conditions (sinyalbot check_signal, salamprofit retrace) written
+#   with numpy logical ops so the same function evaluates one symbol (scalars /
+#   1-D arrays) or the whole universe (2-D arrays) -> no drift between paths
+#
+# All indicator helpers work on the LAST axis (bars), so x can be (bars,) or
+# (symbols, bars).
+
+import numpy as np
+
+from klineparse import Bars, nbars, parse_rows
+
+NAN = np.nan
+
+
+class Panel:
+    """Aligned OHLCV arrays (symbols x bars) for one timeframe."""
+
+    def __init__(self, symbols, t, o, h, l, c, v):
+        self.symbols = symbols
+        self.t, self.o, self.h, self.l, self.c, self.v = t, o, h, l, c, v
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+def build_panel(rows_by_symbol, bars):
+    """Stack the newest `bars` klines of every symbol into a Panel.
+
+    Values are raw kline rows or klineparse.Bars columns (KlineCache.get_bars,
+    copied straight into the panel). Symbols with fewer than `bars` candles
+    are left out (their indicators would not be comparable); they are listed
+    in panel.skipped.
+    """
+    symbols = [s for s, src in rows_by_symbol.items() if nbars(src) >= bars]
+    t = np.empty((len(symbols), bars), dtype=np.int64)
+    x = np.empty((5, len(symbols), bars), dtype=np.float64)   # o/h/l/c/v, tiap kolom contiguous
+    for i, s in enumerate(symbols):
+        src = rows_by_symbol[s]
+        if isinstance(src, Bars):
+            t[i] = src.t[-bars:]
+            for j in range(5):
+                x[j, i] = src[j + 1][-bars:]
+        else:
+            parse_rows(src[-bars:], (t[i], x[:, i]))
+    p = Panel(symbols, t, x[0], x[1], x[2], x[3], x[4])
+    keep = set(symbols)
+    p.skipped = [s for s in rows_by_symbol if s not in keep]
+    return p
+
+
+def build_panels(rows_by_tf, bars):
+    """One Panel per timeframe, all with the SAME symbol order.
+
+    rows_by_tf: {tf: {symbol: raw klines}}; bars: int or {tf: bars}. Only
+    symbols that have enough candles on every timeframe are kept.
+    """
+    tfs = list(rows_by_tf)
+    need = bars if isinstance(bars, dict) else {tf: bars for tf in tfs}
+    symbols = [s for s in rows_by_tf[tfs[0]]
+               if all(s in rows_by_tf[tf] and nbars(rows_by_tf[tf][s]) >= need[tf] for tf in tfs)]
+    return {tf: build_panel({s: rows_by_tf[tf][s] for s in symbols}, need[tf]) for tf in tfs}
+
+
+# ===================== INDICATORS (batched) =====================
+def _shift(x):
+    """x[..., j-1] aligned to j (first column NaN)."""
+    out = np.empty_like(x)
+    out[..., 0] = NAN
+    out[..., 1:] = x[..., :-1]
+    return out
+
+
+def rolling_mean(x, w):
+    """Series.rolling(w).mean() along the last axis (NaN if any NaN in window).
+
+    Window sums instead of a running cumsum: exact on long series (backtest)
+    where cumsum differences lose precision.
+    """
+    out = np.full(x.shape, NAN)
+    if x.shape[-1] >= w:
+        out[..., w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w, axis=-1).sum(axis=-1) / w
+    return out
+
+
+def rolling_std(x, w):
+    """Population std (ddof=0) over a rolling window of w (finite input)."""
+    out = np.full(x.shape, NAN)
+    if x.shape[-1] >= w:
+        out[..., w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w, axis=-1).std(axis=-1)
+    return out
+
+
+def rolling_min(x, w):
+    out = np.full(x.shape, NAN)
+    if x.shape[-1] >= w:
+        out[..., w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w, axis=-1).min(axis=-1)
+    return out
+
+
+def rolling_max(x, w):
+    out = np.full(x.shape, NAN)
+    if x.shape[-1] >= w:
+        out[..., w - 1:] = np.lib.stride_tricks.sliding_window_view(x, w, axis=-1).max(axis=-1)
+    return out
+
+
+def _ewm(x, alpha):
+    """ewm(alpha, adjust=False).mean() along the last axis (finite input)."""
+    if x.ndim == 1:
+        return _ewm_1d(x, alpha)
+    out = np.empty_like(x)
+    e = x[..., 0].copy()
+    out[..., 0] = e
+    for j in range(1, x.shape[-1]):
+        e = (1 - alpha) * e + alpha * x[..., j]
+        out[..., j] = e
+    return out
+
+
+def _ewm_1d(x, alpha):
+    # Series panjang (backtest): loop float Python, operasi & urutan sama -> hasil identik
+    vals = x.tolist()
+    out = [0.0] * len(vals)
+    if not vals:
+        return np.asarray(out)
+    e = out[0] = vals[0]
+    for j in range(1, len(vals)):
+        e = (1 - alpha) * e + alpha * vals[j]
+        out[j] = e
+    return np.asarray(out)
+
+
+def sma(x, w):
+    return rolling_mean(x, w)
+
+
+def ema(x, w):
+    """ta EMAIndicator (span=w, adjust=False, min_periods=w)."""
+    out = _ewm(x, 2.0 / (w + 1))
+    out[..., :w - 1] = NAN
+    return out
+
+
+def rsi(c, w=14):
+    """ta RSIIndicator (Wilder)."""
+    diff = c - _shift(c)
+    up = np.where(diff > 0, diff, 0.0)
+    dn = np.where(diff < 0, -diff, 0.0)
+    eu = _ewm(up, 1.0 / w)
+    ed = _ewm(dn, 1.0 / w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(ed == 0, 100.0, 100 - 100 / (1 + eu / ed))
+    out[..., :w - 1] = NAN
+    return out
+
+
+def true_range(h, l, c):
+    pc = _shift(c)
+    tr = np.maximum(h - l, np.maximum(np.abs(h - pc), np.abs(l - pc)))
+    tr[..., 0] = h[..., 0] - l[..., 0]
+    return tr
+
+
+def atr(h, l, c, w=14):
+    """ta AverageTrueRange (0.0 during warm-up)."""
+    tr = true_range(h, l, c)
+    out = np.zeros_like(tr)
+    n = tr.shape[-1]
+    if n < w:
+        return out
+    a = tr[..., :w].mean(axis=-1)
+    out[..., w - 1] = a
+    out[..., w:] = _wilder_tail(a, tr[..., w:], w)
+    return out
+
+
+def _wilder_tail(a, x, w):
+    """a_j = (a_{j-1} * (w - 1) + x_j) / w for every column of x."""
+    out = np.empty_like(x)
+    if x.ndim == 1:
+        a, vals, res = float(a), x.tolist(), []
+        for v in vals:
+            a = (a * (w - 1) + v) / w
+            res.append(a)
+        out[:] = res
+        return out
+    for j in range(x.shape[-1]):
+        a = (a * (w - 1) + x[..., j]) / w
+        out[..., j] = a
+    return out
+
+
+def adx(h, l, c, w=14):
+    """ta ADXIndicator.adx() (0.0 until bar 2w-1)."""
+    n = c.shape[-1]
+    out = np.zeros_like(c)
+    if n < 2 * w:
+        return out
+    pc = c[..., :-1]
+    tr = np.maximum(h[..., 1:], pc) - np.minimum(l[..., 1:], pc)
+    up = h[..., 1:] - h[..., :-1]
+    down = l[..., :-1] - l[..., 1:]
+    pdm = np.where((up > down) & (up > 0), up, 0.0)
+    ndm = np.where((down > up) & (down > 0), down, 0.0)
+    # index k di tr/pdm/ndm = bar k+1
+    tr_s = tr[..., :w].sum(axis=-1)
+    dp_s = pdm[..., :w].sum(axis=-1)
+    dn_s = ndm[..., :w].sum(axis=-1)
+    di = np.zeros_like(c)
+    if c.ndim == 1:
+        di[w:] = _adx_di_1d(tr.tolist(), pdm.tolist(), ndm.tolist(), float(tr_s), float(dp_s), float(dn_s), w, n)
+        return _adx_finish(di, out, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for j in range(w, n):
+            if j > w:
+                k = j - 1
+                tr_s = tr_s - tr_s / w + tr[..., k]
+                dp_s = dp_s - dp_s / w + pdm[..., k]
+                dn_s = dn_s - dn_s / w + ndm[..., k]
+            dip = np.where(tr_s != 0, 100 * dp_s / tr_s, 0.0)
+            din = np.where(tr_s != 0, 100 * dn_s / tr_s, 0.0)
+            di[..., j] = np.where(dip + din != 0, 100 * np.abs((dip - din) / (dip + din)), 0.0)
+    return _adx_finish(di, out, w)
+
+
+def _adx_finish(di, out, w):
+    a = di[..., w:2 * w].mean(axis=-1)
+    out[..., 2 * w - 1] = a
+    out[..., 2 * w:] = _wilder_tail(a, di[..., 2 * w:], w)
+    return out
+
+
+def _adx_di_1d(tr, pdm, ndm, tr_s, dp_s, dn_s, w, n):
+    # versi float Python dari loop DX di adx() untuk series panjang (rumus & urutan sama)
+    res = []
+    for j in range(w, n):
+        if j > w:
+            k = j - 1
+            tr_s = tr_s - tr_s / w + tr[k]
+            dp_s = dp_s - dp_s / w + pdm[k]
+            dn_s = dn_s - dn_s / w + ndm[k]
+        dip = 100 * dp_s / tr_s if tr_s != 0 else 0.0
+        din = 100 * dn_s / tr_s if tr_s != 0 else 0.0
+        res.append(100 * abs((dip - din) / (dip + din)) if dip + din != 0 else 0.0)
+    return res
+
+
+def bollinger(c, w=20, dev=2):
+    """ta BollingerBands -> (hband, lband)."""
+    m = rolling_mean(c, w)
+    s = rolling_std(c, w)
+    return m + dev * s, m - dev * s
+
+
+def stochrsi_k(c, w=14, smooth1=3):
+    """ta StochRSIIndicator.stochrsi_k() (0..1)."""
+    r = rsi(c, w)
+    lo, hi = rolling_min(r, w), rolling_max(r, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        st = (r - lo) / (hi - lo)
+    st[~np.isfinite(st)] = NAN
+    return rolling_mean(st, smooth1)
+
+
+# ===================== SINYALBOT (check_signal) =====================
+def sinyal_columns(h, l, c, v):
+    """check_signal columns for every bar (same as the old fetch_multi_tf DataFrame)."""
+    ma_fast = sma(c, 5)
+    ma_slow = sma(c, 20)
+    adx_ = adx(h, l, c, 14)
+    atr_ = atr(h, l, c, 14)
+    bb_upper, bb_lower = bollinger(c, 20, 2)
+    with np.errstate(invalid="ignore"):
+        return {
+            'close': c,
+            'adx': adx_,
+            'atr': atr_,
+            'volume_spike': v > rolling_mean(v, 20) * 1.5,
+            'trend_up': ma_fast > ma_slow,
+            'breakout_up': c > bb_upper,
+            'breakout_down': c < bb_lower,
+            'strong_adx': adx_ > 25,
+            'volatility_ok': atr_ > rolling_mean(atr_, 20),
+        }
+
+
+def last_bar(cols):
+    return {k: a[..., -1] for k, a in cols.items()}
+
+
+def sinyal_conditions(d1, d5, d15, d1h, d4h):
+    """check_signal entry logic; inputs are per-TF dicts of scalars or arrays.
+
+    Returns (cond_up, cond_down, risk_pct, price, atr_4h).
+    """
+    trend_1h = np.asarray(d1h['trend_up'], dtype=bool)
+    trend_4h = np.asarray(d4h['trend_up'], dtype=bool)
+    adx_1h = d1h['adx']
+    adx_4h = d4h['adx']
+
+    # Adaptive risk
+    risk_pct = np.where(
+        trend_1h & trend_4h & (adx_1h > 30) & (adx_4h > 30), 0.05,
+        np.where(trend_1h | trend_4h, 0.03, 0.01)
+    )
+
+    t1 = np.asarray(d1['trend_up'], dtype=bool)
+    t5 = np.asarray(d5['trend_up'], dtype=bool)
+    t15 = np.asarray(d15['trend_up'], dtype=bool)
+    common = (np.asarray(d1['volume_spike'], dtype=bool) &
+              np.asarray(d1['strong_adx'], dtype=bool) &
+              np.asarray(d1['volatility_ok'], dtype=bool))
+
+    cond_up = t1 & t5 & t15 & trend_1h & np.asarray(d1['breakout_up'], dtype=bool) & common
+    cond_down = ~t1 & ~t5 & ~t15 & ~trend_1h & np.asarray(d1['breakout_down'], dtype=bool) & common
+    return cond_up, cond_down, risk_pct, d1['close'], d4h['atr']
+
+
+# ===================== SALAMPROFIT (retrace) =====================
+def fib_band(h, l, ema20_val, p):
+    """Entry band from EMA20 + Fibo levels of the last p['FIB_LOOKBACK'] closed bars."""
+    buf = p['LIMIT_BUFFER_PCT']
+    if not p['USE_FIB']:
+        return ema20_val * (1 - buf), ema20_val * (1 + buf)
+    lb = p['FIB_LOOKBACK']
+    hh = h[..., -lb - 1:-1].max(axis=-1)
+    ll = l[..., -lb - 1:-1].min(axis=-1)
+    fib50 = ll + (hh - ll) * p['FIB_LEVELS'][0]
+    fib618 = ll + (hh - ll) * p['FIB_LEVELS'][1]
+    # Use medians to avoid extremes; create a tight band around EMA20 & fibs
+    low = np.median(np.stack(np.broadcast_arrays(ema20_val * 0.999, fib50, fib618)), axis=0) * (1 - buf)
+    high = np.median(np.stack(np.broadcast_arrays(ema20_val * 1.001, fib50, fib618)), axis=0) * (1 + buf)
+    return np.minimum(low, high), np.maximum(low, high)
+
+
+def retrace_conditions(up, down, o, h, l, c, ema_t, ema_c, rsi_, k, band_low, band_high, p):
+    """check_symbol setup/entry logic for scalars or arrays (one value per symbol).
+
+    k is StochRSI %K on the 0..1 scale of stochrsi_k / indicators.StochRSI and of
+    the STOCHK_* settings; it is compared as is, never rescaled by the callers.
+    Returns (price_ref, long_setup, long_entry, short_setup, short_entry).
+    """
+    price_ref = c if p['CONFIRM_ON_CLOSE'] else o
+    with np.errstate(invalid="ignore", divide="ignore"):
+        touched = ((l <= ema_t) & (ema_t <= h)) | (np.abs(c - ema_t) / ema_t < 0.0015)
+        in_band = (band_low <= price_ref) & (price_ref <= band_high)
+
+        long_setup = (np.asarray(up, dtype=bool) & touched & (c > ema_c) &
+                      (p['RSI_MIN_LONG'] <= rsi_) & (rsi_ <= p['RSI_MAX_LONG']) &
+                      (p['STOCHK_LOW_LONG'] <= k) & (k <= p['STOCHK_HIGH_LONG']))
+        long_entry = in_band | (price_ref <= band_high * (1 + p['SLIP_TOL_PCT']))
+
+        short_setup = (np.asarray(down, dtype=bool) & (not p['SIDE_LONG_ONLY']) & touched & (c < ema_c) &
+                       (p['RSI_MIN_SHORT'] <= rsi_) & (rsi_ <= p['RSI_MAX_SHORT']) &
+                       (p['STOCHK_LOW_SHORT'] <= k) & (k <= p['STOCHK_HIGH_SHORT']))
+        short_entry = in_band | (price_ref >= band_low * (1 - p['SLIP_TOL_PCT']))
+    return price_ref, long_setup, long_entry, short_setup, short_entry
@@ -0,0 +1,188 @@
+# ratelimit.py
+# Binance request-weight aware access for concurrent scans
+# - WeightLimiter: token bucket refilled per minute, re-synced from the
+#   x-mbx-used-weight-1m header of each call's own response (requests
+#   response hook -> thread-local), paused on 429/418 (Retry-After)
+# - LimitedClient: thread-safe wrapper around binance.client.Client that
+#   charges every futures_* call against the limiter and retries 429s
+# - scan_concurrent: run a per-symbol function on a thread pool so one pass
+#   takes ~ the slowest request instead of the sum of all requests
+# - Every call is timed and its weight counted in metrics.py (no-op unless
+#   metrics are enabled)
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from binance.exceptions import BinanceAPIException
+
+import metrics
+
+WEIGHT_LIMIT_1M = 2400        # USDT-M futures: 2400 weight / menit / IP
+WEIGHT_SAFETY = 0.8           # pakai maksimal 80% supaya ada ruang untuk bot lain
+MAX_RETRIES_429 = 3
+DEFAULT_RETRY_AFTER_SEC = 5
+
+
+def request_weight(method, kwargs):
+    """Request weight of a futures REST call (Binance docs, USDT-M)."""
+    if method == "futures_klines":
+        limit = kwargs.get("limit", 500)
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+    if method == "futures_ticker":
+        return 1 if "symbol" in kwargs else 40
+    if method == "futures_symbol_ticker":
+        return 1 if "symbol" in kwargs else 2
+    if method == "futures_mark_price":
+        return 1 if "symbol" in kwargs else 10
+    if method in ("futures_position_information", "futures_symbol_config"):
+        return 5
+    return 1
+
+
+class WeightLimiter:
+    """Token bucket over Binance request weight (per-minute budget)."""
+
+    def __init__(self, limit=WEIGHT_LIMIT_1M, safety=WEIGHT_SAFETY):
+        self.capacity = limit * safety
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.last = time.monotonic()
+        self.paused_until = 0.0
+        self.used_weight = 0          # nilai terakhir dari header server
+        self.stats = {"acquired": 0, "waited_sec": 0.0, "429": 0, "418": 0}
+        self._cond = threading.Condition()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def acquire(self, weight=1):
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    self._cond.wait(self.paused_until - now)
+                    continue
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    self.stats["acquired"] += weight
+                    break
+                self._cond.wait((weight - self.tokens) / self.rate)
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            self.stats["waited_sec"] += waited
+
+    def observe(self, used_weight):
+        """Sync with x-mbx-used-weight-1m: never assume more budget than the server does."""
+        with self._cond:
+            self.used_weight = used_weight
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def pause(self, seconds, status):
+        with self._cond:
+            self.stats[str(status)] = self.stats.get(str(status), 0) + 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After", DEFAULT_RETRY_AFTER_SEC))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SEC
+
+
+class LimitedClient:
+    """Wraps binance.client.Client: every futures_* call goes through the limiter."""
+
+    def __init__(self, client, limiter=None):
+        self._client = client
+        self.limiter = limiter or WeightLimiter()
+        # client.response dipakai bersama semua thread scan; header dibaca dari
+        # response panggilan ini sendiri lewat hook session (jalan di thread pemanggil)
+        self._local = threading.local()
+        hooks = getattr(getattr(client, "session", None), "hooks", None)
+        self._hooked = isinstance(hooks, dict)
+        if self._hooked:
+            hooks.setdefault("response", []).append(self._on_response)
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not name.startswith("futures_") or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self._call(name, attr, args, kwargs)
+
+        return call
+
+    def _call(self, name, fn, args, kwargs):
+        weight = request_weight(name, kwargs)
+        attempt = 0
+        while True:
+            with metrics.timer("binance_limiter_wait_seconds"):
+                self.limiter.acquire(weight)
+            metrics.inc("binance_weight_total", weight, method=name)
+            self._local.response = None
+            try:
+                with metrics.timer("binance_request_seconds", method=name):
+                    result = fn(*args, **kwargs)
+            except BinanceAPIException as e:
+                metrics.inc("binance_request_errors_total", method=name, status=e.status_code)
+                if e.status_code in (429, 418):
+                    metrics.inc("binance_rate_limited_total", status=e.status_code)
+                    wait = _retry_after(e)
+                    self.limiter.pause(wait, e.status_code)
+                    print(f"[RATE] {e.status_code} pada {name}, jeda {wait:.0f}s")
+                    attempt += 1
+                    if e.status_code == 429 and attempt <= MAX_RETRIES_429:
+                        continue
+                raise
+            self._sync_headers()
+            return result
+
+    def export_metrics(self):
+        """Limiter state as scrape-time gauges (metrics.serve must be running)."""
+        metrics.gauge_fn("binance_used_weight_1m", lambda: self.limiter.used_weight)
+        metrics.gauge_fn("binance_limiter_tokens", lambda: self.limiter.tokens)
+        return self
+
+    def _on_response(self, response, *args, **kwargs):
+        self._local.response = response
+
+    def _sync_headers(self):
+        if self._hooked:
+            response = self._local.response
+        else:
+            # client tanpa session.hooks: response terakhir dari thread mana pun,
+            # jadi di bawah scan_concurrent nilainya hanya perkiraan
+            response = getattr(self._client, "response", None)
+        headers = getattr(response, "headers", None)
+        if not headers:
+            return
+        used = headers.get("x-mbx-used-weight-1m") or headers.get("X-MBX-USED-WEIGHT-1M")
+        if used is not None:
+            try:
+                self.limiter.observe(int(used))
+            except ValueError:
+                pass
+
+
+def scan_concurrent(fn, items, workers=8):
+    """Run fn(item) for every item on a thread pool; returns results in order."""
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="scan") as pool:
+        return list(pool.map(fn, items))
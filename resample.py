@@ -0,0 +1,67 @@
+# resample.py
+# Higher-timeframe klines built from 1m klines, field by field like the exchange:
+# - open = first open, high/low = max/min, close = last close (original strings)
+# - volume, quote volume and taker buy volumes summed as Decimal over the raw
+#   strings, so "12.345" + "0.005" gives "12.350" and not 12.350000000000001
+# - trades summed as int, close time = open + interval - 1 (also for the bar
+#   that is still open, like futures_klines returns it)
+# KlineCache uses this to keep 5m/15m/1h/4h fresh from one 1m series per symbol.
+
+from decimal import Decimal
+
+from klinecache import INTERVAL_MS, MAX_KLINES_PER_CALL
+
+BASE_INTERVAL = "1m"
+
+
+def _dec(x):
+    # Baris dari KlineStore berisi float; repr() = desimal terpendek yang setara
+    return Decimal(x) if isinstance(x, str) else Decimal(repr(float(x)))
+
+
+def _fmt(d):
+    return format(d, "f")    # tanpa notasi ilmiah (1E-7), sama seperti string API
+
+
+def derivable(interval, base=BASE_INTERVAL):
+    """True if one REST page of `base` bars covers a whole `interval` bar."""
+    step, base_step = INTERVAL_MS.get(interval), INTERVAL_MS[base]
+    return (step is not None and step > base_step and step % base_step == 0
+            and step // base_step + 2 <= MAX_KLINES_PER_CALL)
+
+
+def aggregate(rows, interval, origin=None):
+    """Group contiguous base rows into `interval` klines (raw futures_klines format).
+
+    `origin` is the open time of any bar of the target interval (defaults to
+    epoch alignment); the last group is partial if the base rows stop early.
+    """
+    step = INTERVAL_MS[interval]
+    origin = 0 if origin is None else int(origin)
+    out, group, bucket = [], [], None
+    for k in rows:
+        t = int(k[0])
+        b = t - (t - origin) % step
+        if b != bucket and group:
+            out.append(_bar(group, bucket, step))
+            group = []
+        bucket = b
+        group.append(k)
+    if group:
+        out.append(_bar(group, bucket, step))
+    return out
+
+
+def _bar(group, t, step):
+    high = max(group, key=lambda k: float(k[2]))[2]
+    low = min(group, key=lambda k: float(k[3]))[3]
+    v = qv = tbv = tbqv = Decimal(0)
+    n = 0
+    for k in group:
+        v += _dec(k[5])
+        qv += _dec(k[7])
+        n += int(k[8])
+        tbv += _dec(k[9])
+        tbqv += _dec(k[10])
+    return [t, group[0][1], high, low, group[-1][4], _fmt(v), t + step - 1,
+            _fmt(qv), n, _fmt(tbv), _fmt(tbqv), "0"]
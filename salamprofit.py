@@ -7,8 +7,15 @@
 # - Validity window + slip tolerance (late entries still safe)
 # - Dynamic SL/TP (percent-based) suitable for high leverage (e.g., 75x)
 # - Optional: Only LONG in uptrend, or include SHORT in downtrend
-# - Optional: Set leverage and margin type (ISOLATED) via API
+# - Optional: Set leverage and margin type (ISOLATED) via API (one bulk read, only
+#   the differing settings are changed, in the background)
 # - Re-alert on retest after expiry
+# - Optional: WebSocket stream mode (event-driven, no polling loop)
+# - Pairs scanned concurrently; every REST call goes through a request-weight limiter
+# - Telegram delivery in a background notifier (coalescing, retry_after, crash-safe spool)
+# - Optional: run together with sinyalbot on one data pipeline (python engine.py, RetraceStrategy)
+# - Restart: the last closed 15m bar is scanned right away; time to the first
+#   scan is printed and exported (startup_seconds)
 #
 # Dependencies:
 #   pip install python-binance pandas numpy ta python-dotenv requests
@@ -18,15 +25,25 @@
 import os
 import time
 import math
-import requests
+import queue
+import threading
 import numpy as np
-import pandas as pd
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from binance.client import Client
 from binance.enums import HistoricalKlinesType
-from ta.trend import EMAIndicator
-from ta.momentum import RSIIndicator, StochRSIIndicator
+from klinecache import shared_cache
+from klinestore import shared_store
+from klineparse import to_frame, before
+from ratelimit import LimitedClient, scan_concurrent
+from notifier import TelegramNotifier
+from wsstream import MarketStream
+from scheduler import ServerClock, CloseScheduler
+import metrics
+from journal import Journal
+from eventlog import EventLog
+from indicators import IndicatorSet, EMA, RSI, StochRSI
+from panel import build_panels, ema as ema_arr, rsi as rsi_arr, stochrsi_k, fib_band, retrace_conditions
 
 # ===================== ENV & SETUP =====================
 load_dotenv()
@@ -51,12 +68,23 @@ TF_TREND = "1h"    # trend filter timeframe
 TF_ENTRY = "15m"   # entry timing timeframe
 
 SCAN_EVERY_SEC = 30            # loop pacing
+SCAN_WORKERS = 8               # pairs fetched/evaluated in parallel (request weight is rate limited)
+PANEL_SCAN = False             # True: evaluate all PAIRS at once as [pairs x bars] arrays
 CANDLES_FETCH_TREND = 300
 CANDLES_FETCH_ENTRY = 400
+KLINE_STORE_DIR = ""           # e.g. "klines": persist closed candles on disk, warm-start after restart
+DERIVE_TF = True               # True: 15m/1h kept fresh from one 1m series (REST only seeds the lookback)
 
 # Modes
 CONFIRM_ON_CLOSE = True        # True: signal after 15m candle CLOSE; False: early ping (more risk)
+STREAM_MODE = False            # True: WebSocket kline stream (event-driven) instead of polling every SCAN_EVERY_SEC
+CLOSE_SCHEDULER = True         # confirm on close + polling: scan right after each 15m close (server time), not every SCAN_EVERY_SEC
+STREAM_EVAL_MIN_SEC = 5        # stream + early ping: re-evaluate an open 15m bar at most every N sec
 SIDE_LONG_ONLY = False          # True: LONG only (with uptrend); False: also SHORT in downtrend
+METRICS_PORT = 0               # e.g. 9109: Prometheus endpoint on 127.0.0.1 (0 = off, no overhead)
+METRICS_PROFILE = False        # True: keep the sampling profiler running (GET /profile)
+STATE_DIR = "state"            # journal of the anti-spam memory (survives restarts); "" = off
+EVENT_DIR = "events"           # structured signal/realert log + index (python eventlog.py); "" = off
 
 # Trend (1H)
 EMA_FAST_TREND = 50
@@ -93,56 +121,98 @@ LEVERAGE_ON_STARTUP = True     # apply on bot start
 REALERT_COOLDOWN_MIN = 20      # after sending a signal, avoid spamming within N minutes
 # ==================================================
 
+RETRACE_PARAM_KEYS = (
+    "CONFIRM_ON_CLOSE", "SIDE_LONG_ONLY",
+    "RSI_MIN_LONG", "RSI_MAX_LONG", "RSI_MIN_SHORT", "RSI_MAX_SHORT",
+    "STOCHK_LOW_LONG", "STOCHK_HIGH_LONG", "STOCHK_LOW_SHORT", "STOCHK_HIGH_SHORT",
+    "USE_FIB", "FIB_LOOKBACK", "FIB_LEVELS", "SLIP_TOL_PCT", "LIMIT_BUFFER_PCT",
+)
+
+def retrace_params():
+    """Current retrace config as a dict (input for panel.fib_band / retrace_conditions)."""
+    g = globals()
+    return {key: g[key] for key in RETRACE_PARAM_KEYS}
+
+notifier = None           # TelegramNotifier (opened in main, like the journal below)
+
 def tg(msg: str):
-    """Send Telegram message (fallback to print)."""
-    if not TG_TOKEN or not TG_CHAT:
-        print("[TG]", msg)
-        return
-    try:
-        requests.get(
-            f"https://api.telegram.org/bot{TG_TOKEN}/sendMessage",
-            params={"chat_id": TG_CHAT, "text": msg, "parse_mode": "HTML"},
-            timeout=10
-        )
-    except Exception as e:
-        print("TG error:", e, "\n", msg)
+    """Queue a Telegram message (fallback to print); delivery runs in the notifier thread."""
+    notifier.send(msg)
 
 def binance_client():
-    return Client(API_KEY, API_SECRET)
+    # ping=False: tanpa request ping ke API spot saat start (bot ini hanya pakai futures)
+    return LimitedClient(Client(API_KEY, API_SECRET, ping=False))
 
-def get_klines_df(client, symbol, interval, limit):
-    """Fetch closed candles for given symbol/timeframe from Binance Futures."""
+def get_klines(client, symbol, interval, limit):
+    """Raw candles for given symbol/timeframe (shared ring buffer, only new/open bars hit REST)."""
     # Use the dedicated futures endpoint to avoid extra params errors (-1104)
-    kl = client.futures_klines(symbol=symbol, interval=interval, limit=limit)
-    cols = ["t","o","h","l","c","v","ct","qv","ntr","tbbav","tbqv","ig"]
-    df = pd.DataFrame(kl, columns=cols)
-    for col in ["o","h","l","c","v"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
-    df["t"] = pd.to_datetime(df["t"], unit="ms", utc=True)
-    return df[["t","o","h","l","c","v"]]
-
-def add_indicators(df, ema_fast=20, ema_slow=50):
-    df = df.copy()
-    df["ema_fast"] = EMAIndicator(close=df["c"], window=ema_fast).ema_indicator()
-    df["ema_slow"] = EMAIndicator(close=df["c"], window=ema_slow).ema_indicator()
-    df["rsi"] = RSIIndicator(close=df["c"], window=14).rsi()
-    st = StochRSIIndicator(close=df["c"], window=14, smooth1=3, smooth2=3)
-    df["stoch_k"] = st.stochrsi_k() / 100.0  # 0..1
-    return df
-
-def ema_uptrend(df_1h):
-    ema_fast = EMAIndicator(close=df_1h["c"], window=EMA_FAST_TREND).ema_indicator()
-    ema_slow = EMAIndicator(close=df_1h["c"], window=EMA_SLOW_TREND).ema_indicator()
-    return float(ema_fast.iloc[-1]) > float(ema_slow.iloc[-1])
-
-def ema_downtrend(df_1h):
-    ema_fast = EMAIndicator(close=df_1h["c"], window=EMA_FAST_TREND).ema_indicator()
-    ema_slow = EMAIndicator(close=df_1h["c"], window=EMA_SLOW_TREND).ema_indicator()
-    return float(ema_fast.iloc[-1]) < float(ema_slow.iloc[-1])
-
-def last_candle(df):
-    c = df.iloc[-1]
-    return float(c["o"]), float(c["h"]), float(c["l"]), float(c["c"])
+    return kline_cache(client).get(symbol, interval, limit)
+
+def kline_cache(client):
+    return shared_cache(client, shared_store(KLINE_STORE_DIR) if KLINE_STORE_DIR else None, DERIVE_TF)
+
+def get_bars(client, symbol, interval, limit):
+    """Same candles as get_klines as contiguous numpy columns (t/o/h/l/c/v), parsed incrementally."""
+    return kline_cache(client).get_bars(symbol, interval, limit)
+
+def get_klines_df(client, symbol, interval, limit):
+    """pandas view of the candles (debugging only; the scan itself never builds DataFrames)."""
+    return to_frame(get_bars(client, symbol, interval, limit))
+
+class TrendIndicators(IndicatorSet):
+    """EMA50/EMA200 on TF_TREND, updated once per new/revised candle."""
+    def _build(self):
+        self.ema_fast = EMA(EMA_FAST_TREND)
+        self.ema_slow = EMA(EMA_SLOW_TREND)
+
+    def _update(self, row, revise):
+        c = float(row[4])
+        if revise:
+            self.ema_fast.revise(c)
+            self.ema_slow.revise(c)
+        else:
+            self.ema_fast.update(c)
+            self.ema_slow.update(c)
+
+class EntryIndicators(IndicatorSet):
+    """EMA_TOUCH/EMA_CONFIRM, RSI(14) and StochRSI %K on TF_ENTRY."""
+    def _build(self):
+        self.ema_fast = EMA(EMA_TOUCH)
+        self.ema_slow = EMA(EMA_CONFIRM)
+        self.rsi = RSI(14)
+        self.stoch = StochRSI(14, 3, 3)
+
+    def _update(self, row, revise):
+        c = float(row[4])
+        if revise:
+            self.ema_fast.revise(c)
+            self.ema_slow.revise(c)
+            self.rsi.revise(c)
+            self.stoch.revise(c)
+        else:
+            self.ema_fast.update(c)
+            self.ema_slow.update(c)
+            self.rsi.update(c)
+            self.stoch.update(c)
+
+indicator_sets = {}       # {(symbol, tf): IndicatorSet}
+
+def indicators_for(sym, tf, cls, kl):
+    """Streaming indicator state for (sym, tf), synced to the latest candles."""
+    ind = indicator_sets.get((sym, tf))
+    if ind is None:
+        ind = indicator_sets[(sym, tf)] = cls()
+    return ind.sync(kl)
+
+def ema_uptrend(trend):
+    return float(trend.ema_fast.value) > float(trend.ema_slow.value)
+
+def ema_downtrend(trend):
+    return float(trend.ema_fast.value) < float(trend.ema_slow.value)
+
+def last_candle(kl):
+    c = kl[-1]
+    return float(c[1]), float(c[2]), float(c[3]), float(c[4])
 
 def fmt(n):
     return f"{n:.6f}".rstrip("0").rstrip(".")
@@ -158,67 +228,136 @@ def build_sl_tp(side, price):
         tp2 = price * (1 - TP2_PCT)
     return sl, tp1, tp2
 
-def compute_fib_band(df15, ema20_val):
+def compute_fib_band(bars15, ema20_val):
     """Compute an entry band using EMA20 and Fibo 0.5/0.618 of recent swing (lookback FIB_LOOKBACK)."""
-    if not USE_FIB:
-        return ema20_val * (1 - LIMIT_BUFFER_PCT), ema20_val * (1 + LIMIT_BUFFER_PCT)
-
-    hh = df15["h"].iloc[-FIB_LOOKBACK-1:-1].max()
-    ll = df15["l"].iloc[-FIB_LOOKBACK-1:-1].min()
-    fib50  = ll + (hh - ll) * FIB_LEVELS[0]
-    fib618 = ll + (hh - ll) * FIB_LEVELS[1]
-
-    # Use medians to avoid extremes; create a tight band around EMA20 & fibs
-    low  = np.median([ema20_val*0.999, fib50, fib618]) * (1 - LIMIT_BUFFER_PCT)
-    high = np.median([ema20_val*1.001, fib50, fib618]) * (1 + LIMIT_BUFFER_PCT)
-    if low > high:  # safety
-        low, high = high, low
+    low, high = fib_band(bars15.h, bars15.l, ema20_val, retrace_params())
     return float(low), float(high)
 
+def account_config(client):
+    """Current margin type + leverage per symbol in one request: {symbol: row}.
+
+    symbolConfig lists every symbol; positionRisk (fallback) only the ones with
+    a position. {} if both fail - then every setting is simply sent.
+    """
+    for method in ("futures_symbol_config", "futures_position_information"):
+        try:
+            return {row["symbol"]: row for row in getattr(client, method)()}
+        except Exception as e:
+            print(f"[ACC] {method} gagal: {e}")
+    return {}
+
+def account_changes(config):
+    """[(symbol, {"margin": bool, "leverage": bool})] for the PAIRS whose settings differ."""
+    out = []
+    for sym in PAIRS:
+        row = config.get(sym)
+        margin = SET_ISOLATED and (row is None or str(row.get("marginType", "")).upper() != "ISOLATED")
+        try:
+            leverage = bool(SET_LEVERAGE) and (row is None or int(row["leverage"]) != SET_LEVERAGE)
+        except (KeyError, TypeError, ValueError):
+            leverage = bool(SET_LEVERAGE)
+        if margin or leverage:
+            out.append((sym, {"margin": margin, "leverage": leverage}))
+    return out
+
 def apply_account_settings_once(client):
+    """Isolated margin + leverage for PAIRS: one bulk read, then only the differing settings,
+    changed concurrently (through the client's weight limiter)."""
     if not LEVERAGE_ON_STARTUP:
         return
-    for sym in PAIRS:
+    t0 = time.time()
+    changes = account_changes(account_config(client))
+
+    def send(call, sym, **params):
         try:
-            if SET_ISOLATED:
-                client.futures_change_margin_type(symbol=sym, marginType="ISOLATED")
-            if SET_LEVERAGE:
-                client.futures_change_leverage(symbol=sym, leverage=SET_LEVERAGE)
-            print(f"[ACC] {sym}: ISOLATED={SET_ISOLATED} LEV={SET_LEVERAGE}")
+            call(symbol=sym, **params)
+            return "changed"
         except Exception as e:
             msg = str(e)
             # Binance biasanya kasih code di pesan error
             if "-4046" in msg or "-4003" in msg:
-                print(f"[ACC] {sym}: sudah sesuai (di-skip).")
-            else:
-                print(f"[ACC] Skip {sym}: {e}")
+                return "same"
+            print(f"[ACC] Skip {sym}: {e}")
+            return "failed"
+
+    def apply(change):
+        """"changed" if any setting was changed, "failed" if any call failed, else "same"."""
+        sym, todo = change
+        out = []
+        if todo["margin"]:
+            out.append(send(client.futures_change_margin_type, sym, marginType="ISOLATED"))
+        if todo["leverage"]:
+            out.append(send(client.futures_change_leverage, sym, leverage=SET_LEVERAGE))
+        if "failed" in out:
+            return "failed"
+        if "changed" in out:
+            print(f"[ACC] {sym}: ISOLATED={SET_ISOLATED} LEV={SET_LEVERAGE}")
+            return "changed"
+        print(f"[ACC] {sym}: sudah sesuai (di-skip).")
+        return "same"
+
+    done = scan_concurrent(apply, changes, SCAN_WORKERS)
+    print(f"[ACC] {len(PAIRS)} pair: {len(PAIRS) - len(changes) + done.count('same')} sudah sesuai, "
+          f"{done.count('changed')} diubah, {done.count('failed')} gagal ({time.time() - t0:.1f}s)")
+
+def start_account_setup(client):
+    """apply_account_settings_once in the background: alerts do not depend on it, so the first
+    scan does not wait for it."""
+    if LEVERAGE_ON_STARTUP:
+        threading.Thread(target=apply_account_settings_once, args=(client,), name="account-setup",
+                         daemon=True).start()
 
 
 # Memory for anti-spam & retest
 last_signal_time = {}     # {symbol: timestamp}
 last_band = {}            # {symbol: (low, high, expiry_ts)}
 last_side = {}            # {symbol: "LONG"/"SHORT"}
+state_lock = threading.Lock()  # memory above is shared by the concurrent scan threads
+state = None              # Journal (opened in main) mirroring the memory above
+events = None             # EventLog (opened in main)
 
-def should_realert(sym):
+def should_realert(sym, now=None):
     """Check cooldown to avoid spamming signals."""
-    now = time.time()
+    now = time.time() if now is None else now
     ts = last_signal_time.get(sym, 0)
     return (now - ts) > (REALERT_COOLDOWN_MIN * 60)
 
-def mark_signal(sym, band_low, band_high, expiry_ts, side):
-    last_signal_time[sym] = time.time()
+def mark_signal(sym, band_low, band_high, expiry_ts, side, now=None):
+    last_signal_time[sym] = time.time() if now is None else now
     last_band[sym] = (band_low, band_high, expiry_ts)
     last_side[sym] = side
+    if state is not None:
+        state.set("retrace", sym, {"time": last_signal_time[sym], "band": last_band[sym], "side": side})
+
+def open_state():
+    """Open the notifier, journal + event log and restore the anti-spam memory of the previous run.
 
-def maybe_realert(sym, current_price):
+    Called by main() / RetraceStrategy.start(), never at import; a second call does nothing.
+    """
+    global notifier, state, events
+    if notifier is not None:
+        return
+    notifier = TelegramNotifier(TG_TOKEN, TG_CHAT, spool_path="telegram_pending_retrace.jsonl")
+    if EVENT_DIR:
+        events = EventLog(EVENT_DIR, "salamprofit")
+    if not STATE_DIR:
+        return
+    state = Journal(STATE_DIR, "salamprofit")
+    for sym, rec in state.recovered.get("retrace", {}).items():
+        last_signal_time[sym] = rec["time"]
+        last_band[sym] = tuple(rec["band"])
+        last_side[sym] = rec["side"]
+    print(f"[STATE] {len(last_band)} pair restored from {STATE_DIR}/ ({state.stats['recovery_ms']} ms)")
+
+def maybe_realert(sym, current_price, now=None):
     """If band expired, re-alert when price revisits band after cooldown."""
     if sym not in last_band:
         return False
     band_low, band_high, expiry_ts = last_band[sym]
-    now = time.time()
+    now = time.time() if now is None else now
     if now <= expiry_ts:
         return False  # still valid; no need
-    if not should_realert(sym):
+    if not should_realert(sym, now):
         return False
     if band_low <= current_price <= band_high:
         return True
@@ -226,7 +365,7 @@ def maybe_realert(sym, current_price):
 
 def signal_text(sym, side, entry_low, entry_high, price_ref, rsi, k):
     now_utc = datetime.utcnow()
-    expiry = now_utc + pd.Timedelta(minutes=ENTRY_WINDOW_MIN)
+    expiry = now_utc + timedelta(minutes=ENTRY_WINDOW_MIN)
     sl, tp1, tp2 = build_sl_tp(side, price_ref)
     mode = "Confirm on close" if CONFIRM_ON_CLOSE else "Early ping"
     return (
@@ -240,11 +379,33 @@ def signal_text(sym, side, entry_low, entry_high, price_ref, rsi, k):
         f"Tips: hitung SL/TP dari <i>harga fill</i> kamu."
     ), (time.time() + ENTRY_WINDOW_MIN * 60)
 
-def check_symbol(client, sym):
+def check_symbol(client, sym, until_ms=None):
+    # until_ms: only bars opened before it (scheduler passes the close boundary -> newest bar = the one that just closed)
+    def trend():
+        kl1h = before(get_klines(client, sym, TF_TREND, CANDLES_FETCH_TREND), until_ms)
+        ind = indicators_for(sym, TF_TREND, TrendIndicators, kl1h)
+        return float(ind.ema_fast.value), float(ind.ema_slow.value)
+
+    def entry():
+        kl15 = before(get_klines(client, sym, TF_ENTRY, CANDLES_FETCH_ENTRY), until_ms)
+        ind15 = indicators_for(sym, TF_ENTRY, EntryIndicators, kl15)
+        return (last_candle(kl15), float(ind15.ema_fast.value), float(ind15.ema_slow.value),
+                float(ind15.rsi.value), float(ind15.stoch.value))
+
+    bars15 = lambda: before(kline_cache(client).bars(sym, TF_ENTRY, FIB_LOOKBACK + 2), until_ms)
+    evaluate_retrace(sym, trend, entry, bars15)
+
+def evaluate_retrace(sym, trend, entry, bars15):
+    """check_symbol on top of any data source (own cache or engine.py).
+
+    trend() -> (ema_fast, ema_slow) on TF_TREND; entry() -> ((o, h, l, c),
+    ema_touch, ema_confirm, rsi, stoch_k) on TF_ENTRY; bars15() -> the last
+    FIB_LOOKBACK + 2 TF_ENTRY bars. Called lazily: no trend, no entry fetch.
+    """
     # 1) Trend filter (1H)
-    df1h = get_klines_df(client, sym, TF_TREND, CANDLES_FETCH_TREND)
-    up = ema_uptrend(df1h)
-    down = ema_downtrend(df1h)
+    ema_f, ema_s = trend()
+    up = ema_f > ema_s
+    down = ema_f < ema_s
 
     if SIDE_LONG_ONLY:
         if not up:
@@ -254,81 +415,209 @@ def check_symbol(client, sym):
             return
 
     # 2) Entry timing (15m)
-    df15 = get_klines_df(client, sym, TF_ENTRY, CANDLES_FETCH_ENTRY)
-    df15 = add_indicators(df15, ema_fast=EMA_TOUCH, ema_slow=EMA_CONFIRM)
-    o,h,l,c = last_candle(df15)
-
-    ema_t = float(df15["ema_fast"].iloc[-1])
-    ema_c = float(df15["ema_slow"].iloc[-1])
-    rsi = float(df15["rsi"].iloc[-1])
-    k = float(df15["stoch_k"].iloc[-1])
+    (o, h, l, c), ema_t, ema_c, rsi, k = entry()   # k: StochRSI %K, sudah 0..1 (skala STOCHK_*)
 
     # Compute entry band
-    band_low, band_high = compute_fib_band(df15, ema_t)
-    price_ref = c if CONFIRM_ON_CLOSE else o
-
-    # Conditions
-    if up:
-        # Need touch EMA20 & hold above EMA50
-        touched = (l <= ema_t <= h) or (abs(c-ema_t)/ema_t < 0.0015)
-        above50 = c > ema_c
-        ok_rsi = (RSI_MIN_LONG <= rsi <= RSI_MAX_LONG)
-        ok_k = (STOCHK_LOW_LONG <= k <= STOCHK_HIGH_LONG)
-
-        if touched and above50 and ok_rsi and ok_k:
-            # Late entry tolerance
-            slip_ok = (price_ref <= band_high*(1+SLIP_TOL_PCT))
-            if (band_low <= price_ref <= band_high) or slip_ok:
-                txt, expiry_ts = signal_text(sym, "LONG", band_low, band_high, price_ref, rsi, k)
-                if should_realert(sym):
-                    tg(txt)
-                    print(txt)
-                    mark_signal(sym, band_low, band_high, expiry_ts, "LONG")
-                return
-            # maybe re-alert on retest after expiry
-            if maybe_realert(sym, price_ref):
-                txt, expiry_ts = signal_text(sym, "LONG", band_low, band_high, price_ref, rsi, k)
-                tg(txt)
-                print(txt)
-                mark_signal(sym, band_low, band_high, expiry_ts, "LONG")
-                return
-
-    if (not SIDE_LONG_ONLY) and down:
-        touched = (l <= ema_t <= h) or (abs(c-ema_t)/ema_t < 0.0015)
-        below50 = c < ema_c
-        ok_rsi = (RSI_MIN_SHORT <= rsi <= RSI_MAX_SHORT)
-        ok_k = (STOCHK_LOW_SHORT <= k <= STOCHK_HIGH_SHORT)
-
-        if touched and below50 and ok_rsi and ok_k:
-            slip_ok = (price_ref >= band_low*(1-SLIP_TOL_PCT))
-            if (band_low <= price_ref <= band_high) or slip_ok:
-                txt, expiry_ts = signal_text(sym, "SHORT", band_low, band_high, price_ref, rsi, k)
-                if should_realert(sym):
-                    tg(txt)
-                    print(txt)
-                    mark_signal(sym, band_low, band_high, expiry_ts, "SHORT")
-                return
-            if maybe_realert(sym, price_ref):
-                txt, expiry_ts = signal_text(sym, "SHORT", band_low, band_high, price_ref, rsi, k)
-                tg(txt)
-                print(txt)
-                mark_signal(sym, band_low, band_high, expiry_ts, "SHORT")
-                return
+    band_low, band_high = compute_fib_band(bars15(), ema_t)
+
+    # Conditions: touch EMA20 & hold above/below EMA50 + RSI/StochK (+ late entry tolerance)
+    with metrics.timer("conditions_seconds", strategy="retrace"):
+        price_ref, long_setup, long_entry, short_setup, short_entry = retrace_conditions(
+            up, down, o, h, l, c, ema_t, ema_c, rsi, k, band_low, band_high, retrace_params()
+        )
+    with state_lock:
+        emit_retrace(sym, band_low, band_high, float(price_ref), rsi, k,
+                     bool(long_setup), bool(long_entry), bool(short_setup), bool(short_entry))
+
+class RetraceStrategy:
+    """Plug-in for engine.py: PAIRS through the shared data pipeline, same rules as check_symbol."""
+    name = "retrace"
+    scan_tf = TF_ENTRY if CONFIRM_ON_CLOSE else "1m"   # early ping: re-evaluate the open bar every minute
+    timeframes = {TF_TREND: CANDLES_FETCH_TREND, TF_ENTRY: CANDLES_FETCH_ENTRY}
+    features = {TF_TREND: [("ema", EMA_FAST_TREND), ("ema", EMA_SLOW_TREND)],
+                TF_ENTRY: [("ema", EMA_TOUCH), ("ema", EMA_CONFIRM), ("rsi", 14), ("stochrsi", 14, 3, 3)]}
+
+    def __init__(self, client):
+        self.client = client
+
+    def start(self):
+        open_state()
+        start_account_setup(self.client)
+
+    def universe(self):
+        return PAIRS
+
+    def evaluate(self, sym, view):
+        def trend():
+            f = view.features(TF_TREND)
+            return float(f[("ema", EMA_FAST_TREND)]), float(f[("ema", EMA_SLOW_TREND)])
+
+        def entry():
+            f = view.features(TF_ENTRY)
+            return (last_candle(view.rows(TF_ENTRY)), float(f[("ema", EMA_TOUCH)]),
+                    float(f[("ema", EMA_CONFIRM)]), float(f[("rsi", 14)]), float(f[("stochrsi", 14, 3, 3)]))
+
+        with metrics.timer("check_seconds", bot="salamprofit"):
+            evaluate_retrace(sym, trend, entry, lambda: view.bars(TF_ENTRY, FIB_LOOKBACK + 2))
+
+def check_symbol_safe(client, sym, until_ms=None):
+    try:
+        with metrics.timer("check_seconds", bot="salamprofit"):
+            check_symbol(client, sym, until_ms)
+    except Exception as e:
+        print(f"[{sym}] Error:", e)
+
+def retrace_decision(sym, price_ref, long_setup, long_entry, short_setup, short_entry, now=None):
+    """Side to alert given setup/entry flags and the anti-spam memory, or None."""
+    for side, setup, entry in (("LONG", long_setup, long_entry), ("SHORT", short_setup, short_entry)):
+        if not setup:
+            continue
+        if entry:
+            return side if should_realert(sym, now) else None
+        # maybe re-alert on retest after expiry
+        if maybe_realert(sym, price_ref, now):
+            return side
+    return None
+
+def emit_retrace(sym, band_low, band_high, price_ref, rsi, k,
+                 long_setup, long_entry, short_setup, short_entry):
+    """Alert (or re-alert on retest after expiry) with anti-spam memory."""
+    side = retrace_decision(sym, price_ref, long_setup, long_entry, short_setup, short_entry)
+    if side is None:
+        return
+    txt, expiry_ts = signal_text(sym, side, band_low, band_high, price_ref, rsi, k)
+    metrics.inc("signals_total", bot="salamprofit", symbol=sym, side=side)
+    tg(txt)
+    print(txt)
+    if events is not None:
+        # entry di band = sinyal baru; tanpa entry = retest band yang sudah kedaluwarsa
+        fresh = long_entry if side == "LONG" else short_entry
+        sl, tp1, tp2 = build_sl_tp(side, price_ref)
+        events.record("signal" if fresh else "realert", sym, side=side, price=price_ref,
+                      band_low=band_low, band_high=band_high, sl=sl, tp1=tp1, tp2=tp2,
+                      rsi=rsi, stoch_k=k, expiry=expiry_ts)
+    mark_signal(sym, band_low, band_high, expiry_ts, side)
+
+def scan_pairs_panel(client, until_ms=None):
+    """check_symbol for all PAIRS at once: indicators & conditions as [pairs x bars] arrays."""
+    rows = {TF_TREND: {}, TF_ENTRY: {}}
+    extra = 0 if until_ms is None else 1   # bar yang masih open dibuang oleh before()
+
+    def fetch(sym):
+        try:
+            return (before(get_bars(client, sym, TF_TREND, CANDLES_FETCH_TREND + extra), until_ms),
+                    before(get_bars(client, sym, TF_ENTRY, CANDLES_FETCH_ENTRY + extra), until_ms))
+        except Exception as e:
+            print(f"[{sym}] Error:", e)
+
+    for sym, kl in zip(PAIRS, scan_concurrent(fetch, PAIRS, SCAN_WORKERS)):
+        if kl is not None:
+            rows[TF_TREND][sym], rows[TF_ENTRY][sym] = kl
+    panels = build_panels(rows, {TF_TREND: CANDLES_FETCH_TREND, TF_ENTRY: CANDLES_FETCH_ENTRY})
+    p1h, p15 = panels[TF_TREND], panels[TF_ENTRY]
+    if not len(p15):
+        return
+
+    t0 = time.perf_counter()
+    # 1) Trend filter (1H)
+    ema_f = ema_arr(p1h.c, EMA_FAST_TREND)[:, -1]
+    ema_s = ema_arr(p1h.c, EMA_SLOW_TREND)[:, -1]
+    up, down = ema_f > ema_s, ema_f < ema_s
+
+    # 2) Entry timing (15m)
+    ema_t = ema_arr(p15.c, EMA_TOUCH)[:, -1]
+    ema_c = ema_arr(p15.c, EMA_CONFIRM)[:, -1]
+    rsi = rsi_arr(p15.c, 14)[:, -1]
+    k = stochrsi_k(p15.c, 14, 3)[:, -1]  # 0..1
+    o, h, l, c = p15.o[:, -1], p15.h[:, -1], p15.l[:, -1], p15.c[:, -1]
+    params = retrace_params()
+    band_low, band_high = fib_band(p15.h, p15.l, ema_t, params)
+    price_ref, long_setup, long_entry, short_setup, short_entry = retrace_conditions(
+        up, down, o, h, l, c, ema_t, ema_c, rsi, k, band_low, band_high, params
+    )
+    metrics.observe("conditions_seconds", time.perf_counter() - t0, strategy="retrace_panel")
+    for i in (long_setup | short_setup).nonzero()[0]:
+        emit_retrace(p15.symbols[i], float(band_low[i]), float(band_high[i]), float(price_ref[i]),
+                     float(rsi[i]), float(k[i]), bool(long_setup[i]), bool(long_entry[i]),
+                     bool(short_setup[i]), bool(short_entry[i]))
+
+def run_stream(client):
+    """Event-driven mode: evaluate a pair as soon as its entry-TF kline updates/closes."""
+    stream = MarketStream(
+        kline_cache(client), PAIRS, [TF_TREND, TF_ENTRY], mark_price=False,
+        seed_limit={TF_TREND: CANDLES_FETCH_TREND, TF_ENTRY: CANDLES_FETCH_ENTRY}
+    ).start()
+    metrics.gauge_fn("stream_queue_depth", stream.events.qsize)
+    last_eval = {}
+    try:
+        while True:
+            try:
+                _, sym, tf, closed = stream.events.get(timeout=1)
+            except queue.Empty:
+                continue
+            if tf != TF_ENTRY:
+                continue
+            if CONFIRM_ON_CLOSE and not closed:
+                continue
+            if not closed and time.time() - last_eval.get(sym, 0) < STREAM_EVAL_MIN_SEC:
+                continue
+            last_eval[sym] = time.time()
+            try:
+                check_symbol(client, sym)
+            except Exception as e:
+                print(f"[{sym}] Error:", e)
+    except KeyboardInterrupt:
+        print("Stop.")
+    finally:
+        stream.stop()
+
+def scan_pairs(client, until_ms=None):
+    with metrics.timer("scan_pass_seconds", bot="salamprofit"):
+        if PANEL_SCAN:
+            scan_pairs_panel(client, until_ms)
+        else:
+            scan_concurrent(lambda sym: check_symbol_safe(client, sym, until_ms), PAIRS, SCAN_WORKERS)
+    metrics.set_gauge("scan_symbols", len(PAIRS), bot="salamprofit")
+    first = metrics.startup("first_scan", "salamprofit")
+    if first is not None:
+        print(f"[START] scan pertama selesai {first:.1f}s sejak proses start")
+
+def run_on_close(client):
+    """Polling aligned to TF_ENTRY closes: one scan per closed 15m bar, right after the close."""
+    def job(boundary_ms):
+        t0 = time.time()
+        scan_pairs(client, boundary_ms)
+        closed = datetime.fromtimestamp(boundary_ms / 1000, timezone.utc).strftime('%H:%M')
+        print(f"[SCHED] close {closed} UTC: {len(PAIRS)} pairs dalam {time.time() - t0:.1f}s")
+
+    # catch_up: bar TF_ENTRY yang close terakhir langsung discan, tidak menunggu close berikutnya
+    sched = CloseScheduler(ServerClock(client)).every_close(TF_ENTRY, job, "scan", catch_up=True)
+    try:
+        sched.run_forever()
+    except KeyboardInterrupt:
+        print("Stop.")
 
 def main():
     client = binance_client()
     print("Bot sinyal retrace anti-FOMO berjalan…")
-    if LEVERAGE_ON_STARTUP:
-        apply_account_settings_once(client)
+    open_state()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, profile=METRICS_PROFILE)
+        client.export_metrics()
+        metrics.gauge_fn("telegram_queue_depth", notifier.depth)
+    start_account_setup(client)
+    metrics.startup("ready", "salamprofit")
+    if STREAM_MODE:
+        run_stream(client)
+        return
+    if CONFIRM_ON_CLOSE and CLOSE_SCHEDULER:
+        run_on_close(client)
+        return
 
     while True:
         loop_start = time.time()
         try:
-            for sym in PAIRS:
-                try:
-                    check_symbol(client, sym)
-                except Exception as e:
-                    print(f"[{sym}] Error:", e)
+            scan_pairs(client)
             # pacing
             dt = time.time() - loop_start
             time.sleep(max(5, SCAN_EVERY_SEC - dt))
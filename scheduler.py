@@ -0,0 +1,137 @@
+# scheduler.py
+# Candle-close-aware scheduling for the polling loops
+# - ServerClock: local clock corrected by the exchange time (futures_time),
+#   offset = serverTime - midpoint of the request, re-synced periodically
+# - CloseScheduler: jobs are bound to a kline interval and run right after
+#   each close boundary of that interval (server time + SETTLE_MS), instead of
+#   sleeping a fixed 30-60s and recomputing bars that did not change
+# - Jobs receive the boundary (ms, = open time of the new bar); callers read
+#   only bars opened before it (klineparse.before), i.e. the bar that just
+#   closed is the newest one they evaluate
+# - catch_up=True: the first run is right away, on the bar that closed last
+#   (a restart does not wait up to a whole interval for the next close, and
+#   the close that fell into the downtime still gets evaluated)
+
+import time
+import threading
+
+import metrics
+from klinecache import INTERVAL_MS
+
+SETTLE_MS = 100              # jeda kecil setelah close supaya bar final sudah ada di REST
+CLOCK_RESYNC_SEC = 600       # sinkron ulang offset jam server tiap 10 menit
+MAX_CLOCK_RTT_MS = 2_000     # sample dengan round-trip lebih lama dibuang
+
+
+class ServerClock:
+    """time.time() shifted onto the exchange clock."""
+
+    def __init__(self, client, resync_sec=CLOCK_RESYNC_SEC):
+        self.client = client
+        self.resync_sec = resync_sec
+        self.offset = 0.0        # detik, server - lokal
+        self.rtt = None
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self):
+        t0 = time.time()
+        server = self.client.futures_time()["serverTime"] / 1000.0
+        t1 = time.time()
+        if (t1 - t0) * 1000 <= MAX_CLOCK_RTT_MS:
+            self.offset = server - (t0 + t1) / 2
+            self.rtt = t1 - t0
+        self._next_sync = t1 + self.resync_sec
+        return self.offset
+
+    def time(self):
+        now = time.time()
+        if now >= self._next_sync:
+            with self._lock:
+                if now >= self._next_sync:
+                    try:
+                        self.sync()
+                    except Exception as e:   # tetap pakai offset lama
+                        print(f"[SCHED] sinkron jam server gagal: {e}")
+                        self._next_sync = now + 60
+        return time.time() + self.offset
+
+    def ms(self):
+        return int(self.time() * 1000)
+
+
+def next_boundary(interval, now_ms):
+    """Open time of the next bar of `interval` (= close boundary of the current one)."""
+    step = INTERVAL_MS[interval]
+    return now_ms - now_ms % step + step
+
+
+class CloseScheduler:
+    """Run jobs right after the close boundaries of their interval."""
+
+    def __init__(self, clock, settle_ms=SETTLE_MS):
+        self.clock = clock
+        self.settle_ms = settle_ms
+        self.jobs = []           # [{"interval", "fn", "name", "next"}]
+        self.stats = {}          # {name: {"runs", "lag_ms_max", "lag_ms_sum", "busy_sec"}}
+        self._stop = threading.Event()
+
+    def every_close(self, interval, fn, name=None, catch_up=False):
+        """fn(boundary_ms) after every close of `interval`; with catch_up also once now,
+        for the last close that already passed."""
+        name = name or f"{getattr(fn, '__name__', 'job')}@{interval}"
+        first = next_boundary(interval, self.clock.ms())
+        if catch_up:
+            first -= INTERVAL_MS[interval]
+        self.jobs.append({"interval": interval, "fn": fn, "name": name, "next": first,
+                          "catch_up": catch_up})
+        self.stats[name] = {"runs": 0, "lag_ms_max": 0, "lag_ms_sum": 0, "busy_sec": 0.0}
+        return self
+
+    def run_pending(self):
+        """Run every job whose boundary has passed; returns the names that ran."""
+        now = self.clock.ms()
+        ran = []
+        for job in self.jobs:
+            if now < job["next"] + self.settle_ms:
+                continue
+            # boundary terakhir yang sudah lewat settle; yang terlewat tidak dikejar satu per satu
+            boundary = next_boundary(job["interval"], now - self.settle_ms) - INTERVAL_MS[job["interval"]]
+            job["next"] = boundary + INTERVAL_MS[job["interval"]]
+            st = self.stats[job["name"]]
+            if job["catch_up"]:
+                job["catch_up"] = False      # run susulan: jedanya bukan lag penjadwalan
+            else:
+                lag = now - boundary
+                st["runs"] += 1
+                st["lag_ms_sum"] += lag
+                st["lag_ms_max"] = max(st["lag_ms_max"], lag)
+                metrics.observe("schedule_lag_seconds", lag / 1000, job=job["name"])
+            t0 = time.time()
+            try:
+                with metrics.timer("job_seconds", job=job["name"]):
+                    job["fn"](boundary)
+            except Exception as e:
+                print(f"[SCHED] {job['name']} error: {e}")
+            st["busy_sec"] += time.time() - t0
+            ran.append(job["name"])
+        return ran
+
+    def sleep_until_next(self):
+        """Sleep until the earliest pending boundary (+ settle). False if stopped."""
+        if not self.jobs:
+            return not self._stop.wait(1.0)
+        target = min(job["next"] for job in self.jobs) + self.settle_ms
+        while not self._stop.is_set():
+            wait = (target - self.clock.ms()) / 1000.0
+            if wait <= 0:
+                return True
+            self._stop.wait(min(wait, 60.0))   # jam server bisa bergeser: cek ulang tiap menit
+        return False
+
+    def run_forever(self):
+        while self.sleep_until_next():
+            self.run_pending()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,497 @@
+# shard.py
+# Sharded sinyalbot scanning: one coordinator, N scan workers (local or other hosts)
+# - Coordinator owns the universe, active_signals/cooldowns and Telegram (it
+#   runs inside sinyalbot.py with SHARD_MODE=1); workers only read
+#   market data and report symbols whose entry conditions passed
+# - Symbols are spread with consistent hashing (HashRing): a worker joining
+#   or dying only moves the symbols of that worker, every other shard keeps
+#   its warm kline cache and indicator state
+# - Workers heartbeat; a worker that misses WORKER_TIMEOUT_SEC is dropped
+#   from the ring and its symbols are reassigned. Reports for symbols the
+#   sender no longer owns are discarded, so a hand-off never double-signals
+# - Transport: multiprocessing.managers.BaseManager (TCP + authkey). The
+#   protocol unpickles what clients send, so knowing the authkey = running
+#   code on the coordinator host: without SHARD_AUTHKEY the coordinator only
+#   binds to loopback with a random per-run key (local workers get it through
+#   their environment); a network bind needs SHARD_AUTHKEY of at least
+#   MIN_AUTHKEY_LEN characters
+# - Each worker has its own LimitedClient; local workers share the IP weight
+#   budget (weight_share = 1/N)
+# - Workers scan right after every 1m close (scheduler.CloseScheduler) unless
+#   --interval is given
+#
+# Worker on another host (key from the environment, not the command line):
+#   SHARD_AUTHKEY=<key> python shard.py worker --connect 10.0.0.5:50555
+# Offline demo (fake exchange, local process pool, one worker killed halfway):
+#   python shard.py demo --workers 4 --symbols 300
+
+import os
+import sys
+import time
+import bisect
+import socket
+import hashlib
+import secrets
+import argparse
+import ipaddress
+import threading
+import subprocess
+from multiprocessing.managers import BaseManager
+
+from sinyallogic import TF_LIST, PRUNE_STAGES, tf_snapshot, lazy_conditions
+
+SHARD_PORT = 50555
+MIN_AUTHKEY_LEN = 16         # authkey minimal untuk coordinator yang bisa dijangkau dari jaringan
+VNODES = 64                  # titik virtual per worker di ring (pembagian lebih rata)
+HEARTBEAT_SEC = 5
+WORKER_TIMEOUT_SEC = 20      # tanpa heartbeat selama ini -> worker dianggap mati
+UNIVERSE_REFRESH_SEC = 600
+
+
+def _hash(key):
+    # md5, bukan hash(): harus sama di semua proses / host
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+def parse_address(text, default_host="127.0.0.1"):
+    host, _, port = text.rpartition(":")
+    return (host or default_host, int(port or SHARD_PORT))
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False                 # hostname lain: anggap bisa dijangkau dari jaringan
+
+
+def new_authkey():
+    """Random per-run authkey (for loopback-only coordinators)."""
+    return secrets.token_hex(16).encode()
+
+
+class HashRing:
+    """Consistent hashing of symbols onto worker ids."""
+
+    def __init__(self, nodes=(), vnodes=VNODES):
+        self.vnodes = vnodes
+        self._keys = []      # posisi terurut
+        self._nodes = []     # worker id per posisi
+        for node in nodes:
+            self.add(node)
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def __len__(self):
+        return len(set(self._nodes))
+
+    def add(self, node):
+        if node in self._nodes:
+            return
+        for i in range(self.vnodes):
+            k = _hash(f"{node}#{i}")
+            j = bisect.bisect(self._keys, k)
+            self._keys.insert(j, k)
+            self._nodes.insert(j, node)
+
+    def remove(self, node):
+        keep = [(k, n) for k, n in zip(self._keys, self._nodes) if n != node]
+        self._keys = [k for k, _ in keep]
+        self._nodes = [n for _, n in keep]
+
+    def node_for(self, key):
+        if not self._keys:
+            return None
+        j = bisect.bisect(self._keys, _hash(key)) % len(self._keys)
+        return self._nodes[j]
+
+    def assign(self, keys):
+        out = {}
+        for key in keys:
+            out.setdefault(self.node_for(key), []).append(key)
+        return out
+
+
+class Coordinator:
+    """Shard bookkeeping; every public method is called by workers over the manager.
+
+    universe(): list of symbols to scan. cooldown(): symbols that must not be
+    scanned right now. on_signal(symbol, result): result is the
+    sinyal_conditions tuple of a symbol that passed. on_stages({stage: n}):
+    prune counters of one worker pass.
+    """
+
+    def __init__(self, universe, on_signal, cooldown=None, on_stages=None,
+                 timeout=WORKER_TIMEOUT_SEC, universe_refresh=UNIVERSE_REFRESH_SEC):
+        self.universe = universe
+        self.on_signal = on_signal
+        self.cooldown = cooldown or (lambda: [])
+        self.on_stages = on_stages
+        self.timeout = timeout
+        self.universe_refresh = universe_refresh
+        self.ring = HashRing()
+        self.symbols = []
+        self.generation = 0
+        self.workers = {}        # {worker_id: {"host", "seen", "scans", "symbols"}}
+        self.stats = {"joined": 0, "expired": 0, "reports": 0, "signals": 0, "stale": 0, "moved": 0}
+        self._assignment = {}
+        self._lock = threading.RLock()
+        self._next_universe = 0.0
+        self._stop = threading.Event()
+        self.authkey = None          # diisi serve()
+
+    # ---------- dipanggil worker ----------
+    def join(self, worker_id, host=""):
+        with self._lock:
+            self.workers[worker_id] = {"host": host, "seen": time.time(), "scans": 0, "symbols": 0}
+            self.stats["joined"] += 1
+            self._rebalance(add=worker_id)
+        print(f"[SHARD] worker {worker_id} ({host}) join, {len(self.workers)} worker aktif")
+        return {"tf_list": TF_LIST, "heartbeat_sec": HEARTBEAT_SEC}
+
+    def heartbeat(self, worker_id):
+        """Current assignment of a worker (re-joins it if it had been expired)."""
+        with self._lock:
+            w = self.workers.get(worker_id)
+            if w is None:
+                return None      # worker harus join ulang
+            w["seen"] = time.time()
+            symbols = self._assignment.get(worker_id, [])
+            w["symbols"] = len(symbols)
+            return {"generation": self.generation, "symbols": symbols, "cooldown": list(self.cooldown())}
+
+    def report(self, worker_id, stages, passed):
+        """Results of one worker pass: prune counters and [(symbol, result)] that passed."""
+        accepted = []
+        with self._lock:
+            w = self.workers.get(worker_id)
+            if w is not None:
+                w["seen"] = time.time()
+                w["scans"] += 1
+            self.stats["reports"] += 1
+            for symbol, result in passed:
+                if self.ring.node_for(symbol) != worker_id:
+                    self.stats["stale"] += 1    # simbol sudah dipindah ke worker lain
+                    continue
+                accepted.append((symbol, result))
+            self.stats["signals"] += len(accepted)
+        if self.on_stages and stages:
+            self.on_stages(stages)
+        for symbol, result in accepted:
+            try:
+                self.on_signal(symbol, result)
+            except Exception as e:
+                print(f"[SHARD] {symbol}: {e}")
+
+    def leave(self, worker_id):
+        with self._lock:
+            if self.workers.pop(worker_id, None) is not None:
+                self._rebalance(remove=worker_id)
+        print(f"[SHARD] worker {worker_id} keluar")
+
+    def status(self):
+        with self._lock:
+            return {"generation": self.generation, "symbols": len(self.symbols),
+                    "workers": {k: dict(v) for k, v in self.workers.items()}, "stats": dict(self.stats)}
+
+    # ---------- internal ----------
+    def _rebalance(self, add=None, remove=None, symbols=None):
+        old = self._assignment
+        if add is not None:
+            self.ring.add(add)
+        if remove is not None:
+            self.ring.remove(remove)
+        if symbols is not None:
+            self.symbols = list(symbols)
+        self._assignment = self.ring.assign(self.symbols) if len(self.ring) else {}
+        self._assignment.pop(None, None)
+        owner = {s: w for w, syms in old.items() for s in syms}
+        moved = sum(1 for w, syms in self._assignment.items() for s in syms if owner.get(s) not in (None, w))
+        self.stats["moved"] += moved
+        self.generation += 1
+        return moved
+
+    def tick(self):
+        """Expire silent workers and refresh the universe when due."""
+        now = time.time()
+        with self._lock:
+            dead = [w for w, info in self.workers.items() if now - info["seen"] > self.timeout]
+            for w in dead:
+                del self.workers[w]
+                self.stats["expired"] += 1
+                moved = self._rebalance(remove=w)
+                print(f"[SHARD] worker {w} tidak ada heartbeat, {moved} simbol dipindah")
+        if now >= self._next_universe:
+            try:
+                symbols = self.universe()
+            except Exception as e:
+                print(f"[SHARD] refresh universe gagal: {e}")
+                symbols = None
+            self._next_universe = now + self.universe_refresh
+            if symbols is not None:
+                with self._lock:
+                    if sorted(symbols) != sorted(self.symbols):
+                        self._rebalance(symbols=symbols)
+                        print(f"[SHARD] universe {len(self.symbols)} simbol, {len(self.workers)} worker")
+
+    def serve(self, address, authkey=None):
+        """Start the manager server and the expiry/universe thread (both daemon threads).
+
+        authkey None: a random per-run key (self.authkey), loopback addresses only.
+        Raises ValueError for a non-loopback address without a key of MIN_AUTHKEY_LEN.
+        """
+        if not is_loopback(address[0]):
+            if authkey is None or len(authkey) < MIN_AUTHKEY_LEN:
+                raise ValueError(f"coordinator di {address[0]} bisa dijangkau dari jaringan: set SHARD_AUTHKEY "
+                                 f"(acak, minimal {MIN_AUTHKEY_LEN} karakter) atau bind ke 127.0.0.1")
+        elif authkey is None:
+            authkey = new_authkey()
+        self.authkey = authkey
+        _CoordinatorManager.register("coordinator", callable=lambda: self)
+        manager = _CoordinatorManager(address=address, authkey=authkey)
+        server = manager.get_server()
+        self.tick()
+        threading.Thread(target=server.serve_forever, name="shard-server", daemon=True).start()
+        threading.Thread(target=self._ticker, name="shard-tick", daemon=True).start()
+        print(f"[SHARD] coordinator di {address[0]}:{address[1]}")
+        return self
+
+    def _ticker(self):
+        while not self._stop.wait(1.0):
+            self.tick()
+
+    def stop(self):
+        self._stop.set()
+
+
+class _CoordinatorManager(BaseManager):
+    pass
+
+
+class _WorkerManager(BaseManager):
+    pass
+
+
+_WorkerManager.register("coordinator")
+
+
+def connect(address, authkey, retries=30):
+    """Proxy to the coordinator (one per thread: proxies are not thread-safe)."""
+    for attempt in range(retries):
+        try:
+            manager = _WorkerManager(address=address, authkey=authkey)
+            manager.connect()
+            return manager.coordinator()
+        except (ConnectionError, OSError):
+            if attempt == retries - 1:
+                raise
+            time.sleep(1)
+
+
+# ===================== WORKER =====================
+class ShardWorker:
+    """Scans the symbols the coordinator assigns to it, reports what passed."""
+
+    def __init__(self, address, authkey, client, worker_id=None, scan_workers=8, interval=None):
+        from klinecache import KlineCache
+        self.address = address
+        self.client = client
+        self.authkey = authkey
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.cache = KlineCache(client, derive=True)
+        self.indicator_sets = {}
+        self.scan_workers = scan_workers
+        self.interval = interval     # None: scan tiap close 1m (waktu server)
+        self.state = None
+        self._state_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _heartbeat_loop(self):
+        coord = connect(self.address, self.authkey)
+        while not self._stop.is_set():
+            try:
+                state = coord.heartbeat(self.worker_id)
+                if state is None:
+                    coord.join(self.worker_id, socket.gethostname())
+                    state = coord.heartbeat(self.worker_id)
+                with self._state_lock:
+                    self.state = state
+            except (ConnectionError, EOFError, OSError) as e:
+                print(f"[SHARD] {self.worker_id}: coordinator tidak terjangkau ({e})")
+                time.sleep(HEARTBEAT_SEC)
+                try:
+                    coord = connect(self.address, self.authkey)
+                except (ConnectionError, OSError):
+                    pass
+                continue
+            self._stop.wait(HEARTBEAT_SEC)
+
+    def evaluate(self, symbol, until_ms=None):
+        try:
+            stage, result = lazy_conditions(
+                lambda tf: tf_snapshot(self.cache, self.indicator_sets, symbol, tf, until_ms=until_ms)
+            )
+        except Exception as e:
+            print(f"[ERROR] {symbol}: {e}")
+            return symbol, "error", None
+        if result is not None:
+            cond_up, cond_down, risk_pct, price, atr_4h = result
+            result = (bool(cond_up), bool(cond_down), float(risk_pct), float(price), float(atr_4h))
+        return symbol, stage, result
+
+    def scan_once(self, coord, until_ms=None):
+        from ratelimit import scan_concurrent
+        with self._state_lock:
+            state = self.state
+        if not state:
+            return 0
+        cooldown = set(state["cooldown"])
+        symbols = [s for s in state["symbols"] if s not in cooldown]
+        stages, passed = {}, []
+        evaluate = lambda symbol: self.evaluate(symbol, until_ms)
+        for symbol, stage, result in scan_concurrent(evaluate, symbols, self.scan_workers):
+            stages[stage] = stages.get(stage, 0) + 1
+            if result is not None:
+                passed.append((symbol, result))
+        coord.report(self.worker_id, stages, passed)
+        # state indikator simbol yang sudah pindah shard dibuang
+        mine = set(state["symbols"])
+        for key in [k for k in self.indicator_sets if k[0] not in mine]:
+            del self.indicator_sets[key]
+        return len(symbols)
+
+    def run(self):
+        coord = connect(self.address, self.authkey)
+        coord.join(self.worker_id, socket.gethostname())
+        self.state = coord.heartbeat(self.worker_id)
+        threading.Thread(target=self._heartbeat_loop, name="shard-heartbeat", daemon=True).start()
+        proxy = [coord]
+
+        def scan(until_ms=None):
+            t0 = time.time()
+            try:
+                n = self.scan_once(proxy[0], until_ms)
+                print(f"[SHARD] {self.worker_id}: {n} simbol dalam {time.time() - t0:.1f}s")
+            except (ConnectionError, EOFError, OSError) as e:
+                print(f"[SHARD] {self.worker_id}: report gagal ({e}), sambung ulang")
+                time.sleep(HEARTBEAT_SEC)
+                try:
+                    proxy[0] = connect(self.address, self.authkey)
+                except (ConnectionError, OSError):
+                    pass
+
+        if self.interval is None:
+            from scheduler import ServerClock, CloseScheduler
+            sched = CloseScheduler(ServerClock(self.client)).every_close("1m", scan, "shard-scan")
+            threading.Thread(target=lambda: (self._stop.wait(), sched.stop()), daemon=True).start()
+            sched.run_forever()
+            return
+        while not self._stop.is_set():
+            t0 = time.time()
+            scan()
+            self._stop.wait(max(0.0, self.interval - (time.time() - t0)))
+
+
+def make_client(fake=0, weight_share=1.0, latency=0.05):
+    from ratelimit import LimitedClient, WeightLimiter, WEIGHT_LIMIT_1M
+    limiter = WeightLimiter(WEIGHT_LIMIT_1M * weight_share)
+    if fake:
+        from fakeclient import FakeClient
+        return LimitedClient(FakeClient(n_symbols=fake, latency=latency, jitter=latency / 2,
+                                        weight_limit=10 ** 9), limiter)
+    from binance.client import Client
+    return LimitedClient(Client(), limiter)   # data publik, tanpa API key
+
+
+class LocalWorkers:
+    """Worker subprocesses on this machine (restarted if one exits)."""
+
+    def __init__(self, address, authkey, n, fake=0, interval=None):
+        self.cmd = [sys.executable, os.path.abspath(__file__), "worker",
+                    "--connect", f"{address[0]}:{address[1]}", "--weight-share", str(1.0 / max(1, n))]
+        self.env = dict(os.environ, SHARD_AUTHKEY=authkey.decode())   # tidak terlihat di daftar proses
+        if interval is not None:
+            self.cmd += ["--interval", str(interval)]
+        if fake:
+            self.cmd += ["--fake", str(fake)]
+        self.procs = [self._spawn(i) for i in range(n)]
+
+    def _spawn(self, i):
+        return subprocess.Popen(self.cmd + ["--id", f"local-{i}"], env=self.env)
+
+    def check(self):
+        for i, p in enumerate(self.procs):
+            if p is not None and p.poll() is not None:
+                print(f"[SHARD] local-{i} berhenti (exit {p.returncode}), dijalankan ulang")
+                self.procs[i] = self._spawn(i)
+
+    def stop(self):
+        for p in self.procs:
+            if p is not None and p.poll() is None:
+                p.terminate()
+        for p in self.procs:
+            if p is not None:
+                p.wait(10)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sharded sinyalbot scan workers")
+    ap.add_argument("command", choices=("worker", "demo"))
+    ap.add_argument("--connect", default=f"127.0.0.1:{SHARD_PORT}")
+    ap.add_argument("--authkey", default=os.getenv("SHARD_AUTHKEY"),
+                    help="default: SHARD_AUTHKEY (worker: required; demo: random per run)")
+    ap.add_argument("--id")
+    ap.add_argument("--fake", type=int, default=0, help="use a FakeClient with N synthetic symbols")
+    ap.add_argument("--weight-share", type=float, default=1.0)
+    ap.add_argument("--scan-workers", type=int, default=8)
+    ap.add_argument("--interval", type=float, help="seconds between passes (default: right after every 1m close)")
+    ap.add_argument("--workers", type=int, default=4, help="demo: local worker processes")
+    ap.add_argument("--symbols", type=int, default=300, help="demo: synthetic universe size")
+    ap.add_argument("--seconds", type=float, default=60, help="demo: run time")
+    args = ap.parse_args()
+    address = parse_address(args.connect)
+
+    if args.command == "worker":
+        if not args.authkey:
+            ap.error("worker needs SHARD_AUTHKEY (or --authkey)")
+        client = make_client(args.fake, args.weight_share)
+        ShardWorker(address, args.authkey.encode(), client, args.id, args.scan_workers, args.interval).run()
+        return
+
+    # demo: coordinator + worker lokal di atas fake exchange; satu worker dimatikan di tengah jalan
+    from fakeclient import synthetic_symbols
+    prune = dict.fromkeys(PRUNE_STAGES, 0)
+
+    def on_stages(stages):
+        for stage, n in stages.items():
+            prune[stage] = prune.get(stage, 0) + n
+
+    coord = Coordinator(universe=lambda: synthetic_symbols(args.symbols),
+                        on_signal=lambda sym, res: print(f"[SIGNAL] {sym} {res}"),
+                        on_stages=on_stages, timeout=3 * HEARTBEAT_SEC)
+    coord.serve(address, args.authkey.encode() if args.authkey else None)
+    local = LocalWorkers(address, coord.authkey, args.workers, fake=args.symbols, interval=10)
+    killed = False
+    t0 = time.time()
+    try:
+        while time.time() - t0 < args.seconds:
+            time.sleep(1)
+            if not killed and time.time() - t0 > args.seconds / 3 and local.procs:
+                print("[SHARD] demo: local-0 dimatikan")
+                local.procs[0].kill()
+                local.procs[0].wait()
+                local.procs[0] = None
+                killed = True
+        st = coord.status()
+        for w, info in sorted(st["workers"].items()):
+            print(f"  {w:10s} {info['symbols']:4d} simbol, {info['scans']} pass")
+        print("stats:", st["stats"], "| prune:", {k: v for k, v in prune.items() if v})
+    finally:
+        local.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# signalstore.py
+# Open signals of sinyalbot, indexed by (symbol, side)
+# - Signal: one compact record (__slots__) per open position; the
+#   trailing_active / notified_tp1..3 flags are packed into one int
+# - A Signal still reads and writes like the old dict (signal['sl'],
+#   signal.get('notified_tp1')), so TriggerIndex, apply_levels and the
+#   Telegram messages work on it unchanged
+# - SignalStore: lookup, add and close are single dict operations, O(1) no
+#   matter how many signals the full universe keeps open
+# - to_dict/from_dict keep the journal records identical to the old dicts
+
+SIDES = ("LONG", "SHORT")
+FIELDS = ("symbol", "side", "entry", "tp1", "tp2", "tp3", "sl", "opened")
+FLAGS = ("trailing_active", "notified_tp1", "notified_tp2", "notified_tp3")
+_BIT = {name: 1 << i for i, name in enumerate(FLAGS)}
+
+
+class Signal:
+    """One open signal: symbol/side, entry and TP/SL prices, open time (ms) and flags."""
+
+    __slots__ = FIELDS + ("flags",)
+
+    def __init__(self, symbol, side, entry, tp1, tp2, tp3, sl, opened=0, flags=0):
+        self.symbol = symbol
+        self.side = side
+        self.entry = entry
+        self.tp1 = tp1
+        self.tp2 = tp2
+        self.tp3 = tp3
+        self.sl = sl
+        self.opened = opened
+        self.flags = flags
+
+    @classmethod
+    def from_dict(cls, d):
+        flags = 0
+        for name in FLAGS:
+            if d.get(name):
+                flags |= _BIT[name]
+        return cls(d["symbol"], d["side"], d["entry"], d["tp1"], d["tp2"], d["tp3"], d["sl"],
+                   d.get("opened", 0), flags)
+
+    def to_dict(self):
+        d = {name: getattr(self, name) for name in FIELDS}
+        d.update((name, bool(self.flags & bit)) for name, bit in _BIT.items())
+        return d
+
+    @property
+    def key(self):
+        return self.symbol, self.side
+
+    def __getitem__(self, name):
+        bit = _BIT.get(name)
+        if bit is not None:
+            return bool(self.flags & bit)
+        if name not in FIELDS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __setitem__(self, name, value):
+        bit = _BIT.get(name)
+        if bit is not None:
+            self.flags = self.flags | bit if value else self.flags & ~bit
+        elif name in FIELDS:
+            setattr(self, name, value)
+        else:
+            raise KeyError(name)
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"Signal({self.to_dict()!r})"
+
+
+class SignalStore:
+    """Open signals keyed by (symbol, side): at most one LONG and one SHORT per symbol.
+
+    Not locked on its own: the bots already serialize signal updates behind
+    their state lock.
+    """
+
+    def __init__(self):
+        self._open = {}     # {(symbol, side): Signal}
+
+    def __len__(self):
+        return len(self._open)
+
+    def __iter__(self):
+        return iter(list(self._open.values()))
+
+    def get(self, symbol, side):
+        return self._open.get((symbol, side))
+
+    def add(self, signal):
+        self._open[signal.key] = signal
+
+    def close(self, signal):
+        """Drop a signal; no-op if it was already closed or replaced."""
+        if self._open.get(signal.key) is signal:
+            del self._open[signal.key]
+
+    def has_symbol(self, symbol):
+        return any((symbol, side) in self._open for side in SIDES)
+
+    def clear(self):
+        self._open.clear()
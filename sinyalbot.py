@@ -1,14 +1,28 @@
 import time
 import math
-import requests
+import queue
 import os
-import pandas as pd
-from datetime import datetime
+import threading
 from dotenv import load_dotenv
 from binance.client import Client
-from ta.trend import ADXIndicator, SMAIndicator
-from ta.momentum import RSIIndicator
-from ta.volatility import BollingerBands, AverageTrueRange
+import metrics
+from klinecache import shared_cache, MAX_KLINES_PER_CALL
+from klinestore import KlineStore
+from ratelimit import LimitedClient, scan_concurrent
+from triggers import TriggerIndex, price_snapshot
+from notifier import TelegramNotifier
+from wsstream import MarketStream
+from scheduler import ServerClock, CloseScheduler
+from shard import Coordinator, LocalWorkers, parse_address
+from universe import usdt_perpetuals, ticker_snapshot, filter_by_quote_volume
+from sinyallogic import (TF_LIST, PRUNE_STAGES, SINYAL_FEATURES, in_cooldown, tf_snapshot, feature_snapshot,
+                         lazy_conditions, plan_signal, apply_levels)
+from klineparse import before
+from journal import Journal
+from eventlog import EventLog
+from signalstore import Signal, SignalStore
+from tiers import TierScheduler
+from panel import build_panels, sinyal_columns, sinyal_conditions, last_bar
 
 # === CONFIGURATION === #
 load_dotenv()
@@ -16,269 +30,536 @@ API_KEY = os.getenv("API_KEY")
 API_SECRET = os.getenv("API_SECRET")
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-MODAL_TOTAL = 20  # modal awal total $20
-LEVERAGE = 20
-active_signals = []  # Menyimpan sinyal yang masih aktif untuk dipantau TP/SL
+PANEL_SCAN = os.getenv("PANEL_SCAN", "0") == "1"  # 1: scan semua simbol terfilter sekaligus (vectorized)
+STREAM_MODE = os.getenv("STREAM_MODE", "0") == "1"  # 1: pakai WebSocket kline/markPrice, bukan polling 60s
+STREAM_EVAL_MIN_SEC = 5       # evaluasi ulang bar 1m yang masih open paling cepat tiap 5 detik
+UNIVERSE_REFRESH_SEC = 600    # stream mode: refresh daftar simbol tiap 10 menit
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "8"))  # jumlah thread scan simbol paralel
+KLINE_STORE_DIR = os.getenv("KLINE_STORE_DIR", "")  # mis. "klines": simpan candle di disk, restart tanpa download ulang
+DERIVE_TF = os.getenv("DERIVE_TF", "1") == "1"  # 1: TF 5m..4h dibangun dari 1m (1 request/simbol per scan, bukan 5)
+CLOSE_SCHEDULER = os.getenv("CLOSE_SCHEDULER", "1") == "1"  # 1: scan tepat setelah close 1m (jam server), bukan sleep 60s
+SHARD_MODE = os.getenv("SHARD_MODE", "0") == "1"  # 1: proses ini jadi coordinator, scan seluruh universe dibagi ke worker
+SHARD_ADDRESS = os.getenv("SHARD_ADDRESS", "127.0.0.1:50555")  # 0.0.0.0:50555 supaya worker di host lain bisa masuk
+SHARD_AUTHKEY = os.getenv("SHARD_AUTHKEY", "")  # wajib (acak, >=16 karakter) kalau SHARD_ADDRESS bukan loopback; "" = key acak per run
+SHARD_LOCAL_WORKERS = int(os.getenv("SHARD_LOCAL_WORKERS", str(os.cpu_count() or 1)))  # worker di mesin ini
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # mis. 9108: endpoint Prometheus di 127.0.0.1 (0 = mati, tanpa overhead)
+METRICS_PROFILE = os.getenv("METRICS_PROFILE", "0") == "1"  # 1: sampling profiler jalan terus (lihat /profile)
+STATE_DIR = os.getenv("STATE_DIR", "state")  # journal active_signals & cooldowns, restart tidak lupa posisi ("" = mati)
+EVENT_DIR = os.getenv("EVENT_DIR", "events")  # log event sinyal/TP/SL terstruktur + index (python eventlog.py winrate), "" = mati
+TIER_SCAN = os.getenv("TIER_SCAN", "1") == "1"  # 1: seluruh universe discan bergilir per tier (hot/warm/cold), 0: 5 simbol teratas
+SCAN_BUDGET = int(os.getenv("SCAN_BUDGET", "40"))  # simbol per siklus scan (mode tier)
+TIER_HOT = int(os.getenv("TIER_HOT", "8"))          # discan tiap siklus
+TIER_WARM = int(os.getenv("TIER_WARM", "32"))       # discan tiap TIER_WARM_EVERY siklus
+TIER_WARM_EVERY = int(os.getenv("TIER_WARM_EVERY", "5"))
+TIER_MAX_STALE = int(os.getenv("TIER_MAX_STALE", "15"))  # batas basi: tiap simbol discan paling lambat tiap N siklus
+MONITOR_1M_BARS = 60          # minimal bar 1m yang disimpan per simbol bersinyal (bobot request tetap 1)
+active_signals = SignalStore()  # sinyal aktif per (symbol, side) untuk dipantau TP/SL, cari/tutup O(1)
 cooldowns = {}
-
-client = Client(API_KEY, API_SECRET)
+last_prices = {}     # harga mark terakhir dari stream (stream mode)
+indicator_sets = {}  # {(symbol, tf): SinyalIndicators} - state indikator streaming
+triggers = TriggerIndex()  # level TP/SL semua sinyal aktif, terurut per simbol
+last_checked = {}    # {symbol: ms} cek harga terakhir (high/low 1m sesudahnya ikut dicek)
+prune_stats = dict.fromkeys(PRUNE_STAGES, 0)  # check_signal: di tahap mana simbol gugur
+PRUNE_REPORT_SEC = 600        # cetak ringkasan prune_stats tiap 10 menit
+next_prune_report = time.time() + PRUNE_REPORT_SEC
+tiers = TierScheduler(SCAN_BUDGET, TIER_HOT, TIER_WARM, TIER_WARM_EVERY, TIER_MAX_STALE) if TIER_SCAN else None
+last_1m = {}         # {symbol: snapshot 1m terakhir} - bahan ranking tier, tanpa request tambahan
+state_lock = threading.RLock()  # active_signals & cooldowns diubah dari beberapa thread scan
+
+# dibuat oleh init(), bukan saat import: import saja tidak membuat thread, koneksi atau direktori
+client = None        # LimitedClient: semua request lewat limiter bobot Binance
+kline_cache = None   # ring buffer per (symbol, tf), refresh incremental
+notifier = None      # TelegramNotifier
+state = None         # Journal: tulis di thread sendiri, scan tidak menunggu disk
+events = None        # EventLog: JSONL per batch di thread sendiri, rotasi per hari/ukuran
+
+def init(binance=None):
+    # dipanggil main() / SinyalStrategy.start() / engine.py; binance: LimitedClient yang sudah ada (opsional).
+    # Aman dipanggil berkali-kali: yang sudah dibuat tidak dibuat ulang
+    global client, kline_cache, notifier, state, events
+    if client is not None:
+        return
+    client = binance or LimitedClient(Client(API_KEY, API_SECRET, ping=False))  # tanpa ping spot saat start
+    kline_cache = shared_cache(client, KlineStore(KLINE_STORE_DIR) if KLINE_STORE_DIR else None, DERIVE_TF)
+    notifier = TelegramNotifier(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, spool_path="telegram_pending_sinyal.jsonl")
+    state = Journal(STATE_DIR, "sinyalbot") if STATE_DIR else None
+    events = EventLog(EVENT_DIR, "sinyalbot") if EVENT_DIR else None
 
 # === UTILS === #
 def send_telegram(msg):
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    data = {"chat_id": TELEGRAM_CHAT_ID, "text": msg, "parse_mode": "HTML"}
-    requests.post(url, data=data)
-
-def log_event(text):
-    with open("log_sinyal.txt", "a") as f:
-        f.write(f"{datetime.now()} | {text}\n")
+    # hanya masuk antrian; pengiriman (rate limit, retry, gabung pesan) di thread notifier
+    notifier.send(msg)
+
+def log_event(ev, signal, **fields):
+    # hanya masuk antrian; ditulis per batch oleh thread event log (lihat eventlog.py)
+    if events is not None:
+        events.record(ev, signal['symbol'], side=signal['side'], id=signal_key(signal), **fields)
+
+def signal_key(signal):
+    return f"{signal['symbol']}:{signal['opened']}"
+
+def persist_signal(signal):
+    if state is not None:
+        state.set("signals", signal_key(signal), signal.to_dict())
+
+def restore_state():
+    # sinyal aktif (TP/SL + trailing) & cooldown dari sesi sebelumnya
+    if state is None:
+        return
+    now = time.time()
+    for record in state.recovered.get("signals", {}).values():
+        signal = Signal.from_dict(record)
+        active_signals.add(signal)
+        triggers.index_signal(signal)
+        last_checked.setdefault(signal['symbol'], int(now * 1000))
+    for symbol, ts in state.recovered.get("cooldowns", {}).items():
+        if in_cooldown({symbol: ts}, symbol, now):
+            cooldowns[symbol] = ts
+    print(f"[STATE] {len(active_signals)} sinyal aktif, {len(cooldowns)} cooldown dipulihkan "
+          f"dari {STATE_DIR}/ ({state.stats['recovery_ms']} ms)")
 
 def get_all_usdt_futures_symbols():
-    info = client.futures_exchange_info()
-    return [s['symbol'] for s in info['symbols'] if s['quoteAsset'] == 'USDT' and s['contractType'] == 'PERPETUAL']
+    # exchange info di-cache (TTL), tidak di-download ulang tiap menit
+    return usdt_perpetuals(client)
 
-def filter_symbols(symbols):
-    filtered = []
-    for symbol in symbols:
-        try:
-            ticker = client.futures_ticker(symbol=symbol)
-            if float(ticker['quoteVolume']) > 5_000_000:
-                filtered.append(symbol)
-        except:
-            continue
-    return filtered
-
-def fetch_multi_tf(symbol):
-    tf_list = ['1m', '5m', '15m', '1h', '4h']
-    data = {}
-    for tf in tf_list:
-        klines = client.futures_klines(symbol=symbol, interval=tf, limit=200)
-        df = pd.DataFrame(klines, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume',
-            '_', '_', '_', '_', '_', '_'
-        ])
-        df['close'] = df['close'].astype(float)
-        df['high'] = df['high'].astype(float)
-        df['low'] = df['low'].astype(float)
-        df['volume'] = df['volume'].astype(float)
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-
-        df['ma_fast'] = SMAIndicator(df['close'], 5).sma_indicator()
-        df['ma_slow'] = SMAIndicator(df['close'], 20).sma_indicator()
-        df['rsi'] = RSIIndicator(df['close']).rsi()
-        df['adx'] = ADXIndicator(df['high'], df['low'], df['close']).adx()
-        df['atr'] = AverageTrueRange(df['high'], df['low'], df['close']).average_true_range()
-        df['bb_upper'] = BollingerBands(df['close']).bollinger_hband()
-        df['bb_lower'] = BollingerBands(df['close']).bollinger_lband()
-        df['volume_spike'] = df['volume'] > df['volume'].rolling(20).mean() * 1.5
-        df['trend_up'] = df['ma_fast'] > df['ma_slow']
-        df['breakout_up'] = df['close'] > df['bb_upper']
-        df['breakout_down'] = df['close'] < df['bb_lower']
-        df['strong_adx'] = df['adx'] > 25
-        df['volatility_ok'] = df['atr'] > df['atr'].rolling(20).mean()
-
-        data[tf] = df
-    return data
-
-def check_signal(symbol):
-    try:
-        now = time.time()
-        cooldown_period = 300
+def filter_symbols(symbols, tickers=None):
+    # satu snapshot ticker 24h untuk semua simbol (bobot request konstan)
+    return filter_by_quote_volume(symbols, ticker_snapshot(client) if tickers is None else tickers, 5_000_000)
 
-        # Cek cooldown
-        if symbol in cooldowns and now - cooldowns[symbol] < cooldown_period:
-            return
+def pick_symbols():
+    # universe terfilter -> simbol siklus ini (tier: sesuai prioritas & jatah staleness)
+    tickers = ticker_snapshot(client)
+    symbols = filter_symbols(get_all_usdt_futures_symbols(), tickers)
+    if tiers is None:
+        return symbols[:5]
+    return tiers.update(symbols, tickers, last_1m).pick()
 
-        data = fetch_multi_tf(symbol)
-        d1, d5, d15, d1h, d4h = data['1m'], data['5m'], data['15m'], data['1h'], data['4h']
+def fetch_tf(symbol, tf, until_ms=None):
+    return tf_snapshot(kline_cache, indicator_sets, symbol, tf, until_ms=until_ms)
 
-        trend_1h = d1h.iloc[-1]['trend_up']
-        trend_4h = d4h.iloc[-1]['trend_up']
-        adx_1h = d1h.iloc[-1]['adx']
-        adx_4h = d4h.iloc[-1]['adx']
+def check_signal(symbol, until_ms=None):
+    try:
+        evaluate_signal(symbol, lambda tf: fetch_tf(symbol, tf, until_ms))
+    except Exception as e:
+        print(f"[ERROR] {symbol}: {e}")
 
-        # Adaptive risk
-        if trend_1h and trend_4h and adx_1h > 30 and adx_4h > 30:
-            risk_pct = 0.05
-        elif trend_1h or trend_4h:
-            risk_pct = 0.03
-        else:
-            risk_pct = 0.01
-
-        cond_up = (
-            d1.iloc[-1]['trend_up'] and
-            d5.iloc[-1]['trend_up'] and
-            d15.iloc[-1]['trend_up'] and
-            trend_1h and
-            d1.iloc[-1]['breakout_up'] and
-            d1.iloc[-1]['volume_spike'] and
-            d1.iloc[-1]['strong_adx'] and
-            d1.iloc[-1]['volatility_ok']
-        )
 
-        cond_down = (
-            not d1.iloc[-1]['trend_up'] and
-            not d5.iloc[-1]['trend_up'] and
-            not d15.iloc[-1]['trend_up'] and
-            not trend_1h and
-            d1.iloc[-1]['breakout_down'] and
-            d1.iloc[-1]['volume_spike'] and
-            d1.iloc[-1]['strong_adx'] and
-            d1.iloc[-1]['volatility_ok']
-        )
+def evaluate_signal(symbol, snapshot):
+    # snapshot(tf) -> dict indikator candle terakhir (dari kline_cache sendiri atau dari engine.py)
+    now = time.time()
 
-        price = d1.iloc[-1]['close']
-        atr_4h = d4h.iloc[-1]['atr']
-        risk_dollar = MODAL_TOTAL * risk_pct
-        sl_main = price - atr_4h if cond_up else price + atr_4h
-        price_sl_diff = abs(price - sl_main)
-        if price_sl_diff == 0:
-            return
+    # Cek cooldown
+    if in_cooldown(cooldowns, symbol, now):
+        return
+
+    def ranked_snapshot(tf):
+        snap = snapshot(tf)
+        if tf == '1m':
+            last_1m[symbol] = snap
+        return snap
 
-        size = round((risk_dollar / price_sl_diff) * LEVERAGE, 2)
-        if size == 0:
+    # TF di-fetch & dihitung saat dibutuhkan; berhenti di syarat pertama yang gagal
+    with metrics.timer("check_seconds", bot="sinyalbot"):
+        stage, result = lazy_conditions(ranked_snapshot)
+    metrics.inc("check_stage_total", bot="sinyalbot", stage=stage)
+    with state_lock:
+        prune_stats[stage] += 1
+        if result is None:
             return
+        cond_up, cond_down, risk_pct, price, atr_4h = result
+        apply_signal(symbol, bool(cond_up), bool(cond_down), float(risk_pct), price, atr_4h, now)
 
-        # --- CEK JIKA SUDAH ADA POSISI SEARAH ---
-        existing_signal = next((sig for sig in active_signals if sig["symbol"] == symbol), None)
-        if existing_signal:
-            if cond_up and existing_signal["side"] == "LONG":
-                # Update TP/SL naikkan
-                existing_signal["tp1"] = price + atr_4h * 1.8
-                existing_signal["tp2"] = price + atr_4h * 3
-                existing_signal["tp3"] = price + atr_4h * 4.5
-                existing_signal["sl"] = max(existing_signal["sl"], price - atr_4h * 0.8)
-
-                msg = (
-                    f"🟢 <b>HOLD LONG</b> - <b>{symbol}</b>\n"
-                    f"📈 Posisi tetap, TP/SL diperbarui:\n"
-                    f"🎯 TP1: {existing_signal['tp1']:.3f} | TP2: {existing_signal['tp2']:.3f} | TP3: {existing_signal['tp3']:.3f}\n"
-                    f"🛡 SL: {existing_signal['sl']:.3f}"
-                )
-                send_telegram(msg)
-                return
 
-            elif cond_down and existing_signal["side"] == "SHORT":
-                # Update TP/SL turunkan
-                existing_signal["tp1"] = price - atr_4h * 1.8
-                existing_signal["tp2"] = price - atr_4h * 3
-                existing_signal["tp3"] = price - atr_4h * 4.5
-                existing_signal["sl"] = min(existing_signal["sl"], price + atr_4h * 0.8)
-
-                msg = (
-                    f"🔴 <b>HOLD SHORT</b> - <b>{symbol}</b>\n"
-                    f"📉 Posisi tetap, TP/SL diperbarui:\n"
-                    f"🎯 TP1: {existing_signal['tp1']:.3f} | TP2: {existing_signal['tp2']:.3f} | TP3: {existing_signal['tp3']:.3f}\n"
-                    f"🛡 SL: {existing_signal['sl']:.3f}"
-                )
-                send_telegram(msg)
-                return
+class SinyalStrategy:
+    # Plug-in engine.py: data & indikator dari pipeline bersama, logika sama dengan check_signal
+    name = "sinyal"
+    scan_tf = '1m'
+    timeframes = {tf: 200 for tf in TF_LIST}
+    features = {tf: SINYAL_FEATURES for tf in TF_LIST}
 
-        # --- SINYAL BARU ---
-        if cond_up or cond_down:
-            cooldowns[symbol] = now
-            tp1 = price + atr_4h * 1.5 if cond_up else price - atr_4h * 1.5
-            tp2 = price + atr_4h * 2.5 if cond_up else price - atr_4h * 2.5
-            tp3 = price + atr_4h * 4 if cond_up else price - atr_4h * 4
-            sl = sl_main
-            direction = "LONG" if cond_up else "SHORT"
-            emoji = "🚀" if cond_up else "🔻"
-            strength_emoji = "🔥🔥🔥" if cond_up else "❄️❄️❄️"
+    def __init__(self):
+        self.picked = []
 
+    def start(self):
+        init()
+        restore_state()
+
+    def universe(self):
+        client.futures_ping()
+        self.picked = pick_symbols()
+        return self.picked
+
+    def evaluate(self, symbol, view):
+        evaluate_signal(symbol, lambda tf: feature_snapshot(view.features(tf)))
+
+    def after_scan(self):
+        global next_prune_report
+        if tiers is not None:
+            tiers.mark(self.picked, time.time())
+        monitor_active_signals()
+        if time.time() >= next_prune_report:
+            report_prune_stats()
+            report_tiers()
+            next_prune_report = time.time() + PRUNE_REPORT_SEC
+
+
+def apply_signal(symbol, cond_up, cond_down, risk_pct, price, atr_4h, now):
+    # Update posisi searah (HOLD) atau kirim sinyal baru
+    plan = plan_signal(active_signals, symbol, cond_up, cond_down, risk_pct, price, atr_4h)
+    if plan is None:
+        return
+    action, signal, size = plan
+
+    # --- SUDAH ADA POSISI SEARAH: TP/SL sudah diperbarui ---
+    if action == "hold":
+        triggers.index_signal(signal)
+        persist_signal(signal)
+        log_event("update", signal, price=price, sl=signal['sl'], tp1=signal['tp1'], tp2=signal['tp2'],
+                  tp3=signal['tp3'])
+        if signal["side"] == "LONG":
             msg = (
-                f"\n{emoji} <b><u>{direction} SIGNAL</u></b> - <b>{symbol}</b>\n"
-                f"Price: <b>{price:.3f}</b>\nSL: <b>{sl:.3f}</b>\nSize: <b>{size}</b>\n"
-                f"🎯 TP1: {tp1:.3f} | TP2: {tp2:.3f} | TP3: {tp3:.3f}\n"
-                f"📊 Sinyal: <b>KUAT</b> {strength_emoji}\n"
-                f"🔁 Trailing aktif setelah TP1"
+                f"🟢 <b>HOLD LONG</b> - <b>{symbol}</b>\n"
+                f"📈 Posisi tetap, TP/SL diperbarui:\n"
+                f"🎯 TP1: {signal['tp1']:.3f} | TP2: {signal['tp2']:.3f} | TP3: {signal['tp3']:.3f}\n"
+                f"🛡 SL: {signal['sl']:.3f}"
             )
-            send_telegram(msg)
-            log_event(f"{symbol} | {direction} | {price:.3f} | SL: {sl:.3f} | Size: {size}")
-            active_signals.append({
-                "symbol": symbol,
-                "side": direction,
-                "entry": price,
-                "tp1": tp1,
-                "tp2": tp2,
-                "tp3": tp3,
-                "sl": sl,
-                "trailing_active": False,
-                "notified_tp1": False,
-                "notified_tp2": False,
-                "notified_tp3": False
-            })
+        else:
+            msg = (
+                f"🔴 <b>HOLD SHORT</b> - <b>{symbol}</b>\n"
+                f"📉 Posisi tetap, TP/SL diperbarui:\n"
+                f"🎯 TP1: {signal['tp1']:.3f} | TP2: {signal['tp2']:.3f} | TP3: {signal['tp3']:.3f}\n"
+                f"🛡 SL: {signal['sl']:.3f}"
+            )
+        send_telegram(msg)
+        return
+
+    # --- SINYAL BARU ---
+    cooldowns[symbol] = now
+    if state is not None:
+        state.set("cooldowns", symbol, now)
+    signal["opened"] = int(now * 1000)
+    direction = signal["side"]
+    metrics.inc("signals_total", bot="sinyalbot", symbol=symbol, side=direction)
+    emoji = "🚀" if cond_up else "🔻"
+    strength_emoji = "🔥🔥🔥" if cond_up else "❄️❄️❄️"
+
+    msg = (
+        f"\n{emoji} <b><u>{direction} SIGNAL</u></b> - <b>{symbol}</b>\n"
+        f"Price: <b>{price:.3f}</b>\nSL: <b>{signal['sl']:.3f}</b>\nSize: <b>{size}</b>\n"
+        f"🎯 TP1: {signal['tp1']:.3f} | TP2: {signal['tp2']:.3f} | TP3: {signal['tp3']:.3f}\n"
+        f"📊 Sinyal: <b>KUAT</b> {strength_emoji}\n"
+        f"🔁 Trailing aktif setelah TP1"
+    )
+    send_telegram(msg)
+    log_event("signal", signal, price=price, entry=signal['entry'], sl=signal['sl'], tp1=signal['tp1'],
+              tp2=signal['tp2'], tp3=signal['tp3'], size=size, risk_pct=risk_pct)
+    active_signals.add(signal)
+    triggers.index_signal(signal)
+    persist_signal(signal)
+    last_checked.setdefault(symbol, int(now * 1000))
+
+
+def scan_panel(symbols, until_ms=None):
+    # Scan semua simbol sekaligus: indikator & kondisi dihitung sebagai array [simbol x bar]
+    now = time.time()
+    symbols = [s for s in symbols if not in_cooldown(cooldowns, s, now)]
+    rows_by_tf = {tf: {} for tf in TF_LIST}
+    limit = 200 if until_ms is None else 201   # +1: bar yang baru buka dibuang
+
+    def fetch(sym):
+        try:
+            return {tf: before(kline_cache.get_bars(sym, tf, limit), until_ms) for tf in TF_LIST}
+        except Exception as e:
+            print(f"[ERROR] {sym}: {e}")
+
+    for sym, rows in zip(symbols, scan_concurrent(fetch, symbols, SCAN_WORKERS)):
+        if rows is not None:
+            for tf in TF_LIST:
+                rows_by_tf[tf][sym] = rows[tf]
+
+    panels = build_panels(rows_by_tf, 200)
+    if not len(panels['1m']):
+        return
+    with metrics.timer("conditions_seconds", strategy="sinyal_panel"):
+        last = {tf: last_bar(sinyal_columns(p.h, p.l, p.c, p.v)) for tf, p in panels.items()}
+        cond_up, cond_down, risk_pct, price, atr_4h = sinyal_conditions(*(last[tf] for tf in TF_LIST))
+
+    for i in (cond_up | cond_down).nonzero()[0]:
+        sym = panels['1m'].symbols[i]
+        try:
+            with state_lock:
+                apply_signal(sym, bool(cond_up[i]), bool(cond_down[i]), float(risk_pct[i]),
+                             float(price[i]), float(atr_4h[i]), now)
+        except Exception as e:
+            print(f"[ERROR] {sym}: {e}")
 
-    except Exception as e:
-        print(f"[ERROR] {symbol}: {e}")
+
+def report_prune_stats():
+    with state_lock:
+        total = sum(prune_stats.values())
+        if not total:
+            return
+        parts = [f"{stage} {n} ({n * 100 / total:.0f}%)" for stage, n in prune_stats.items() if n]
+    print(f"[PRUNE] {total} cek | " + " | ".join(parts))
+
+
+def report_tiers():
+    # frekuensi scan yang benar-benar tercapai per tier sejak laporan terakhir
+    if tiers is None:
+        return
+    parts = []
+    for tier, r in tiers.report(time.time()).items():
+        metrics.set_gauge("tier_symbols", r["symbols"], tier=tier)
+        metrics.set_gauge("tier_stale_max_seconds", r["stale_max_sec"], tier=tier)
+        if r["interval_mean_sec"] is not None:
+            metrics.set_gauge("tier_scan_interval_seconds", r["interval_mean_sec"], tier=tier)
+        if not r["symbols"]:
+            continue
+        mean = "-" if r["interval_mean_sec"] is None else f"{r['interval_mean_sec']:.0f}s"
+        parts.append(f"{tier} {r['symbols']} (tiap {r['period_cycles']} siklus, interval {mean} "
+                     f"maks {r['interval_max_sec']:.0f}s, basi maks {r['stale_max_sec']:.0f}s"
+                     + (f", {r['never_scanned']} belum discan" if r["never_scanned"] else "") + ")")
+    if parts:
+        print(f"[TIER] batas {tiers.stale} siklus | " + " | ".join(parts))
 
 
 def monitor_active_signals():
+    # Satu snapshot harga untuk semua simbol, plus high/low candle 1m sejak cek terakhir
+    # supaya wick di antara cek tidak terlewat
     try:
-        for signal in active_signals[:]:
-            symbol = signal['symbol']
-            entry_price = signal['entry']
-            side = signal['side']
-            side_emoji = "🚀" if side == "LONG" else "🔻"
-            klines = client.futures_klines(symbol=symbol, interval='1m', limit=2)
-            last_price = float(klines[-1][4])
-
-            # SL check
-            if (side == 'LONG' and last_price <= signal['sl']) or \
-               (side == 'SHORT' and last_price >= signal['sl']):
-                send_telegram(
-                    f"❌ {symbol} | STOP LOSS 💀 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}"
-                )
-                log_event(f"{symbol} | SL Hit | {last_price:.3f} | Entry {entry_price:.3f} | {side}")
-                active_signals.remove(signal)
+        symbols = triggers.symbols()
+        if not symbols:
+            return
+        prices = last_prices if STREAM_MODE else price_snapshot(client)
+        now_ms = int(time.time() * 1000)
+        for symbol in symbols:
+            price = prices.get(symbol)
+            if price is None:
                 continue
-
-            # TP checks
-            if side == 'LONG':
-                if not signal['notified_tp1'] and last_price >= signal['tp1']:
-                    send_telegram(f"✅ {symbol} | TP1 🎯 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
-                    signal['notified_tp1'] = True
-                    signal['trailing_active'] = True
-                    signal['sl'] = entry_price
-                if not signal['notified_tp2'] and last_price >= signal['tp2']:
-                    send_telegram(f"🏅 {symbol} | TP2 🥈 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
-                    signal['notified_tp2'] = True
-                    signal['sl'] = signal['tp1']
-                if not signal['notified_tp3'] and last_price >= signal['tp3']:
-                    send_telegram(f"🏆 {symbol} | TP3 🥇 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
-                    signal['notified_tp3'] = True
-                    active_signals.remove(signal)
-
-            elif side == 'SHORT':
-                if not signal['notified_tp1'] and last_price <= signal['tp1']:
-                    send_telegram(f"✅ {symbol} | TP1 🎯 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
-                    signal['notified_tp1'] = True
-                    signal['trailing_active'] = True
-                    signal['sl'] = entry_price
-                if not signal['notified_tp2'] and last_price <= signal['tp2']:
-                    send_telegram(f"🏅 {symbol} | TP2 🥈 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
-                    signal['notified_tp2'] = True
-                    signal['sl'] = signal['tp1']
-                if not signal['notified_tp3'] and last_price <= signal['tp3']:
-                    send_telegram(f"🏆 {symbol} | TP3 🥇 | {last_price:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
-                    signal['notified_tp3'] = True
-                    active_signals.remove(signal)
-
+            since = last_checked.get(symbol, now_ms)
+            # buffer 1m disegarkan untuk SEMUA simbol bersinyal, bukan hanya yang discan tier siklus ini
+            # (stream mode: tanpa REST; polling: refresh incremental)
+            need = min(MAX_KLINES_PER_CALL, max(MONITOR_1M_BARS, (now_ms - since) // 60_000 + 2))
+            try:
+                rows = kline_cache.get(symbol, '1m', need)
+            except Exception as e:
+                print(f"[monitor] 1m {symbol} gagal ({e}), pakai buffer yang ada")
+                rows = kline_cache.peek(symbol, '1m')
+            # bar yang overlap [since, now]: termasuk bar yang sudah open sebelum cek terakhir
+            bars = [k for k in rows if int(k[6]) >= since and int(k[0]) <= now_ms]
+            high = max([price] + [float(k[2]) for k in bars])
+            low = min([price] + [float(k[3]) for k in bars])
+            last_checked[symbol] = now_ms
+            on_price(symbol, price, high, low)
     except Exception as e:
         print(f"[ERROR monitor]: {e}")
 
 
-# === MAIN LOOP === #
-while True:
-    try:
-        client.futures_ping()
+def on_price(symbol, last_price, high=None, low=None):
+    # Hanya level TP/SL yang benar-benar dilewati harga yang diproses
+    high = last_price if high is None else high
+    low = last_price if low is None else low
+    with state_lock:
+        for signal, kinds in triggers.cross(symbol, high, low):
+            fire_levels(signal, kinds, last_price)
+
+
+def fire_levels(signal, kinds, last_price):
+    symbol = signal['symbol']
+    entry_price = signal['entry']
+    side = signal['side']
+    side_emoji = "🚀" if side == "LONG" else "🔻"
+    up = side == 'LONG'
+
+    def hit_price(level, favorable):
+        # harga terakhir kalau memang sudah lewat level, selain itu level-nya (tersentuh oleh wick)
+        crossed = (last_price >= level) if up == favorable else (last_price <= level)
+        return last_price if crossed else level
+
+    levels = {kind: signal[kind] for kind in kinds}   # sebelum trailing menggeser SL
+    hits, closed = apply_levels(signal, kinds)
+
+    # SL check
+    if 'sl' in hits:
+        px = hit_price(levels['sl'], False)
+        send_telegram(
+            f"❌ {symbol} | STOP LOSS 💀 | {px:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}"
+        )
+        log_event("sl", signal, price=px, entry=entry_price)
+
+    # TP checks
+    if 'tp1' in hits:
+        px = hit_price(levels['tp1'], True)
+        send_telegram(f"✅ {symbol} | TP1 🎯 | {px:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
+        log_event("tp", signal, level="tp1", price=px, entry=entry_price)
+    if 'tp2' in hits:
+        px = hit_price(levels['tp2'], True)
+        send_telegram(f"🏅 {symbol} | TP2 🥈 | {px:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
+        log_event("tp", signal, level="tp2", price=px, entry=entry_price)
+    if 'tp3' in hits:
+        px = hit_price(levels['tp3'], True)
+        send_telegram(f"🏆 {symbol} | TP3 🥇 | {px:.3f} | Entry {entry_price:.3f} | {side_emoji} {side}")
+        log_event("tp", signal, level="tp3", price=px, entry=entry_price)
+
+    if closed:
+        # px = harga keluar (SL atau TP3); pnl dalam % dari entry, searah posisi
+        pnl_pct = (px - entry_price) / entry_price * 100 * (1 if up else -1)
+        log_event("close", signal, price=px, entry=entry_price, pnl_pct=pnl_pct,
+                  outcome='sl' if 'sl' in hits else 'tp3')
+        close_signal(signal)
+        return
+    if 'tp1' in hits or 'tp2' in hits:
+        triggers.set_level(signal, 'sl', signal['sl'])   # trailing: SL ikut naik/turun
+        log_event("trail", signal, sl=signal['sl'])
+    if hits:
+        persist_signal(signal)
+
+
+def close_signal(signal):
+    triggers.remove_signal(signal)
+    active_signals.close(signal)
+    if state is not None:
+        state.delete("signals", signal_key(signal))
+    if not active_signals.has_symbol(signal['symbol']):
+        last_checked.pop(signal['symbol'], None)
+
+
+def run_stream_mode():
+    while True:
+        stream = None
+        try:
+            client.futures_ping()
+            symbols = filter_symbols(get_all_usdt_futures_symbols())[:5]
+            stream = MarketStream(kline_cache, symbols, TF_LIST, seed_limit=200).start()
+            metrics.gauge_fn("stream_queue_depth", stream.events.qsize)
+            refresh_at = time.time() + UNIVERSE_REFRESH_SEC
+            next_report = time.time() + PRUNE_REPORT_SEC
+            last_eval = {}
+            while time.time() < refresh_at:
+                if time.time() >= next_report:
+                    report_prune_stats()
+                    next_report = time.time() + PRUNE_REPORT_SEC
+                try:
+                    event = stream.events.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if event[0] == "kline" and event[2] == '1m':
+                    _, sym, _, closed = event
+                    if closed or time.time() - last_eval.get(sym, 0) >= STREAM_EVAL_MIN_SEC:
+                        last_eval[sym] = time.time()
+                        check_signal(sym)
+                elif event[0] == "mark":
+                    _, sym, price = event
+                    last_prices[sym] = price
+                    on_price(sym, price)
+
+        except Exception as err:
+            print(f"Stream loop error: {err}")
+            time.sleep(5)
+        finally:
+            if stream is not None:
+                stream.stop()
+            last_prices.clear()
+
+
+def scan_once(until_ms=None):
+    global next_prune_report
+    t0 = time.perf_counter()
+    client.futures_ping()
+    if PANEL_SCAN:
         symbols = filter_symbols(get_all_usdt_futures_symbols())
-        for sym in symbols[:5]:
-            check_signal(sym)
-            time.sleep(0.4)
+        scan_panel(symbols, until_ms)
+    else:
+        # paralel; jeda antar request diatur limiter, bukan sleep tetap
+        symbols = pick_symbols()
+        scan_concurrent(lambda sym: check_signal(sym, until_ms), symbols, SCAN_WORKERS)
+        if tiers is not None:
+            tiers.mark(symbols, time.time())
+    metrics.observe("scan_pass_seconds", time.perf_counter() - t0, bot="sinyalbot")
+    metrics.set_gauge("scan_symbols", len(symbols), bot="sinyalbot")
+    first = metrics.startup("first_scan", "sinyalbot")
+    if first is not None:
+        print(f"[START] scan pertama selesai {first:.1f}s sejak proses start")
+
+    monitor_active_signals()
+    if time.time() >= next_prune_report:
+        report_prune_stats()
+        report_tiers()
+        next_prune_report = time.time() + PRUNE_REPORT_SEC
+
+
+def run_sharded():
+    # Worker (lokal / host lain) yang scan; proses ini pegang active_signals, cooldowns, Telegram & monitor TP/SL
+    def on_signal(symbol, result):
+        now = time.time()
+        with state_lock:
+            if in_cooldown(cooldowns, symbol, now):
+                return
+            apply_signal(symbol, *result, now)
+
+    def on_stages(stages):
+        with state_lock:
+            for stage, n in stages.items():
+                prune_stats[stage] = prune_stats.get(stage, 0) + n
+
+    def in_cooldown_now():
+        now = time.time()
+        with state_lock:
+            return [s for s in cooldowns if in_cooldown(cooldowns, s, now)]
+
+    address = parse_address(SHARD_ADDRESS)
+    coord = Coordinator(universe=lambda: filter_symbols(get_all_usdt_futures_symbols()), on_signal=on_signal,
+                        cooldown=in_cooldown_now, on_stages=on_stages).serve(address, SHARD_AUTHKEY.encode() or None)
+    local = LocalWorkers(address, coord.authkey, SHARD_LOCAL_WORKERS) if SHARD_LOCAL_WORKERS else None
+    next_report = time.time() + PRUNE_REPORT_SEC
+    try:
+        while True:
+            try:
+                monitor_active_signals()
+                if local is not None:
+                    local.check()
+                if time.time() >= next_report:
+                    report_prune_stats()
+                    next_report = time.time() + PRUNE_REPORT_SEC
+            except Exception as err:
+                print(f"Coordinator loop error: {err}")
+            time.sleep(60)
+    finally:
+        if local is not None:
+            local.stop()
+
+
+# === MAIN LOOP === #
+def main():
+    init()
+    restore_state()
+    if METRICS_PORT:
+        metrics.serve(METRICS_PORT, profile=METRICS_PROFILE)
+        client.export_metrics()
+        metrics.gauge_fn("active_signals", lambda: len(active_signals))
+        metrics.gauge_fn("telegram_queue_depth", notifier.depth)
+    metrics.startup("ready", "sinyalbot")
+
+    if SHARD_MODE:
+        run_sharded()
+
+    if STREAM_MODE:
+        run_stream_mode()
+
+    if CLOSE_SCHEDULER:
+        # boundary = open time bar 1m baru; yang dievaluasi bar yang barusan close
+        # catch_up: bar yang close terakhir langsung discan saat start, tidak menunggu close berikutnya
+        CloseScheduler(ServerClock(client)).every_close('1m', scan_once, "scan", catch_up=True).run_forever()
+
+    while True:
+        try:
+            scan_once()
+            time.sleep(60)
+
+        except Exception as err:
+            print(f"Main loop error: {err}")
+            time.sleep(60)
 
-        monitor_active_signals()
-        time.sleep(60)
 
-    except Exception as err:
-        print(f"Main loop error: {err}")
-        time.sleep(60)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# sinyallogic.py
+# Strategy rules of sinyalbot.py without any I/O, shared by the live bot and
+# backtest.py so a backtest replays exactly what production does
+# - SinyalIndicators: streaming indicator state per (symbol, tf); the same
+#   values as engine.py feature specs (SINYAL_FEATURES / feature_snapshot)
+# - tf_snapshot: one timeframe through a KlineCache into its indicator state
+# - lazy_conditions: entry conditions that stop at the first failing AND term
+#   and only compute the timeframes they reach
+# - plan_signal: HOLD update of an open signal, or a new signal with size/TP/SL
+# - apply_levels: what happens when TP/SL levels fire (trailing SL after TP1/TP2)
+
+import metrics
+from indicators import IndicatorSet, SMA, RSI, ADX, ATR, BollingerBands
+from panel import sinyal_conditions
+from klineparse import before
+from signalstore import Signal
+
+MODAL_TOTAL = 20  # modal awal total $20
+LEVERAGE = 20
+TF_LIST = ['1m', '5m', '15m', '1h', '4h']
+COOLDOWN_SEC = 300
+TREND_STAGES = ('1h', '15m', '5m')   # urutan cek tren TF atas: yang paling sering beda arah dulu
+PRUNE_STAGES = ('1m:breakout', '1m:volume_spike', '1m:strong_adx', '1m:volatility_ok',
+                '1h:trend', '15m:trend', '5m:trend', 'passed')
+
+
+class SinyalIndicators(IndicatorSet):
+    # Indikator per (symbol, tf), seed sekali lalu update O(1) per candle baru/revisi
+    def _build(self):
+        self.ma_fast = SMA(5)
+        self.ma_slow = SMA(20)
+        self.rsi = RSI(14)
+        self.adx = ADX(14)
+        self.atr = ATR(14)
+        self.bb = BollingerBands(20, 2)
+        self.vol_ma = SMA(20)
+        self.atr_ma = SMA(20)
+
+    def _update(self, row, revise):
+        high, low, close, volume = float(row[2]), float(row[3]), float(row[4]), float(row[5])
+        if revise:
+            self.ma_fast.revise(close)
+            self.ma_slow.revise(close)
+            self.rsi.revise(close)
+            self.adx.revise(high, low, close)
+            self.atr_ma.revise(self.atr.revise(high, low, close))
+            self.bb.revise(close)
+            self.vol_ma.revise(volume)
+        else:
+            self.ma_fast.update(close)
+            self.ma_slow.update(close)
+            self.rsi.update(close)
+            self.adx.update(high, low, close)
+            self.atr_ma.update(self.atr.update(high, low, close))
+            self.bb.update(close)
+            self.vol_ma.update(volume)
+
+    def snapshot(self):
+        # Nilai candle terakhir (dulu: df.iloc[-1])
+        return _snapshot(self.last_row, self.ma_fast.value, self.ma_slow.value, self.rsi.value,
+                         self.adx.value, self.atr.value, self.bb.hband, self.bb.lband,
+                         self.vol_ma.value, self.atr_ma.value)
+
+
+# Indikator yang sama sebagai spec engine.FeatureSet (engine.py), per TF di TF_LIST
+SINYAL_FEATURES = (("sma", 5), ("sma", 20), ("rsi", 14), ("adx", 14), ("atr", 14),
+                   ("bb", 20, 2), ("sma_v", 20), ("atr_ma", 14, 20))
+
+
+def feature_snapshot(f):
+    """SinyalIndicators.snapshot() of an engine FeatureSet subscribed to SINYAL_FEATURES."""
+    hband, lband = f[("bb", 20, 2)]
+    return _snapshot(f.last_row, f[("sma", 5)], f[("sma", 20)], f[("rsi", 14)], f[("adx", 14)],
+                     f[("atr", 14)], hband, lband, f[("sma_v", 20)], f[("atr_ma", 14, 20)])
+
+
+def _snapshot(row, ma_fast, ma_slow, rsi, adx, atr, bb_upper, bb_lower, vol_ma, atr_ma):
+    close, volume = float(row[4]), float(row[5])
+    return {
+        'timestamp': int(row[0]),
+        'close': close,
+        'high': float(row[2]),
+        'low': float(row[3]),
+        'volume': volume,
+        'ma_fast': ma_fast,
+        'ma_slow': ma_slow,
+        'rsi': rsi,
+        'adx': adx,
+        'atr': atr,
+        'bb_upper': bb_upper,
+        'bb_lower': bb_lower,
+        'vol_ma': vol_ma,
+        'atr_ma': atr_ma,
+        'volume_spike': volume > vol_ma * 1.5,
+        'trend_up': ma_fast > ma_slow,
+        'breakout_up': close > bb_upper,
+        'breakout_down': close < bb_lower,
+        'strong_adx': adx > 25,
+        'volatility_ok': atr > atr_ma,
+    }
+
+
+def in_cooldown(cooldowns, symbol, now):
+    return symbol in cooldowns and now - cooldowns[symbol] < COOLDOWN_SEC
+
+
+def tf_snapshot(cache, indicator_sets, symbol, tf, limit=200, until_ms=None):
+    """Klines of one timeframe (via `cache`) synced into {(symbol, tf): SinyalIndicators}.
+
+    until_ms: ignore bars opened at/after it (scheduled scans evaluate the bar
+    that just closed, not the one that opened a few ms ago).
+    """
+    klines = before(cache.get(symbol, tf, limit), until_ms)
+    ind = indicator_sets.get((symbol, tf))
+    if ind is None:
+        ind = indicator_sets[(symbol, tf)] = SinyalIndicators()
+    return ind.sync(klines).snapshot()
+
+
+def lazy_conditions(snapshot):
+    """sinyal_conditions, computing only the timeframes it actually needs.
+
+    `snapshot(tf)` returns the indicator snapshot of one timeframe (fetch +
+    sync). cond_up/cond_down are pure ANDs, so the 1m trend picks the only
+    possible side, then the 1m gates and the 1h/15m/5m trend agreement are
+    checked in order; 4h is only read for sizing once everything passed.
+    Returns (stage, result): the first failing term of PRUNE_STAGES and None,
+    or ("passed", sinyal_conditions(...)).
+    """
+    data = {}
+
+    def get(tf):
+        if tf not in data:
+            data[tf] = snapshot(tf)
+        return data[tf]
+
+    d1 = get('1m')
+    up = bool(d1['trend_up'])
+    if not (d1['breakout_up'] if up else d1['breakout_down']):
+        return '1m:breakout', None
+    for term in ('volume_spike', 'strong_adx', 'volatility_ok'):
+        if not d1[term]:
+            return '1m:' + term, None
+    for tf in TREND_STAGES:
+        if bool(get(tf)['trend_up']) != up:
+            return tf + ':trend', None
+    snapshots = [get(tf) for tf in TF_LIST]
+    with metrics.timer("conditions_seconds", strategy="sinyal"):
+        return 'passed', sinyal_conditions(*snapshots)
+
+
+def plan_signal(active_signals, symbol, cond_up, cond_down, risk_pct, price, atr_4h):
+    """Decide what check_signal does with the entry conditions.
+
+    `active_signals` is a SignalStore. Returns None (nothing to do),
+    ("hold", signal, None) after moving TP/SL of the open signal in the same
+    direction, or ("new", signal, size) with a fresh Signal that is not yet
+    registered anywhere.
+    """
+    if not (cond_up or cond_down):
+        return None
+    risk_dollar = MODAL_TOTAL * risk_pct
+    sl_main = price - atr_4h if cond_up else price + atr_4h
+    price_sl_diff = abs(price - sl_main)
+    if price_sl_diff == 0:
+        return None
+
+    size = round((risk_dollar / price_sl_diff) * LEVERAGE, 2)
+    if size == 0:
+        return None
+
+    # --- CEK JIKA SUDAH ADA POSISI SEARAH ---
+    existing_signal = active_signals.get(symbol, "LONG" if cond_up else "SHORT")
+    if existing_signal is not None:
+        if cond_up and existing_signal["side"] == "LONG":
+            # Update TP/SL naikkan
+            existing_signal["tp1"] = price + atr_4h * 1.8
+            existing_signal["tp2"] = price + atr_4h * 3
+            existing_signal["tp3"] = price + atr_4h * 4.5
+            existing_signal["sl"] = max(existing_signal["sl"], price - atr_4h * 0.8)
+            return "hold", existing_signal, None
+
+        elif cond_down and existing_signal["side"] == "SHORT":
+            # Update TP/SL turunkan
+            existing_signal["tp1"] = price - atr_4h * 1.8
+            existing_signal["tp2"] = price - atr_4h * 3
+            existing_signal["tp3"] = price - atr_4h * 4.5
+            existing_signal["sl"] = min(existing_signal["sl"], price + atr_4h * 0.8)
+            return "hold", existing_signal, None
+
+    # --- SINYAL BARU ---
+    tp1 = price + atr_4h * 1.5 if cond_up else price - atr_4h * 1.5
+    tp2 = price + atr_4h * 2.5 if cond_up else price - atr_4h * 2.5
+    tp3 = price + atr_4h * 4 if cond_up else price - atr_4h * 4
+    signal = Signal(symbol, "LONG" if cond_up else "SHORT", price, tp1, tp2, tp3, sl_main)
+    return "new", signal, size
+
+
+def apply_levels(signal, kinds):
+    """Update a signal for the levels that fired (kinds from TriggerIndex.cross).
+
+    Returns (hits, closed): hits are the kinds acted upon, closed means the
+    signal is done (SL or TP3).
+    """
+    if 'sl' in kinds:
+        return ['sl'], True
+    hits = []
+    if 'tp1' in kinds and not signal['notified_tp1']:
+        signal['notified_tp1'] = True
+        signal['trailing_active'] = True
+        signal['sl'] = signal['entry']
+        hits.append('tp1')
+    if 'tp2' in kinds and not signal['notified_tp2']:
+        signal['notified_tp2'] = True
+        signal['sl'] = signal['tp1']
+        hits.append('tp2')
+    if 'tp3' in kinds and not signal['notified_tp3']:
+        signal['notified_tp3'] = True
+        hits.append('tp3')
+        return hits, True
+    return hits, False
@@ -0,0 +1,349 @@
+# sweep.py
+# Parameter sweep / optimizer for salamprofit's retrace settings on stored 1m klines
+# - Every parameter set is replayed through backtest.backtest_retrace, i.e.
+#   the production fib_band / retrace_conditions / anti-spam memory / SL-TP
+# - What does not depend on the swept settings (TF_ENTRY bars, 1h trend
+#   flags, EMA/RSI/StochRSI) is computed once per symbol and placed in one
+#   shared-memory block; workers map it as numpy views, a task only carries
+#   its parameter dict, so throughput grows with the number of cores
+# - Modes: grid (full product), random, bayes (tree-structured Parzen
+#   estimator over the discrete choices, one batch per round = one task per
+#   worker)
+# - Ranked table on stdout (current config included as a reference row),
+#   every result in --out CSV. Sets without a single trade are not ranked;
+#   if no set trades at all the sweep stops with an error instead of
+#   ranking noise (data too short, or a space no setup can satisfy)
+#
+# Usage:
+#   python sweep.py --symbols BTCUSDT,ETHUSDT --mode bayes --samples 400
+#   python sweep.py --symbols BTCUSDT --mode grid --params SL_PCT,TP2_PCT --set SL_PCT=0.004,0.006,0.008
+#   python sweep.py --symbols BTCUSDT --store klines --mode random --samples 1000 --out sweep.csv
+
+import os
+import ast
+import csv
+import time
+import math
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from klineparse import Bars
+from backtest import DATA_DIR, load_1m, load_store, retrace_inputs, backtest_retrace, summarize
+
+# Pilihan nilai per parameter; --params membatasi yang di-sweep, --set mengganti pilihannya
+SPACE = {
+    "RSI_MIN_LONG": (40, 45, 50),
+    "RSI_MAX_LONG": (55, 60, 65, 70),
+    "RSI_MIN_SHORT": (30, 35, 40, 45),
+    "RSI_MAX_SHORT": (50, 55, 60),
+    "STOCHK_LOW_LONG": (0.15, 0.25, 0.35),
+    "STOCHK_HIGH_LONG": (0.55, 0.65, 0.75),
+    "STOCHK_LOW_SHORT": (0.25, 0.35, 0.45),
+    "STOCHK_HIGH_SHORT": (0.65, 0.75, 0.85),
+    "FIB_LOOKBACK": (10, 20, 30, 50),
+    "FIB_LEVELS": ((0.382, 0.5), (0.5, 0.618), (0.618, 0.786)),
+    "SLIP_TOL_PCT": (0.001, 0.0025, 0.005),
+    "SL_PCT": (0.004, 0.006, 0.008, 0.01),
+    "TP1_PCT": (0.008, 0.012, 0.016),
+    "TP2_PCT": (0.015, 0.02, 0.03),
+    "ENTRY_WINDOW_MIN": (15, 30, 60),
+    "REALERT_COOLDOWN_MIN": (10, 20, 40),
+}
+ORDERED = (("RSI_MIN_LONG", "RSI_MAX_LONG"), ("RSI_MIN_SHORT", "RSI_MAX_SHORT"),
+           ("STOCHK_LOW_LONG", "STOCHK_HIGH_LONG"), ("STOCHK_LOW_SHORT", "STOCHK_HIGH_SHORT"),
+           ("TP1_PCT", "TP2_PCT"))
+RANK_KEYS = ("total_pnl_pct", "avg_pnl_pct", "win_rate", "profit_factor")
+MAX_GRID = 100_000
+TPE_GAMMA = 0.25          # bagian hasil terbaik yang jadi model "bagus"
+TPE_CANDIDATES = 64       # kandidat yang ditimbang per saran
+EMPTY = {key: 0.0 for key in ("trades", "win_rate", "sl_rate", "tp1_rate", "tp2_rate", "tp3_rate",
+                              "total_pnl_pct", "avg_pnl_pct", "profit_factor", "max_drawdown_pct")}
+
+
+# ===================== SHARED DATA =====================
+def _prepare(symbol, data_dir, store):
+    bars = load_store(symbol, store) if store else load_1m(symbol, data_dir)
+    arrays = {"1m_" + name: np.asarray(col) for name, col in zip(Bars._fields, bars)}
+    arrays.update(retrace_inputs(bars))
+    return symbol, arrays
+
+
+def pack(prepared):
+    """[(symbol, {name: array})] -> (SharedMemory, layout) with every array copied in once."""
+    layout, size = [], 0
+    for symbol, arrays in prepared:
+        for name, arr in arrays.items():
+            layout.append((symbol, name, arr.dtype.str, arr.shape, size))
+            size += -(-arr.nbytes // 64) * 64      # tiap array mulai di batas 64 byte
+    shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    arrays = (arr for _, arrays in prepared for arr in arrays.values())
+    for entry, arr in zip(layout, arrays):
+        _view(shm, entry)[...] = arr
+    return shm, layout
+
+
+def _view(shm, entry):
+    _, _, dtype, shape, offset = entry
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+
+
+def unpack(shm, layout):
+    """{symbol: (Bars, inputs)} of numpy views into the shared block (no copy)."""
+    out = {}
+    for entry in layout:
+        symbol, name = entry[:2]
+        arr = _view(shm, entry)
+        cols, inputs = out.setdefault(symbol, ({}, {}))
+        if name.startswith("1m_"):
+            cols[name[3:]] = arr
+        else:
+            inputs[name] = arr
+    return {symbol: (Bars(**cols), inputs) for symbol, (cols, inputs) in out.items()}
+
+
+_shm = None
+_data = None
+
+
+def _attach(name, layout):
+    global _shm, _data
+    _shm = shared_memory.SharedMemory(name=name)
+    _data = unpack(_shm, layout)
+
+
+def _evaluate(params):
+    """One parameter set over every symbol (runs in a worker)."""
+    import salamprofit as sp
+    for key, val in params.items():
+        setattr(sp, key, val)
+    trades = []
+    for symbol, (bars, inputs) in _data.items():
+        trades += backtest_retrace(symbol, bars, inputs)[0]
+    return params, summarize(trades).get("retrace", EMPTY)
+
+
+# ===================== SAMPLING =====================
+def valid(params):
+    return all(params[lo] < params[hi] for lo, hi in ORDERED if lo in params and hi in params)
+
+
+def grid(space):
+    names = list(space)
+    for combo in itertools.product(*(space[n] for n in names)):
+        params = dict(zip(names, combo))
+        if valid(params):
+            yield params
+
+
+def random_params(space, rng):
+    while True:
+        params = {name: rng.choice(choices) for name, choices in space.items()}
+        if valid(params):
+            return params
+
+
+def tpe_suggest(space, history, n, rng, seen):
+    """n new parameter sets from a tree-structured Parzen estimator.
+
+    history: [(params, score)]. The best TPE_GAMMA of it defines l(x), the
+    rest g(x), per parameter as smoothed frequencies over its choices; of
+    TPE_CANDIDATES draws from l(x) the one with the highest l(x)/g(x) wins.
+    """
+    ranked = sorted(history, key=lambda h: h[1], reverse=True)
+    n_good = max(1, int(len(ranked) * TPE_GAMMA))
+
+    def density(rows):
+        dens = {}
+        for name, choices in space.items():
+            counts = [1.0] * len(choices)           # prior rata supaya tidak ada peluang nol
+            for params, _ in rows:
+                if params[name] in choices:     # config sekarang bisa di luar pilihan --set
+                    counts[choices.index(params[name])] += 1
+            total = sum(counts)
+            dens[name] = [c / total for c in counts]
+        return dens
+
+    good, bad = density(ranked[:n_good]), density(ranked[n_good:])
+    out = []
+    for _ in range(n):
+        best, best_ratio = None, -math.inf
+        for _ in range(TPE_CANDIDATES):
+            idx = {name: rng.choices(range(len(choices)), weights=good[name])[0]
+                   for name, choices in space.items()}
+            params = {name: space[name][i] for name, i in idx.items()}
+            key = _key(params)
+            if not valid(params) or key in seen:
+                continue
+            ratio = sum(math.log(good[name][i] / bad[name][i]) for name, i in idx.items())
+            if ratio > best_ratio:
+                best, best_ratio = params, ratio
+        if best is None:
+            best = random_params(space, rng)
+        seen.add(_key(best))
+        out.append(best)
+    return out
+
+
+def _key(params):
+    return tuple(sorted(params.items()))
+
+
+def score(stats, rank, min_trades):
+    if stats["trades"] < min_trades:
+        return -math.inf
+    return stats[rank]
+
+
+# ===================== REPORT =====================
+def _fmt(val):
+    if isinstance(val, float):
+        return f"{val:g}"
+    if isinstance(val, tuple):
+        return "/".join(_fmt(v) for v in val)
+    return str(val)
+
+
+def print_table(results, names, rank, top):
+    """Ranked sets that traded at least once (the current config always, as a reference)."""
+    shown = [r for r in results if r[1]["trades"] or r[3]]
+    print(f"\n{'#':>4} {rank:>14} {'trades':>6} {'win%':>6} {'pnl%':>8} {'pf':>6} {'maxdd%':>7}  params")
+    for i, (params, stats, s, tag) in enumerate(shown[:top], 1):
+        cols = " ".join(f"{name}={_fmt(params[name])}" for name in names)
+        print(f"{i:>4} {s:>14.2f} {int(stats['trades']):>6} {stats['win_rate']:>6.1f} "
+              f"{stats['total_pnl_pct']:>8.2f} {stats['profit_factor']:>6.2f} "
+              f"{stats['max_drawdown_pct']:>7.2f}  {cols}{tag}")
+
+
+def write_csv(path, results, names):
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["rank", "score"] + list(names) + list(EMPTY) + ["current"])
+        for i, (params, stats, s, tag) in enumerate(results, 1):
+            w.writerow([i, s] + [_fmt(params[n]) for n in names] + [stats[k] for k in EMPTY] + [int(bool(tag))])
+
+
+# ===================== MAIN =====================
+def parse_set(items):
+    """["NAME=v1,v2", ...] -> {NAME: (v1, v2)}; values are Python literals, e.g. FIB_LEVELS=(0.5,0.618),(0.382,0.5)."""
+    out = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        name = name.strip().upper()
+        if name not in SPACE:
+            raise SystemExit(f"--set: unknown parameter {name} (choose from {', '.join(SPACE)})")
+        out[name] = tuple(ast.literal_eval(f"[{values}]"))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Sweep / optimize salamprofit retrace settings on stored 1m klines")
+    ap.add_argument("--symbols", required=True, help="comma separated, e.g. BTCUSDT,ETHUSDT")
+    ap.add_argument("--data", default=DATA_DIR)
+    ap.add_argument("--store", help="read 1m bars from this KlineStore directory instead of CSV")
+    ap.add_argument("--mode", choices=("grid", "random", "bayes"), default="bayes")
+    ap.add_argument("--samples", type=int, default=200, help="parameter sets to evaluate (random / bayes)")
+    ap.add_argument("--params", help="only sweep these (comma separated); the rest keep salamprofit's values")
+    ap.add_argument("--set", action="append", default=[], metavar="NAME=V1,V2", help="choices of one parameter")
+    ap.add_argument("--rank", choices=RANK_KEYS, default="total_pnl_pct")
+    ap.add_argument("--min-trades", type=int, default=10, help="rank sets with fewer trades last")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--top", type=int, default=20)
+    ap.add_argument("--out", help="write every result to this CSV")
+    args = ap.parse_args()
+
+    import salamprofit as sp
+    space = dict(SPACE, **parse_set(args.set))
+    if args.params:
+        names = [n.strip().upper() for n in args.params.split(",") if n.strip()]
+        unknown = [n for n in names if n not in space]
+        if unknown:
+            raise SystemExit(f"--params: unknown {', '.join(unknown)}")
+        space = {n: space[n] for n in names}
+    names = list(space)
+    current = {name: getattr(sp, name) for name in names}
+    rng = random.Random(args.seed)
+
+    if args.mode == "grid":
+        size = math.prod(len(c) for c in space.values())
+        if size > MAX_GRID:
+            raise SystemExit(f"grid has {size} combinations (> {MAX_GRID}); narrow it with --params/--set "
+                             f"or use --mode random/bayes")
+
+    symbols = [s.strip().upper() for s in args.symbols.split(",") if s.strip()]
+    t0 = time.time()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(symbols)))) as pool:
+        prepared = list(pool.map(_prepare, symbols, [args.data] * len(symbols), [args.store] * len(symbols)))
+    shm, layout = pack(prepared)
+    del prepared
+    print(f"[SWEEP] {len(symbols)} simbol disiapkan dalam {time.time() - t0:.1f}s "
+          f"({shm.size / 1e6:.1f} MB shared), {args.workers} worker, mode {args.mode}")
+
+    results = []
+    seen = {_key(current)}
+
+    def collect(done):
+        for params, stats in done:
+            tag = " <- current" if _key(params) == _key(current) else ""
+            results.append((params, stats, score(stats, args.rank, args.min_trades), tag))
+
+    t1 = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_attach,
+                                 initargs=(shm.name, layout)) as pool:
+            collect(pool.map(_evaluate, [current]))
+            if args.mode == "grid":
+                todo = [p for p in grid(space) if _key(p) not in seen]
+                collect(pool.map(_evaluate, todo, chunksize=max(1, len(todo) // (args.workers * 8))))
+            elif args.mode == "random":
+                todo = []
+                for _ in range(args.samples * 20):
+                    if len(todo) >= args.samples:
+                        break
+                    p = random_params(space, rng)
+                    if _key(p) not in seen:
+                        seen.add(_key(p))
+                        todo.append(p)
+                collect(pool.map(_evaluate, todo, chunksize=max(1, len(todo) // (args.workers * 8))))
+            else:
+                n_init = min(args.samples, max(10, args.workers * 2))
+                todo = []
+                while len(todo) < n_init:
+                    p = random_params(space, rng)
+                    if _key(p) not in seen:
+                        seen.add(_key(p))
+                        todo.append(p)
+                collect(pool.map(_evaluate, todo))
+                while len(results) <= args.samples:
+                    batch = tpe_suggest(space, [(p, s) for p, _, s, _ in results], min(args.workers,
+                                        args.samples + 1 - len(results)), rng, seen)
+                    collect(pool.map(_evaluate, batch))
+    finally:
+        shm.close()
+        shm.unlink()
+    elapsed = time.time() - t1
+
+    results.sort(key=lambda r: r[2], reverse=True)
+    if args.out:
+        write_csv(args.out, results, names)
+        print(f"[SWEEP] hasil -> {args.out}")
+    idle = sum(1 for r in results if not r[1]["trades"])
+    if idle == len(results):
+        raise SystemExit(f"[SWEEP] tidak ada trade di {len(results)} set (termasuk config sekarang): "
+                         f"data terlalu pendek atau tidak ada setup yang bisa lolos di space ini, "
+                         f"tidak ada yang bisa diranking")
+    print_table(results, names, args.rank, args.top)
+    cur = next(i for i, r in enumerate(results, 1) if r[3])
+    print(f"\n{len(results)} set dalam {elapsed:.1f}s ({len(results) / max(elapsed, 1e-9):.1f} set/s), "
+          f"config sekarang di peringkat {cur}" + (" (tanpa trade)" if not results[cur - 1][1]["trades"] else ""))
+    if idle:
+        print(f"[SWEEP] {idle} set tanpa trade tidak ditampilkan (tetap ada di --out)")
+
+
+if __name__ == "__main__":
+    main()
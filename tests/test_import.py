@@ -0,0 +1,23 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import os, sys, threading
+sys.path.insert(0, sys.argv[1])
+import sinyalbot, salamprofit, engine
+assert sinyalbot.client is None and sinyalbot.notifier is None and sinyalbot.state is None, "sinyalbot"
+assert salamprofit.notifier is None and salamprofit.state is None and salamprofit.events is None, "salamprofit"
+print(sorted(os.listdir(".")), [t.name for t in threading.enumerate()])
+"""
+
+
+def test_bare_import_has_no_side_effects(tmp_path):
+    # default STATE_DIR/EVENT_DIR ("state"/"events") aktif: import saja tidak boleh membuat direktori/thread
+    env = {k: v for k, v in os.environ.items() if k not in ("STATE_DIR", "EVENT_DIR")}
+    out = subprocess.run([sys.executable, "-c", PROBE, ROOT], cwd=tmp_path, env=env,
+                         capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().splitlines()[-1] == "[] ['MainThread']"
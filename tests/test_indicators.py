@@ -0,0 +1,176 @@
+# Reference vectors from the `ta` library live in tests/data/ta_reference.json,
+# so parity with ta is asserted even where ta is not installed. Regenerate
+# (needs pandas + ta):
+#   PYTHONPATH=. python tests/test_indicators.py
+
+import json
+import math
+import os
+
+import numpy as np
+import pytest
+
+import indicators as ind
+import panel
+
+
+def _walk(n=600, seed=7):
+    rng = np.random.default_rng(seed)
+    c = 100.0 * np.cumprod(1 + rng.normal(0, 0.01, n))
+    h = c * (1 + np.abs(rng.normal(0, 0.004, n)))
+    l = c * (1 - np.abs(rng.normal(0, 0.004, n)))
+    return h, l, c
+
+
+def _stream(make, feed, h, l, c, revise=False):
+    """Feed bars one by one; with revise, every bar first arrives as a bogus open bar."""
+    x = make()
+    out = []
+    for i in range(len(c)):
+        if revise:
+            x.update(*feed(h[i] * 1.01, l[i] * 0.99, c[i] * 1.005))
+            v = x.revise(*feed(h[i], l[i], c[i]))
+        else:
+            v = x.update(*feed(h[i], l[i], c[i]))
+        out.append(v)
+    return np.array(out, dtype=float)
+
+
+CLOSE = lambda hh, ll, cc: (cc,)          # noqa: E731
+HLC = lambda hh, ll, cc: (hh, ll, cc)     # noqa: E731
+
+CASES = {
+    "sma": (lambda: ind.SMA(20), CLOSE, lambda h, l, c: panel.sma(c, 20)),
+    "ema": (lambda: ind.EMA(50), CLOSE, lambda h, l, c: panel.ema(c, 50)),
+    "rsi": (lambda: ind.RSI(14), CLOSE, lambda h, l, c: panel.rsi(c, 14)),
+    "atr": (lambda: ind.ATR(14), HLC, lambda h, l, c: panel.atr(h, l, c, 14)),
+    "adx": (lambda: ind.ADX(14), HLC, lambda h, l, c: panel.adx(h, l, c, 14)),
+    "bbh": (lambda: _Band(0), CLOSE, lambda h, l, c: panel.bollinger(c, 20, 2)[0]),
+    "bbl": (lambda: _Band(1), CLOSE, lambda h, l, c: panel.bollinger(c, 20, 2)[1]),
+    "stochrsi": (lambda: ind.StochRSI(14, 3, 3), CLOSE, lambda h, l, c: panel.stochrsi_k(c, 14, 3)),
+}
+
+
+class _Band:
+    """One side of BollingerBands as a single-valued indicator."""
+
+    def __init__(self, side):
+        self.bb, self.side = ind.BollingerBands(20, 2), side
+
+    def update(self, x):
+        return self.bb.update(x)[self.side]
+
+    def revise(self, x):
+        return self.bb.revise(x)[self.side]
+
+
+def _assert_close(got, want):
+    assert got.shape == want.shape
+    np.testing.assert_array_equal(np.isnan(got), np.isnan(want))
+    ok = ~np.isnan(want)
+    assert ok.sum() > len(want) // 2
+    np.testing.assert_allclose(got[ok], want[ok], rtol=1e-9, atol=1e-9)
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+@pytest.mark.parametrize("revise", [False, True], ids=["update", "revise"])
+def test_streaming_matches_numpy_reference(name, revise):
+    make, feed, ref = CASES[name]
+    h, l, c = _walk()
+    _assert_close(_stream(make, feed, h, l, c, revise), ref(h, l, c))
+
+
+def test_stochrsi_k_is_0_to_1():
+    h, l, c = _walk(2000, seed=3)
+    k = _stream(*CASES["stochrsi"][:2], h, l, c)
+    k = k[~np.isnan(k)]
+    assert -1e-9 <= k.min() and k.max() <= 1 + 1e-9 and k.max() > 0.5
+
+
+def test_sma_resum_keeps_precision():
+    # nilai besar + window kecil: running sum tanpa resum akan melenceng
+    rng = np.random.default_rng(1)
+    c = 1e6 + rng.normal(0, 1, 5 * ind.RESUM_EVERY)
+    got = _stream(lambda: ind.SMA(5), CLOSE, c, c, c)
+    _assert_close(got, panel.sma(c, 5))
+
+
+def test_flat_series_has_no_stochrsi():
+    c = np.full(60, 100.0)
+    k = _stream(*CASES["stochrsi"][:2], c, c, c)
+    assert all(math.isnan(v) for v in k)
+
+
+TA_REFERENCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "ta_reference.json")
+
+# nama di ta_reference.json -> (indikator streaming, input)
+TA_CASES = {
+    "sma": (lambda: ind.SMA(20), CLOSE),
+    "ema": (lambda: ind.EMA(50), CLOSE),
+    "rsi": (lambda: ind.RSI(14), CLOSE),
+    "atr": (lambda: ind.ATR(14), HLC),
+    "adx": (lambda: ind.ADX(14), HLC),
+    "bbh": (lambda: _Band(0), CLOSE),
+    "bbl": (lambda: _Band(1), CLOSE),
+    "stochrsi": (lambda: ind.StochRSI(14, 3, 3), CLOSE),
+}
+
+
+def _ta_reference(n=400, seed=11):
+    """Inputs + ta outputs (NaN -> None) for TA_CASES."""
+    import pandas as pd
+    from ta.trend import SMAIndicator, EMAIndicator, ADXIndicator
+    from ta.momentum import RSIIndicator, StochRSIIndicator
+    from ta.volatility import AverageTrueRange, BollingerBands as TaBB
+
+    h, l, c = _walk(n, seed)
+    hs, ls, cs = pd.Series(h), pd.Series(l), pd.Series(c)
+    out = {
+        "sma": SMAIndicator(cs, 20).sma_indicator(),
+        "ema": EMAIndicator(cs, 50).ema_indicator(),
+        "rsi": RSIIndicator(cs, 14).rsi(),
+        "atr": AverageTrueRange(hs, ls, cs, 14).average_true_range(),
+        "adx": ADXIndicator(hs, ls, cs, 14).adx(),
+        "bbh": TaBB(cs, 20, 2).bollinger_hband(),
+        "bbl": TaBB(cs, 20, 2).bollinger_lband(),
+        "stochrsi": StochRSIIndicator(cs, 14, 3, 3).stochrsi_k(),
+    }
+    as_list = lambda a: [None if math.isnan(v) else float(v) for v in a]   # noqa: E731
+    return {"high": as_list(h), "low": as_list(l), "close": as_list(c),
+            "ta": {k: as_list(v.to_numpy(dtype=float)) for k, v in out.items()}}
+
+
+def _load_reference():
+    with open(TA_REFERENCE, encoding="utf-8") as f:
+        ref = json.load(f)
+    arr = lambda v: np.array([np.nan if x is None else x for x in v], dtype=float)   # noqa: E731
+    return arr(ref["high"]), arr(ref["low"]), arr(ref["close"]), {k: arr(v) for k, v in ref["ta"].items()}
+
+
+def test_reference_covers_every_indicator():
+    assert set(_load_reference()[3]) == set(TA_CASES)
+
+
+@pytest.mark.parametrize("name", sorted(TA_CASES))
+@pytest.mark.parametrize("revise", [False, True], ids=["update", "revise"])
+def test_streaming_matches_ta_reference(name, revise):
+    h, l, c, ta_out = _load_reference()
+    make, feed = TA_CASES[name]
+    _assert_close(_stream(make, feed, h, l, c, revise), ta_out[name])
+
+
+def test_ta_reference_is_current():
+    # dengan ta terpasang: file referensi harus sama dengan output ta versi ini
+    pytest.importorskip("ta")
+    h, l, c, ta_out = _load_reference()
+    fresh = _ta_reference()
+    np.testing.assert_array_equal(np.array(fresh["close"]), c)
+    for k, v in fresh["ta"].items():
+        _assert_close(np.array([np.nan if x is None else x for x in v], dtype=float), ta_out[k])
+
+
+if __name__ == "__main__":
+    os.makedirs(os.path.dirname(TA_REFERENCE), exist_ok=True)
+    with open(TA_REFERENCE, "w", encoding="utf-8") as f:
+        json.dump(_ta_reference(), f, separators=(",", ":"))
+    print(f"{TA_REFERENCE} ditulis")
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+import sinyalbot
+from klinecache import KlineCache
+from signalstore import Signal, SignalStore
+from triggers import TriggerIndex
+
+STEP = 60_000
+T0 = 1_700_000_040_000 + 2_000      # cek pertama ~2 detik setelah close 1m
+
+
+class _Rest:
+    """futures_klines / futures_symbol_ticker stand-in around a controllable clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.price = 100.0
+        self.low = {}                 # {open_ms: low} wick per bar
+        self.calls = 0
+
+    def futures_klines(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        self.calls += 1
+        now = int(self.clock[0] * 1000) // STEP * STEP
+        start = startTime // STEP * STEP if startTime else now - (limit - 1) * STEP
+        rows, t = [], start
+        while t <= now and len(rows) < limit:
+            low = self.low.get(t, 99.9)
+            rows.append([t, "100", "100.1", str(low), "100", "10", t + STEP - 1, "1000", 5, "5", "500", "0"])
+            t += STEP
+        return rows
+
+    def futures_symbol_ticker(self, symbol=None):
+        return [{"symbol": "BTCUSDT", "price": str(self.price)}]
+
+
+class _Notifier:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, text, chat_id=None):
+        self.sent.append(text)
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    clock = [T0 / 1000]
+    monkeypatch.setattr(time, "time", lambda: clock[0])
+    rest = _Rest(clock)
+    note = _Notifier()
+    for name, value in (("client", rest), ("kline_cache", KlineCache(rest)), ("notifier", note),
+                        ("state", None), ("events", None), ("STREAM_MODE", False),
+                        ("triggers", TriggerIndex()), ("active_signals", SignalStore()), ("last_checked", {})):
+        monkeypatch.setattr(sinyalbot, name, value)
+    signal = Signal("BTCUSDT", "LONG", 100.0, 103.0, 106.0, 109.0, 95.0, opened=T0)
+    sinyalbot.active_signals.add(signal)
+    sinyalbot.triggers.index_signal(signal)
+    sinyalbot.last_checked["BTCUSDT"] = T0
+    return clock, rest, note
+
+
+def test_wick_through_sl_between_checks_fires(bot):
+    clock, rest, note = bot
+    sinyalbot.kline_cache.get("BTCUSDT", "1m", 60)      # simbol ini sempat discan
+    sinyalbot.monitor_active_signals()
+    assert note.sent == []
+    # bar yang open 2 detik SEBELUM cek pertama menembus SL lalu kembali ke 100
+    rest.low[T0 // STEP * STEP] = 94.0
+    clock[0] += 60
+    sinyalbot.monitor_active_signals()
+    assert any("STOP LOSS" in m for m in note.sent)
+    assert not sinyalbot.active_signals.has_symbol("BTCUSDT")
+
+
+def test_cold_symbol_is_refreshed_before_the_check(bot):
+    clock, rest, note = bot
+    # tidak pernah discan: buffer 1m belum ada, harga sekarang sudah kembali di atas SL
+    rest.low[T0 // STEP * STEP] = 94.0
+    clock[0] += 60
+    sinyalbot.monitor_active_signals()
+    assert rest.calls >= 1
+    assert any("STOP LOSS" in m for m in note.sent)
+
+
+def test_wick_before_the_signal_is_ignored(bot):
+    clock, rest, note = bot
+    rest.low[T0 // STEP * STEP - STEP] = 94.0            # bar yang close sebelum sinyal dibuka
+    clock[0] += 60
+    sinyalbot.monitor_active_signals()
+    assert note.sent == []
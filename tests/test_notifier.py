@@ -0,0 +1,167 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+import notifier
+from notifier import TelegramNotifier
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _Resp:
+    def __init__(self, status=200):
+        self.status_code = status
+        self.headers = {}
+        self.text = ""
+
+    def json(self):
+        return {}
+
+
+class _Session:
+    """requests.Session stand-in: `fail` -> ConnectionError, chat "stuck" -> 500, else 200."""
+
+    def __init__(self, fail=False, gate=None):
+        self.fail = fail
+        self.gate = gate              # threading.Event: post() menunggu sampai di-set
+        self.posts = []
+
+    def post(self, url, data=None, timeout=None):
+        if self.gate is not None:
+            self.gate.wait(10)
+        if self.fail:
+            raise requests.ConnectionError("offline")
+        if data["chat_id"] == "stuck":
+            return _Resp(500)
+        self.posts.append(data["text"])
+        return _Resp()
+
+
+def _notifier(spool, session, **kw):
+    kw.setdefault("coalesce_sec", 0.0)
+    kw.setdefault("min_interval", 0.0)
+    return TelegramNotifier("token", "chat", spool_path=str(spool), session=session, **kw)
+
+
+def _wait(pred, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if pred():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_message_is_spooled_by_the_worker_before_delivery(tmp_path):
+    spool = tmp_path / "pending.jsonl"
+    n = _notifier(spool, _Session(fail=True))
+    n.send("TP1 BTCUSDT")
+    assert _wait(lambda: spool.exists() and "TP1 BTCUSDT" in spool.read_text(encoding="utf-8"))
+    # proses kedua (restart setelah crash) menemukan pesan yang sama
+    again = _notifier(spool, _Session(fail=True))
+    again._load_spool()
+    assert again.depth() == 1
+    n.stop(timeout=0.1)
+
+
+def test_spool_is_compacted_after_delivery(tmp_path):
+    spool = tmp_path / "pending.jsonl"
+    session = _Session()
+    n = _notifier(spool, session)
+    for i in range(5):
+        n.send(f"msg {i}")
+    assert _wait(lambda: n.depth() == 0 and not spool.exists())
+    assert "\n\n".join(session.posts) == "\n\n".join(f"msg {i}" for i in range(5))
+    assert n.stats["sent"] == 5 and n.stats["spooled"] == 0
+    n.stop()
+
+
+def test_done_markers_and_periodic_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(notifier, "SPOOL_COMPACT_EVERY", 4)
+    spool = tmp_path / "pending.jsonl"
+    n = _notifier(spool, _Session())
+    n.send("tertahan", chat_id="stuck")          # 500 terus: tetap di spool
+    for i in range(10):
+        n.send(f"msg {i}", chat_id=f"chat{i}")
+    assert _wait(lambda: n.stats["sent"] == 10)
+    assert n.depth() == 1
+    n.stop(timeout=0.5)
+    lines = spool.read_text(encoding="utf-8").splitlines()
+    assert len(lines) <= 1 + notifier.SPOOL_COMPACT_EVERY
+    again = _notifier(spool, _Session())
+    again._load_spool()
+    assert again.depth() == 1
+    assert [t for _, t, _ in again._pending["stuck"]] == ["tertahan"]
+
+
+def test_stop_leaves_a_busy_worker_alone(tmp_path):
+    spool = tmp_path / "pending.jsonl"
+    gate = threading.Event()
+    session = _Session(gate=gate)
+    n = _notifier(spool, session)
+    n.send("msg 0")
+    assert _wait(lambda: n._n_pending == 1 and spool.exists())   # worker di dalam post()
+    n.stop(timeout=0.1)
+    assert n._thread.is_alive()
+    assert n._n_pending == 1 and not n._pending["chat"]     # batch sedang dikirim, tidak di-spool ulang
+    gate.set()
+    n._thread.join(5)
+    assert not n._thread.is_alive()
+    assert session.posts == ["msg 0"] and n.depth() == 0
+    assert not spool.exists()
+
+
+def test_depth_is_safe_to_read_while_sending(tmp_path):
+    n = _notifier(tmp_path / "pending.jsonl", _Session(), coalesce_sec=0.05)
+    errors = []
+    stop = threading.Event()
+
+    def watch():
+        try:
+            while not stop.is_set():
+                assert n.depth() >= 0
+        except Exception as e:      # mis. "dictionary changed size during iteration"
+            errors.append(e)
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    for i in range(2000):
+        n.send(f"msg {i}", chat_id=f"chat{i % 50}")
+    assert _wait(lambda: n.depth() == 0, timeout=10)
+    stop.set()
+    watcher.join()
+    assert not errors
+    assert n.stats["sent"] == 2000
+    n.stop()
+
+
+def test_sigkill_keeps_queued_messages(tmp_path):
+    spool = tmp_path / "pending.jsonl"
+    code = (
+        "import os, signal, sys, time, requests\n"
+        f"sys.path.insert(0, {ROOT!r})\n"
+        "from notifier import TelegramNotifier\n"
+        "class S:\n"
+        "    def post(self, *a, **k):\n"
+        "        raise requests.ConnectionError('offline')\n"
+        f"n = TelegramNotifier('token', 'chat', spool_path={str(spool)!r}, session=S())\n"
+        "for i in range(3):\n"
+        "    n.send(f'msg {i}')\n"
+        "while n.stats['errors'] == 0:\n"      # worker sudah mengambil & men-spool pesan
+        "    time.sleep(0.01)\n"
+        "os.kill(os.getpid(), signal.SIGKILL)\n"
+    )
+    p = subprocess.run([sys.executable, "-c", code], capture_output=True)
+    assert p.returncode == -signal.SIGKILL
+    session = _Session()
+    n = _notifier(spool, session)
+    n.start()
+    assert _wait(lambda: n.stats["sent"] == 3)
+    assert "\n\n".join(session.posts) == "msg 0\n\nmsg 1\n\nmsg 2"
+    assert _wait(lambda: not spool.exists())
+    n.stop()
@@ -0,0 +1,154 @@
+import json
+import threading
+import time
+
+import pytest
+from binance.exceptions import BinanceAPIException
+
+import ratelimit
+from fakeclient import FakeClient, _FakeResponse
+from ratelimit import LimitedClient, WeightLimiter, scan_concurrent
+
+
+def _error(status, retry_after="0"):
+    body = json.dumps({"code": -1003, "msg": "Too many requests"})
+    return BinanceAPIException(_FakeResponse(status, {"Retry-After": retry_after}, body), status, body)
+
+
+class _Failing:
+    """futures_klines fails `fails` times with `status`, then answers."""
+
+    def __init__(self, status, fails):
+        self.status = status
+        self.fails = fails
+        self.calls = 0
+
+    def futures_klines(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.fails:
+            raise _error(self.status)
+        return ["ok"]
+
+
+def test_limiter_never_exceeds_budget():
+    # 600 weight/menit: burst 600, lalu 10/detik; 8 thread x 77 = 16 di atas burst (~1.6 detik)
+    limiter = WeightLimiter(limit=600, safety=1.0)
+    t0 = time.monotonic()
+    grants = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(77):
+            limiter.acquire(1)
+            with lock:
+                grants.append(time.monotonic() - t0)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(grants) == 616
+    for i, at in enumerate(sorted(grants)):
+        assert i + 1 <= limiter.capacity + limiter.rate * at + 1e-6
+    assert sorted(grants)[-1] >= 1.4              # sisa di atas burst memang ditahan
+
+
+def test_server_used_weight_caps_local_tokens():
+    limiter = WeightLimiter(limit=100, safety=1.0)
+    limiter.observe(70)
+    assert limiter.used_weight == 70
+    assert limiter.tokens <= 30 + 1e-6
+
+
+def test_429_is_retried_max_times_then_raised():
+    stub = _Failing(429, fails=10)
+    client = LimitedClient(stub, WeightLimiter())
+    with pytest.raises(BinanceAPIException) as e:
+        client.futures_klines(symbol="BTCUSDT", interval="1m", limit=10)
+    assert e.value.status_code == 429
+    assert stub.calls == ratelimit.MAX_RETRIES_429 + 1
+    assert client.limiter.stats["429"] == ratelimit.MAX_RETRIES_429 + 1
+
+
+def test_429_recovers_within_retries():
+    stub = _Failing(429, fails=ratelimit.MAX_RETRIES_429)
+    client = LimitedClient(stub, WeightLimiter())
+    assert client.futures_klines(symbol="BTCUSDT", interval="1m", limit=10) == ["ok"]
+    assert stub.calls == ratelimit.MAX_RETRIES_429 + 1
+
+
+def test_418_is_not_retried():
+    stub = _Failing(418, fails=1)
+    client = LimitedClient(stub, WeightLimiter())
+    with pytest.raises(BinanceAPIException):
+        client.futures_klines(symbol="BTCUSDT", interval="1m", limit=10)
+    assert stub.calls == 1
+    assert client.limiter.stats["418"] == 1
+
+
+def test_retry_after_pauses_the_limiter():
+    limiter = WeightLimiter()
+    limiter.pause(0.3, 429)
+    t0 = time.monotonic()
+    limiter.acquire(1)
+    assert time.monotonic() - t0 >= 0.25
+
+
+def test_concurrent_scan_stays_under_exchange_limit():
+    fake = FakeClient(n_symbols=10, weight_limit=100)
+    client = LimitedClient(fake, WeightLimiter(limit=100, safety=0.8))
+
+    def scan(sym):
+        for tf in ("1m", "5m", "15m", "1h"):
+            client.futures_klines(symbol=sym, interval=tf, limit=50)
+        return sym
+
+    assert scan_concurrent(scan, fake.symbols, workers=8) == fake.symbols
+    assert fake.calls["futures_klines"] == 40
+    assert client.limiter.stats["429"] == 0
+    assert client.limiter.used_weight <= 80
+
+
+class _Recording(WeightLimiter):
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def observe(self, used_weight):
+        self.seen.append(used_weight)
+        super().observe(used_weight)
+
+
+class _SharedResponse:
+    """Like python-binance: one client.response shared by every thread, plus session hooks."""
+
+    def __init__(self, n):
+        self.session = type("S", (), {"hooks": {"response": []}})()
+        self.response = None
+        self._barrier = threading.Barrier(n)
+
+    def futures_klines(self, symbol, **kwargs):
+        resp = _FakeResponse(200, {"x-mbx-used-weight-1m": symbol})
+        self.response = resp
+        for hook in self.session.hooks["response"]:
+            hook(resp)
+        self._barrier.wait(5)          # semua thread sudah menimpa client.response
+        return symbol
+
+
+def test_each_call_syncs_its_own_used_weight_header():
+    stub = _SharedResponse(8)
+    limiter = _Recording()
+    client = LimitedClient(stub, limiter)
+    symbols = [str(i) for i in range(1, 9)]
+    scan_concurrent(lambda s: client.futures_klines(symbol=s, interval="1m", limit=10), symbols, workers=8)
+    assert sorted(limiter.seen) == list(range(1, 9))
+
+
+def test_fake_client_feeds_the_response_hook():
+    fake = FakeClient(n_symbols=2)
+    client = LimitedClient(fake, _Recording())
+    client.futures_klines(symbol=fake.symbols[0], interval="1m", limit=10)
+    client.futures_klines(symbol=fake.symbols[0], interval="1m", limit=10)
+    assert client.limiter.seen == [1, 2]
@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from klinecache import KlineCache
+from resample import aggregate
+
+M1, M5 = 60_000, 300_000
+B = 1_700_000_100_000 // M5 * M5        # awal bucket 5m
+
+
+class _Rest:
+    """1m bars from a formula (with revisions); 5m aggregated from them, like the exchange."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.revised = {}     # {open_ms: (high, close)}
+
+    def _row(self, t):
+        h, c = self.revised.get(t, ("101", "100"))
+        return [t, "100", h, "99", c, "10", t + M1 - 1, "1000", 5, "5", "500", "0"]
+
+    def futures_klines(self, symbol, interval, limit=500, startTime=None, endTime=None):
+        step = M1 if interval == "1m" else M5
+        now = int(self.clock[0] * 1000) // step * step
+        start = startTime // step * step if startTime else now - (limit - 1) * step
+        end = now + step
+        rows = [self._row(t) for t in range(start, end, M1)]
+        rows = rows if interval == "1m" else aggregate(rows, interval)
+        return rows[:limit]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = [0.0]
+    monkeypatch.setattr(time, "time", lambda: c[0])
+    return c
+
+
+def test_rebuilt_prior_bucket_reaches_the_numpy_columns(clock):
+    rest = _Rest(clock)
+    cache = KlineCache(rest, derive=True)
+    clock[0] = (B + 4 * M1 + 30_000) / 1000
+    cache.get_bars("BTCUSDT", "5m", 10)                 # seed 5m lewat REST
+    clock[0] = (B + M5 + 1_000) / 1000                  # 1 detik setelah bucket B close
+    bars = cache.get_bars("BTCUSDT", "5m", 10)
+    assert list(bars.t[-2:]) == [B, B + M5]
+    # exchange merevisi bar 1m terakhir bucket B (sudah close) setelah derive tadi
+    rest.revised[B + 4 * M1] = ("150", "140")
+    clock[0] = (B + M5 + 20_000) / 1000
+    cache.get("BTCUSDT", "1m", 30)                      # mis. monitor TP/SL: buffer 1m diisi ulang
+    rows = cache.get("BTCUSDT", "5m", 10)
+    bars = cache.get_bars("BTCUSDT", "5m", 10)
+    assert rows[-2][0] == B and rows[-2][2] == "150" and rows[-2][4] == "140"
+    assert bars.t[-2] == B and bars.h[-2] == 150.0 and bars.c[-2] == 140.0
+    assert bars.t[-1] == B + M5
+
+
+def test_truncate_then_sync_reparses_the_tail():
+    from klineparse import KlineArray
+    rows = [[t, "1", "2", "0.5", "1.5", "10", t + M1 - 1] for t in range(0, 10 * M1, M1)]
+    arr = KlineArray(8).sync(rows)
+    rows[-3] = [rows[-3][0], "1", "9", "0.5", "7", "10", rows[-3][6]]
+    arr.truncate(rows[-3][0])
+    bars = arr.sync(rows).bars()
+    assert list(bars.t) == [r[0] for r in rows[-8:]]
+    assert bars.h[-3] == 9.0 and bars.c[-3] == 7.0
@@ -0,0 +1,33 @@
+import numpy as np
+
+from klineparse import Bars
+
+
+def _walk(days=20, seed=7):
+    # random walk 1m dengan rezim tren 12 jam: cukup untuk setup retrace di 15m/1h
+    rng = np.random.default_rng(seed)
+    n = days * 1440
+    drift = np.repeat(rng.normal(0, 0.0004, n // 720 + 1), 720)[:n]
+    c = 100.0 * np.exp(np.cumsum(drift + rng.normal(0, 0.0015, n)))
+    o = np.r_[100.0, c[:-1]]
+    h = np.maximum(o, c) * (1 + np.abs(rng.normal(0, 0.0007, n)))
+    l = np.minimum(o, c) * (1 - np.abs(rng.normal(0, 0.0007, n)))
+    t = 1_699_999_980_000 + 60_000 * np.arange(n, dtype=np.int64)
+    return Bars(t, o, h, l, c, rng.uniform(10, 100, n))
+
+
+def test_stoch_k_on_the_scale_of_the_settings():
+    import salamprofit as sp
+    from backtest import retrace_inputs
+    k = retrace_inputs(_walk())["k"]
+    k = k[np.isfinite(k)]
+    assert k.min() >= 0.0 and k.max() <= 1.0
+    # sebagian besar bar harus bisa masuk rentang STOCHK_* (dulu K dibagi 100 -> tidak pernah)
+    inside = (sp.STOCHK_LOW_LONG <= k) & (k <= sp.STOCHK_HIGH_LONG)
+    assert inside.mean() > 0.2
+
+
+def test_retrace_backtest_trades_with_current_settings():
+    from backtest import backtest_retrace
+    trades, _ = backtest_retrace("TESTUSDT", _walk())
+    assert trades
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from tiers import TierScheduler
+
+
+def _tickers(symbols, rnd):
+    # quote volume acak tiap siklus: ranking (dan tier) berubah terus
+    return {s: {"quoteVolume": rnd.random() * 1e6, "highPrice": 2.0, "lowPrice": 1.0, "lastPrice": 1.5}
+            for s in symbols}
+
+
+def _worst_gap(sched, n, cycles=200, seed=0):
+    """Largest number of cycles any symbol went without a scan (since it joined)."""
+    rnd = random.Random(seed)
+    symbols = [f"S{i}USDT" for i in range(n)]
+    last = {}
+    worst = 0
+    for cycle in range(1, cycles + 1):
+        sched.update(symbols, _tickers(symbols, rnd), {})
+        picked = sched.pick()
+        assert len(picked) <= sched.budget
+        assert len(set(picked)) == len(picked)
+        sched.mark(picked, float(cycle))
+        for s in picked:
+            last[s] = cycle
+        worst = max(worst, max(cycle - last.get(s, 0) + 1 for s in symbols))
+    return worst
+
+
+@pytest.mark.parametrize("n, budget, hot, warm", [
+    (50, 40, 8, 32),
+    (500, 40, 8, 32),
+    (300, 20, 8, 32),
+    (20, 10, 9, 32),       # hot menghabiskan hampir seluruh budget
+])
+def test_every_symbol_within_max_stale(n, budget, hot, warm):
+    sched = TierScheduler(budget, hot=hot, warm=warm, warm_every=5, max_stale=15)
+    assert _worst_gap(sched, n) <= 15
+    assert sched.stale == 15
+    assert max(sched.period.values()) <= 15
+
+
+def test_hot_tier_shrinks_to_keep_the_bound():
+    sched = TierScheduler(40, hot=8, warm=32, warm_every=5, max_stale=15)
+    sched.update([f"S{i}USDT" for i in range(500)], {}, {})
+    n_hot = sum(t == "hot" for t in sched.tier.values())
+    assert n_hot < 8
+    assert n_hot + (500 - n_hot) / 15 <= 40
+
+
+def test_budget_too_small_raises_bound_to_round_robin_minimum(capsys):
+    sched = TierScheduler(40, hot=8, warm=32, warm_every=5, max_stale=15)
+    assert _worst_gap(sched, 1000) <= 25
+    assert sched.stale == 25               # ceil(1000 / 40)
+    assert "terlalu kecil" in capsys.readouterr().out
+
+
+def test_overdue_symbols_go_before_hot():
+    sched = TierScheduler(2, hot=2, warm=0, warm_every=1, max_stale=3)
+    symbols = ["A", "B", "C", "D"]
+    volume = {"A": 4e6, "B": 3e6, "C": 2e6, "D": 1e6}
+    tickers = {s: {"quoteVolume": v} for s, v in volume.items()}
+    seen = set()
+    for cycle in range(1, 7):
+        sched.update(symbols, tickers, {})
+        picked = sched.pick()
+        sched.mark(picked, float(cycle))
+        seen.update(picked)
+    assert seen == set(symbols)            # C dan D tetap kebagian walau A/B selalu hot
@@ -0,0 +1,129 @@
+import time
+
+import pytest
+
+import wsstream
+from klinecache import KlineCache
+from wsstream import FakeStreamServer, MarketStream
+
+STEP = 60_000
+
+
+class _Rest:
+    """futures_klines stand-in: flat 1m bars up to `lag` bars before the current one."""
+
+    def __init__(self, lag=0):
+        self.lag = lag
+        self.calls = []
+
+    def futures_klines(self, symbol, interval, limit=500, startTime=None):
+        self.calls.append((symbol, interval, startTime))
+        now = (int(time.time() * 1000) // STEP - self.lag) * STEP
+        start = startTime // STEP * STEP if startTime else now - (limit - 1) * STEP
+        rows, t = [], start
+        while t <= now and len(rows) < limit:
+            rows.append(_row(t, 100.5))
+            t += STEP
+        return rows
+
+
+def _row(t, close):
+    return [t, "100", "101", "99", str(close), "10", t + STEP - 1, "1000", 5, "5", "500", "0"]
+
+
+def _wait(pred, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if pred():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _drain(stream, n):
+    return [stream.events.get(timeout=5) for _ in range(n)]
+
+
+@pytest.fixture
+def server():
+    s = FakeStreamServer().start()
+    yield s
+    s.stop()
+
+
+def _start(server, rest, symbols=("BTCUSDT",)):
+    cache = KlineCache(rest)
+    stream = MarketStream(cache, list(symbols), ["1m"], url=server.url, seed_limit=50).start()
+    names = set(wsstream.stream_names(symbols, ["1m"]))
+    assert _wait(lambda: server.subscriptions() == names and all(cache.peek(s, "1m") for s in symbols))
+    assert _wait(lambda: all((s, "1m") in cache._streamed for s in symbols))
+    return cache, stream
+
+
+def test_kline_and_mark_events_patch_the_cache(server):
+    rest = _Rest()
+    cache, stream = _start(server, rest)
+    try:
+        n_rest = len(rest.calls)
+        last = cache.peek("BTCUSDT", "1m")[-1]
+        server.push_kline("BTCUSDT", "1m", _row(last[0], 104), False)
+        server.push_mark("BTCUSDT", 104.2)
+        assert _drain(stream, 2) == [("kline", "BTCUSDT", "1m", False), ("mark", "BTCUSDT", 104.2)]
+        assert cache.peek("BTCUSDT", "1m")[-1][4] == "104"
+        assert stream.mark_prices == {"BTCUSDT": 104.2}
+        # buffer yang di-stream tidak memicu REST lagi
+        cache.get("BTCUSDT", "1m", 50)
+        assert len(rest.calls) == n_rest
+    finally:
+        stream.stop()
+
+
+def test_gap_in_stream_is_backfilled_over_rest(server):
+    rest = _Rest(lag=3)                 # seed ketinggalan 3 bar
+    cache, stream = _start(server, rest)
+    try:
+        rest.lag = 0
+        while time.time() % 60 > 58:       # jangan sampai bar berganti di tengah tes
+            time.sleep(0.1)
+        now = int(time.time() * 1000) // STEP * STEP
+        server.push_kline("BTCUSDT", "1m", _row(now, 99), False)
+        assert _drain(stream, 1) == [("kline", "BTCUSDT", "1m", False)]
+        rows = cache.peek("BTCUSDT", "1m")
+        opens = [r[0] for r in rows]
+        assert opens[-1] == now and rows[-1][4] == "99"
+        assert all(b - a == STEP for a, b in zip(opens, opens[1:]))
+    finally:
+        stream.stop()
+
+
+def test_reconnect_resubscribes_and_backfills(server, monkeypatch):
+    monkeypatch.setattr(wsstream, "RECONNECT_MIN_SEC", 0.05)
+    rest = _Rest()
+    cache, stream = _start(server, rest)
+    try:
+        backfills = stream.stats["backfills"]
+        n_rest = len(rest.calls)
+        server.drop_connections()
+        assert _wait(lambda: stream.stats["reconnects"] >= 1)
+        assert _wait(lambda: server.subscribers() == 1 and stream.stats["backfills"] > backfills)
+        assert _wait(lambda: ("BTCUSDT", "1m") in cache._streamed)
+        # backfill setelah reconnect: incremental dari bar terakhir, bukan cold fill
+        sym, tf, start = rest.calls[n_rest]
+        assert (sym, tf) == ("BTCUSDT", "1m") and start is not None
+        last = cache.peek("BTCUSDT", "1m")[-1]
+        server.push_kline("BTCUSDT", "1m", _row(last[0], 101), True)
+        assert _drain(stream, 1) == [("kline", "BTCUSDT", "1m", True)]
+        assert cache.peek("BTCUSDT", "1m")[-1][4] == "101"
+    finally:
+        stream.stop()
+    assert ("BTCUSDT", "1m") not in cache._streamed
+
+
+def test_streams_are_split_across_connections(server, monkeypatch):
+    monkeypatch.setattr(wsstream, "MAX_STREAMS_PER_CONN", 3)
+    symbols = ("AAAUSDT", "BBBUSDT", "CCCUSDT")
+    cache, stream = _start(server, _Rest(), symbols)
+    try:
+        assert server.subscribers() == 2        # 6 stream / 3 per koneksi
+    finally:
+        stream.stop()
@@ -0,0 +1,177 @@
+# tiers.py
+# Priority-tiered universe scanning within a per-cycle symbol budget
+# - Every symbol gets a score from data that is already there: 24h quote
+#   volume and range from the one bulk ticker call, ATR expansion, volume
+#   spike and Bollinger proximity from the last 1m indicator snapshot (free
+#   for symbols scanned before; missing values count as average)
+# - hot (top HOT) every cycle, warm (next WARM) every WARM_EVERY cycles,
+#   cold = the rest, at the period the remaining budget allows (warm too,
+#   if the budget cannot even hold warm); tiers are re-ranked every cycle,
+#   so a symbol that heats up moves up next cycle
+# - Staleness bound: no period is longer than MAX_STALE cycles. The hot tier
+#   shrinks (gives its budget to warm/cold) until the bound fits; only a
+#   universe larger than budget x MAX_STALE raises the bound, to the round
+#   robin minimum ceil(N / budget), with a warning
+# - Each cycle scans the symbols that reached the bound first (even before
+#   hot ones), then every hot symbol, then the most overdue of the rest
+#   (overdue relative to their period), filling the budget; the achieved
+#   scan interval is reported per tier
+
+import math
+import threading
+
+TIERS = ("hot", "warm", "cold")
+HEADROOM = 0.9     # bagian budget yang direncanakan; sisanya menyerap simbol yang naik tier
+WEIGHTS = {"quote_volume": 1.0, "range_24h": 0.5, "atr_expansion": 1.0, "volume_spike": 1.0,
+           "bb_proximity": 1.0}
+
+
+def _ratio(a, b):
+    try:
+        a, b = float(a), float(b)
+    except (TypeError, ValueError):
+        return math.nan
+    return a / b if b > 0 and a == a else math.nan
+
+
+def features(ticker, snap):
+    """Raw ranking features of one symbol (NaN where the data is missing).
+
+    snap: {close, volume, atr, atr_ma, vol_ma, bb_upper, bb_lower} of the last
+    1m bar, or None.
+    """
+    ticker = ticker or {}
+    try:
+        range_abs = float(ticker["highPrice"]) - float(ticker["lowPrice"])
+    except (KeyError, TypeError, ValueError):
+        range_abs = math.nan
+    out = {
+        "quote_volume": _ratio(ticker.get("quoteVolume"), 1.0),
+        "range_24h": _ratio(range_abs, ticker.get("lastPrice")),
+        "atr_expansion": math.nan,
+        "volume_spike": math.nan,
+        "bb_proximity": math.nan,
+    }
+    if snap:
+        out["atr_expansion"] = _ratio(snap["atr"], snap["atr_ma"])
+        out["volume_spike"] = _ratio(snap["volume"], snap["vol_ma"])
+        width = snap["bb_upper"] - snap["bb_lower"]
+        if width > 0:
+            edge = min(abs(snap["close"] - snap["bb_upper"]), abs(snap["close"] - snap["bb_lower"]))
+            out["bb_proximity"] = 1.0 - min(edge / width, 1.0)
+    return out
+
+
+def rank_scores(feats):
+    """{symbol: features} -> {symbol: score}; each feature as percentile rank (0..1, missing = 0.5)."""
+    scores = dict.fromkeys(feats, 0.0)
+    for name, w in WEIGHTS.items():
+        have = sorted((f[name], s) for s, f in feats.items() if f[name] == f[name])
+        pct = {s: (i + 0.5) / len(have) for i, (_, s) in enumerate(have)}
+        for s in feats:
+            scores[s] += w * pct.get(s, 0.5)
+    return scores
+
+
+class TierScheduler:
+    """Picks the symbols of each scan cycle; see the module header.
+
+    update() once per cycle with the filtered universe, then pick(), then
+    mark() with what was actually scanned.
+    """
+
+    def __init__(self, budget, hot=8, warm=32, warm_every=5, max_stale=15):
+        self.budget = budget
+        self.hot = hot
+        self.warm = warm
+        self.warm_every = warm_every
+        self.max_stale = max_stale     # batas basi yang diminta (siklus)
+        self.stale = max_stale         # batas yang dijamin (lebih besar hanya kalau budget tidak cukup)
+        self.cycle = 0
+        self.tier = {}                 # {symbol: tier}
+        self.period = dict.fromkeys(TIERS, 1)
+        self._last = {}                # {symbol: (cycle, ts)} scan terakhir
+        self._first = {}               # {symbol: cycle} pertama masuk universe (umur simbol yang belum discan)
+        self._gaps = {t: [0, 0.0, 0.0] for t in TIERS}   # per tier: [n, sum detik, max detik]
+        self._warned = False
+        self._lock = threading.Lock()
+
+    def update(self, symbols, tickers, snapshots):
+        """Re-rank the universe. snapshots: {symbol: last 1m indicator snapshot} (may be partial)."""
+        feats = {s: features(tickers.get(s), snapshots.get(s)) for s in symbols}
+        order = sorted(symbols, key=rank_scores(feats).get, reverse=True)
+        n = len(order)
+        plan = self.budget * HEADROOM
+        stale = max(self.max_stale, math.ceil(n / self.budget))
+        if stale > self.max_stale and not self._warned:
+            self._warned = True
+            print(f"[TIER] budget {self.budget}/siklus terlalu kecil untuk {n} simbol: batas basi "
+                  f"{stale} siklus (target {self.max_stale})")
+        n_hot = min(self.hot, n, self.budget)
+        while n_hot and n_hot + (n - n_hot) / stale > self.budget:   # hot menyerahkan budget supaya batas basi muat
+            n_hot -= 1
+        n_warm = min(self.warm, n - n_hot)
+        n_cold = n - n_hot - n_warm
+        avail = plan - n_hot
+        warm_every = cold_every = min(self.warm_every, stale)
+        if avail <= 0:                                      # hot menghabiskan rencana: sisanya di batas basi
+            warm_every = cold_every = stale
+        elif n_warm / warm_every + n_cold / stale > avail:  # warm di periodenya sendiri tidak muat: bergiliran rata
+            warm_every = cold_every = min(stale, max(warm_every, math.ceil((n_warm + n_cold) / avail)))
+        elif n_cold:
+            cold_every = min(stale, max(warm_every, math.ceil(n_cold / (avail - n_warm / warm_every))))
+        with self._lock:
+            self.stale = stale
+            self.tier = {s: TIERS[0] if i < n_hot else TIERS[1] if i < n_hot + n_warm else TIERS[2]
+                         for i, s in enumerate(order)}
+            self.period = {"hot": 1, "warm": warm_every, "cold": cold_every}
+            for s in order:
+                self._first.setdefault(s, self.cycle)
+        return self
+
+    def pick(self):
+        """Symbols of this cycle, at most `budget`: symbols at the staleness bound (oldest first),
+        every hot symbol, then the rest by age / period (overdue first; never-scanned ones count
+        as at least due). Leftover budget goes to symbols that are nearly due, which keeps
+        symbols scanned in the same cycle from staying in step."""
+        with self._lock:
+            self.cycle += 1
+            ranked = []
+            for s, tier in self.tier.items():
+                last = self._last.get(s)
+                period = self.period[tier]
+                age = self.cycle - (last[0] if last is not None else self._first.get(s, self.cycle))
+                if last is None:
+                    age = max(age, period)
+                overdue = age if age >= self.stale else 0
+                ranked.append((overdue, tier == "hot", age / period, -TIERS.index(tier), last is not None, s))
+            ranked.sort(reverse=True)
+            return [r[-1] for r in ranked[:self.budget]]
+
+    def mark(self, symbols, now):
+        with self._lock:
+            for s in symbols:
+                last = self._last.get(s)
+                if last is not None:
+                    g = self._gaps[self.tier.get(s, "cold")]
+                    gap = now - last[1]
+                    g[0] += 1
+                    g[1] += gap
+                    g[2] = max(g[2], gap)
+                self._last[s] = (self.cycle, now)
+
+    def report(self, now):
+        """Per tier: symbols, configured period (cycles), achieved mean/max interval since the last
+        report and the current worst staleness (seconds); resets the interval window.
+        The guaranteed bound (cycles) is self.stale."""
+        with self._lock:
+            out = {}
+            for t in TIERS:
+                members = [s for s, tier in self.tier.items() if tier == t]
+                n, total, worst = self._gaps[t]
+                stale = max((now - self._last[s][1] for s in members if s in self._last), default=0.0)
+                out[t] = {"symbols": len(members), "period_cycles": self.period[t],
+                          "interval_mean_sec": total / n if n else None, "interval_max_sec": worst,
+                          "stale_max_sec": stale, "never_scanned": sum(s not in self._last for s in members)}
+                self._gaps[t] = [0, 0.0, 0.0]
+            return out
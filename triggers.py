@@ -0,0 +1,123 @@
+# triggers.py
+# Event-driven TP/SL trigger index
+# - Every open level (SL, TP1..TP3) sits in a sorted list per symbol, split
+#   into "fire when price >= level" and "fire when price <= level"
+# - A price tick (or a candle high/low) is one bisect range query per side:
+#   only the levels actually crossed are touched, everything else costs nothing
+# - Levels are popped when they fire, so each one triggers exactly once
+
+import bisect
+import itertools
+import threading
+
+LEVEL_KINDS = ("sl", "tp1", "tp2", "tp3")   # urutan evaluasi: SL dulu, lalu TP berurutan
+_RANK = {kind: i for i, kind in enumerate(LEVEL_KINDS)}
+
+
+class TriggerIndex:
+    """Sorted price levels of open signals, queried per tick.
+
+    Signals are anything indexable like the bots' signal records
+    (symbol/side/sl/tp1/tp2/tp3/notified_*): signalstore.Signal or a plain dict.
+    LONG: TPs fire upward, SL downward. SHORT: the other way around.
+    """
+
+    def __init__(self):
+        self._above = {}        # {symbol: sorted [(level, seq)]} -> fire saat harga >= level
+        self._below = {}        # {symbol: sorted [(level, seq)]} -> fire saat harga <= level
+        self._entries = {}      # {seq: (symbol, above, level, kind, signal)}
+        self._by_signal = {}    # {id(signal): {kind: seq}}
+        self._seq = itertools.count()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def symbols(self):
+        """Symbols that still have at least one open level."""
+        with self._lock:
+            return [s for s in set(self._above) | set(self._below)
+                    if self._above.get(s) or self._below.get(s)]
+
+    def set_level(self, signal, kind, level):
+        """(Re)place one level of a signal, e.g. SL moved to entry after TP1."""
+        with self._lock:
+            self._drop(signal, kind)
+            above = (signal["side"] == "LONG") != (kind == "sl")
+            seq = next(self._seq)
+            book = (self._above if above else self._below).setdefault(signal["symbol"], [])
+            bisect.insort(book, (level, seq))
+            self._entries[seq] = (signal["symbol"], above, level, kind, signal)
+            self._by_signal.setdefault(id(signal), {})[kind] = seq
+
+    def index_signal(self, signal):
+        """Index every pending level of a signal (new signal or TP/SL updated by HOLD)."""
+        with self._lock:
+            self.set_level(signal, "sl", signal["sl"])
+            for kind in LEVEL_KINDS[1:]:
+                if signal.get(f"notified_{kind}"):
+                    self._drop(signal, kind)
+                else:
+                    self.set_level(signal, kind, signal[kind])
+
+    def remove_signal(self, signal):
+        with self._lock:
+            for kind in list(self._by_signal.get(id(signal), ())):
+                self._drop(signal, kind)
+            self._by_signal.pop(id(signal), None)
+
+    def bounds(self, symbol):
+        """(lowest level firing upward, highest level firing downward) -- next price
+        that can trigger anything; (inf, -inf) when the symbol has no open level."""
+        with self._lock:
+            above = self._above.get(symbol)
+            below = self._below.get(symbol)
+            return (above[0][0] if above else float("inf"),
+                    below[-1][0] if below else float("-inf"))
+
+    def cross(self, symbol, high, low=None):
+        """Pop every level crossed by a price (or a bar's high/low range).
+
+        Returns [(signal, [kinds])] in the order the signals were indexed, kinds
+        sorted SL first then TP1..TP3 -- the same order the old per-signal
+        if-chain checked them.
+        """
+        low = high if low is None else low
+        with self._lock:
+            fired = []
+            above = self._above.get(symbol)
+            if above:
+                n = bisect.bisect_right(above, (high, float("inf")))
+                fired.extend(seq for _, seq in above[:n])
+                del above[:n]
+            below = self._below.get(symbol)
+            if below:
+                n = bisect.bisect_left(below, (low, -1))
+                fired.extend(seq for _, seq in below[n:])
+                del below[n:]
+            if not fired:
+                return []
+
+            hits = {}
+            for seq in sorted(fired):
+                _, _, _, kind, signal = self._entries.pop(seq)
+                kinds = self._by_signal.get(id(signal))
+                if kinds is not None and kinds.get(kind) == seq:
+                    del kinds[kind]
+                hits.setdefault(id(signal), (signal, []))[1].append(kind)
+            return [(signal, sorted(kinds, key=_RANK.get)) for signal, kinds in hits.values()]
+
+    def _drop(self, signal, kind):
+        seq = self._by_signal.get(id(signal), {}).pop(kind, None)
+        if seq is None:
+            return
+        symbol, above, level, _, _ = self._entries.pop(seq)
+        book = (self._above if above else self._below).get(symbol, [])
+        i = bisect.bisect_left(book, (level, seq))
+        if i < len(book) and book[i] == (level, seq):
+            del book[i]
+
+
+def price_snapshot(client):
+    """Last price of every futures symbol in one request -> {symbol: price}."""
+    return {t["symbol"]: float(t["price"]) for t in client.futures_symbol_ticker()}
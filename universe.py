@@ -0,0 +1,52 @@
+# universe.py
+# Universe selection for USDT-M perpetuals
+# - futures_exchange_info cached with a TTL (contract list rarely changes)
+# - ONE all-symbols 24h ticker call instead of one futures_ticker per symbol
+#   -> constant request weight regardless of how many contracts are listed
+
+import time
+
+EXCHANGE_INFO_TTL_SEC = 3600     # refresh daftar kontrak tiap 1 jam
+MIN_QUOTE_VOLUME = 5_000_000     # minimal quote volume 24h (USDT)
+
+_exchange_info = {"ts": 0.0, "data": None}
+
+
+def exchange_info(client, ttl=EXCHANGE_INFO_TTL_SEC):
+    """futures_exchange_info with TTL cache; on refresh error keep serving the stale copy."""
+    now = time.time()
+    if _exchange_info["data"] is None or now - _exchange_info["ts"] > ttl:
+        try:
+            _exchange_info["data"] = client.futures_exchange_info()
+            _exchange_info["ts"] = now
+        except Exception as e:
+            if _exchange_info["data"] is None:
+                raise
+            print(f"[UNIVERSE] exchange info refresh gagal, pakai cache lama: {e}")
+    return _exchange_info["data"]
+
+
+def usdt_perpetuals(client):
+    info = exchange_info(client)
+    return [s['symbol'] for s in info['symbols']
+            if s['quoteAsset'] == 'USDT' and s['contractType'] == 'PERPETUAL']
+
+
+def ticker_snapshot(client):
+    """All 24h tickers in one call -> {symbol: ticker}."""
+    return {t['symbol']: t for t in client.futures_ticker()}
+
+
+def filter_by_quote_volume(symbols, tickers, min_quote_volume=MIN_QUOTE_VOLUME):
+    """Keep symbols (original order) whose 24h quote volume is above the threshold."""
+    filtered = []
+    for symbol in symbols:
+        t = tickers.get(symbol)
+        if t is None:
+            continue
+        try:
+            if float(t['quoteVolume']) > min_quote_volume:
+                filtered.append(symbol)
+        except (KeyError, TypeError, ValueError):
+            continue
+    return filtered
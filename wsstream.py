@@ -0,0 +1,305 @@
+# wsstream.py
+# Streaming market data (Binance Futures WebSocket) untuk sinyalbot.py & salamprofit.py
+# - Combined <symbol>@kline_<tf> + <symbol>@markPrice@1s streams
+# - Kline updates patch the shared KlineCache buffers (klinecache.py)
+# - Auto reconnect (exponential backoff) + REST gap backfill after reconnect
+# - FakeStreamServer: local stand-in server so the stream can be tested offline
+#
+# Dependencies:
+#   pip install websockets   (sudah ikut terpasang bersama python-binance)
+#
+# Offline demo:
+#   python wsstream.py
+
+import json
+import queue
+import asyncio
+import threading
+import time
+
+import websockets
+
+from klineparse import loads   # orjson kalau terpasang
+
+WS_FUTURES_URL = "wss://fstream.binance.com/stream"
+MAX_STREAMS_PER_CONN = 200     # Binance: jaga jumlah stream per koneksi tetap kecil
+RECONNECT_MIN_SEC = 1
+RECONNECT_MAX_SEC = 60
+EVENT_QUEUE_MAX = 10_000
+
+
+def stream_names(symbols, intervals, mark_price=True):
+    names = [f"{s.lower()}@kline_{tf}" for s in symbols for tf in intervals]
+    if mark_price:
+        names += [f"{s.lower()}@markPrice@1s" for s in symbols]
+    return names
+
+
+def kline_event_to_row(k):
+    """Convert a WS kline payload into the REST futures_klines row layout."""
+    return [k["t"], k["o"], k["h"], k["l"], k["c"], k["v"], k["T"],
+            k["q"], k["n"], k["V"], k["Q"], "0"]
+
+
+class MarketStream:
+    """Combined kline/markPrice stream that feeds KlineCache and queues events.
+
+    Events on `self.events` (consumed by the bot's main thread):
+      ("kline", symbol, interval, closed)
+      ("mark", symbol, price)
+    The latest mark price per symbol is also kept in `self.mark_prices`.
+    """
+
+    def __init__(self, cache, symbols, intervals, url=WS_FUTURES_URL, mark_price=True, seed_limit=None):
+        # seed_limit: int or {interval: limit} used for the first REST cold fill
+        self.cache = cache
+        self.symbols = list(symbols)
+        self.intervals = list(intervals)
+        self.url = url
+        self.seed_limit = seed_limit
+        self.names = stream_names(self.symbols, self.intervals, mark_price)
+        self.keys = [(s, tf) for s in self.symbols for tf in self.intervals]
+        self.events = queue.Queue(maxsize=EVENT_QUEUE_MAX)
+        self.mark_prices = {}
+        self.stats = {"messages": 0, "reconnects": 0, "backfills": 0, "dropped": 0}
+        self._stop = threading.Event()
+        self._thread = None
+        self._loop = None
+
+    # ---------- lifecycle ----------
+    def start(self):
+        self._thread = threading.Thread(target=self._thread_main, name="market-stream", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(lambda: None)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.cache.set_streaming(self.keys, False)
+
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+
+    async def _run(self):
+        chunks = [self.names[i:i + MAX_STREAMS_PER_CONN]
+                  for i in range(0, len(self.names), MAX_STREAMS_PER_CONN)]
+        await asyncio.gather(*(self._run_conn(i, chunk) for i, chunk in enumerate(chunks)))
+
+    async def _run_conn(self, conn_id, names):
+        keys = self._keys_for(names)
+        delay = RECONNECT_MIN_SEC
+        first = True
+        while not self._stop.is_set():
+            try:
+                async with websockets.connect(self.url, ping_interval=20, max_queue=4096) as ws:
+                    await ws.send(json.dumps({"method": "SUBSCRIBE", "params": names, "id": conn_id + 1}))
+                    # Backfill lewat REST dulu supaya tidak ada bar yang hilang selama putus
+                    await self._backfill(keys, cold=first)
+                    self.cache.set_streaming(keys, True)
+                    first = False
+                    delay = RECONNECT_MIN_SEC
+                    while not self._stop.is_set():
+                        try:
+                            msg = await asyncio.wait_for(ws.recv(), timeout=1)
+                        except asyncio.TimeoutError:
+                            continue
+                        await self._handle(msg)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                print(f"[WS] conn {conn_id} putus: {e}; reconnect {delay}s")
+            # Selama putus, buffer kembali di-refresh via REST oleh KlineCache.get
+            self.cache.set_streaming(keys, False)
+            if self._stop.is_set():
+                break
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SEC)
+
+    def _seed_limit(self, tf):
+        if isinstance(self.seed_limit, dict):
+            return self.seed_limit.get(tf)
+        return self.seed_limit
+
+    def _keys_for(self, names):
+        wanted = set(names)
+        return [(s, tf) for s, tf in self.keys if f"{s.lower()}@kline_{tf}" in wanted]
+
+    async def _backfill(self, keys, cold=False):
+        loop = asyncio.get_running_loop()
+        for symbol, tf in keys:
+            try:
+                await loop.run_in_executor(
+                    None, self.cache.backfill, symbol, tf, self._seed_limit(tf) if cold else None
+                )
+                self.stats["backfills"] += 1
+            except Exception as e:
+                print(f"[WS] backfill {symbol} {tf} gagal: {e}")
+
+    async def _handle(self, msg):
+        self.stats["messages"] += 1
+        payload = loads(msg)
+        data = payload.get("data")
+        if not data:
+            return  # ack SUBSCRIBE {"result": null, "id": ..}
+        etype = data.get("e")
+        if etype == "kline":
+            k = data["k"]
+            symbol, tf, closed = data["s"], k["i"], bool(k["x"])
+            if not self.cache.apply(symbol, tf, kline_event_to_row(k), closed):
+                loop = asyncio.get_running_loop()
+                self.stats["backfills"] += 1
+                await loop.run_in_executor(None, self.cache.backfill, symbol, tf, self._seed_limit(tf))
+                self.cache.apply(symbol, tf, kline_event_to_row(k), closed)
+            self._emit(("kline", symbol, tf, closed), important=closed)
+        elif etype == "markPriceUpdate":
+            symbol, price = data["s"], float(data["p"])
+            self.mark_prices[symbol] = price
+            self._emit(("mark", symbol, price), important=False)
+
+    def _emit(self, event, important):
+        try:
+            if important:
+                self.events.put(event, timeout=1)
+            else:
+                self.events.put_nowait(event)
+        except queue.Full:
+            self.stats["dropped"] += 1
+
+
+# ===================== LOCAL STAND-IN SERVER =====================
+class FakeStreamServer:
+    """Minimal local stand-in for the Binance combined stream endpoint.
+
+    Accepts SUBSCRIBE requests and forwards pushed kline/markPrice events to
+    every connection subscribed to that stream. `drop_connections()`
+    simulates an exchange-side disconnect (to exercise reconnect/backfill).
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self._subs = {}          # {connection: set(stream names)}
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/stream"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._thread_main, name="fake-stream", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _thread_main(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._serve())
+        self._loop.close()
+
+    async def _serve(self):
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        await self._server.wait_closed()
+
+    async def _handler(self, ws):
+        self._subs[ws] = set()
+        try:
+            async for msg in ws:
+                req = json.loads(msg)
+                if req.get("method") == "SUBSCRIBE":
+                    self._subs[ws].update(req.get("params", []))
+                    await ws.send(json.dumps({"result": None, "id": req.get("id")}))
+        finally:
+            self._subs.pop(ws, None)
+
+    def subscribers(self):
+        return len(self._subs)
+
+    def subscriptions(self):
+        """Every stream name at least one connection is subscribed to."""
+        return set().union(*list(self._subs.values()))
+
+    def _publish(self, stream, data):
+        payload = json.dumps({"stream": stream, "data": data})
+
+        async def send_all():
+            for ws, names in list(self._subs.items()):
+                if stream in names:
+                    try:
+                        await ws.send(payload)
+                    except Exception:
+                        pass
+
+        asyncio.run_coroutine_threadsafe(send_all(), self._loop).result(5)
+
+    def push_kline(self, symbol, interval, row, closed):
+        """Push a REST-layout kline row as a WS kline event."""
+        k = {"t": row[0], "T": row[6], "s": symbol, "i": interval,
+             "o": str(row[1]), "h": str(row[2]), "l": str(row[3]), "c": str(row[4]),
+             "v": str(row[5]), "q": str(row[7]), "n": row[8], "V": str(row[9]),
+             "Q": str(row[10]), "x": closed}
+        self._publish(f"{symbol.lower()}@kline_{interval}",
+                      {"e": "kline", "E": int(time.time() * 1000), "s": symbol, "k": k})
+
+    def push_mark(self, symbol, price):
+        self._publish(f"{symbol.lower()}@markPrice@1s",
+                      {"e": "markPriceUpdate", "E": int(time.time() * 1000), "s": symbol, "p": str(price)})
+
+    def drop_connections(self):
+        async def close_all():
+            for ws in list(self._subs):
+                await ws.close()
+
+        asyncio.run_coroutine_threadsafe(close_all(), self._loop).result(5)
+
+
+if __name__ == "__main__":
+    # Demo offline: fake REST client + fake WS server -> MarketStream -> KlineCache
+    from klinecache import KlineCache
+
+    class _DemoClient:
+        def futures_klines(self, symbol, interval, limit=500, startTime=None):
+            step = 60_000
+            now = int(time.time() * 1000) // step * step
+            start = startTime // step * step if startTime else now - (limit - 1) * step
+            rows, t = [], start
+            while t <= now and len(rows) < limit:
+                rows.append([t, "100", "101", "99", "100.5", "10", t + step - 1, "1000", 5, "5", "500", "0"])
+                t += step
+            return rows
+
+    server = FakeStreamServer().start()
+    cache = KlineCache(_DemoClient())
+    stream = MarketStream(cache, ["BTCUSDT"], ["1m"], url=server.url, seed_limit=50).start()
+    while server.subscribers() == 0:
+        time.sleep(0.05)
+    time.sleep(0.2)
+    last = cache.get("BTCUSDT", "1m", 50)[-1]
+    server.push_kline("BTCUSDT", "1m", [last[0], "100", "105", "99", "104", "12", last[6], "1200", 6, "6", "600"], False)
+    server.push_mark("BTCUSDT", 104.2)
+    for _ in range(2):
+        print("event:", stream.events.get(timeout=5))
+    print("close dari stream:", cache.get("BTCUSDT", "1m", 50)[-1][4])
+    server.drop_connections()     # reconnect + backfill path
+    time.sleep(1.5)
+    print("stats:", stream.stats, cache.stats)
+    stream.stop()
+    server.stop()